@@ -0,0 +1,59 @@
+"""
+Scaling benchmark of the competition program.
+
+Times the file readers, the result aggregates and the reports on synthetic competitions of growing size.
+
+Usage:
+    python benchmark.py --students 100 1000 10000 --challenges 5 20 --output benchmark.json
+    python benchmark.py --compare baseline.json --threshold 0.2
+"""
+
+import sys
+import argparse
+from lib.benchmark import run_benchmark, save_benchmark, load_benchmark, compare_benchmarks
+from lib.misc import Table
+
+def parse_command_line(argv = None):
+    """ Read the benchmark options from the command line"""
+    parser = argparse.ArgumentParser(description='Time every stage of the competition program over a grid of sizes.')
+    parser.add_argument('--students', type=int, nargs='+', default=[100, 1000, 10000], help='numbers of students of the grid')
+    parser.add_argument('--challenges', type=int, nargs='+', default=[5, 20], help='numbers of challenges of the grid')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each stage, the best time is kept')
+    parser.add_argument('--ongoing', type=float, default=0.05, help='share of ongoing results')
+    parser.add_argument('--absent', type=float, default=0.2, help='share of results not attempted')
+    parser.add_argument('--special', type=float, default=0.4, help='share of special challenges')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the data generator')
+    parser.add_argument('--data-dir', default=None, help='keep the generated files in this folder')
+    parser.add_argument('--output', default=None, help='save the timings as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', default=None, help='compare the timings against a saved JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown against the baseline (0.2 = 20%%)')
+    return parser.parse_args(argv)
+
+def main():
+    """ Run the benchmark, print the timings and exit with 1 if a stage regressed against the baseline"""
+    arguments = parse_command_line()
+    try:
+        benchmark = run_benchmark(arguments.students, arguments.challenges, arguments.repeat, arguments.data_dir,
+                                  ongoing_ratio=arguments.ongoing, absent_ratio=arguments.absent,
+                                  special_ratio=arguments.special, seed=arguments.seed)
+    except ValueError as e:
+        sys.exit(e)
+    table = [['Students', 'Challenges', 'Stage', 'Seconds']]
+    for record in benchmark['results']:
+        table.append([record['students'], record['challenges'], record['stage'], f"{record['seconds']:.6f}"])
+    col_widths = [max(len(str(row[column])) for row in table) + 2 for column in range(len(table[0]))]
+    print(Table.create_format_table("BENCHMARK", table, col_widths, header_width_space=0, row_align='<'))
+    if arguments.output:
+        save_benchmark(benchmark, arguments.output)
+    if arguments.compare:
+        comparison = compare_benchmarks(load_benchmark(arguments.compare), benchmark, arguments.threshold)
+        regressions = [record for record in comparison if record['regression']]
+        for record in regressions:
+            print(f"REGRESSION {record['stage']} at {record['students']}x{record['challenges']}: "
+                  f"{record['baseline']:.6f}s -> {record['current']:.6f}s ({record['ratio']}x)")
+        print(f'{len(comparison)} stages compared, {len(regressions)} regressions above {arguments.threshold:.0%}.')
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Batch mode to report many independent competitions in one invocation.
+
+The manifest lists one competition per line, in the same comma separated style as the other input files:
+
+    <result file>, <challenge file>, <student file>, <report file>
+
+The challenge, student and report files are optional. Blank lines and lines starting with '#' are ignored.
+The competitions are processed on a pool of worker processes and each report goes to its own file.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .competition import Competition
+from .ranking import ScoringRule
+from .misc import Table
+
+
+class BatchEntry():
+    """
+    A competition of the batch manifest.
+
+    Attributes:
+        name (str): The name of the competition, taken from the result file name.
+        files (list): The result file, then optionally the challenge and student files.
+        output_file (str): The report file of the competition.
+    """
+    def __init__(self, files: list, output_file: str):
+        self.files = files
+        self.output_file = output_file
+        self.name = os.path.splitext(os.path.basename(files[0]))[0]
+
+    def __str__(self):
+        return f'{self.name}: {", ".join(self.files)} -> {self.output_file}'
+
+
+def read_manifest(file_name: str, output_dir: str = None) -> list:
+    """
+    Read the batch manifest.
+
+    Input:
+    - file_name (str): The path to the manifest. Relative paths in the manifest are relative to its folder.
+    - output_dir (str): The folder of the reports that have no report file in the manifest. Default is the manifest folder.
+
+    Returns:
+    - list: The BatchEntry of every competition.
+    """
+    base_dir = os.path.dirname(os.path.abspath(file_name))
+    output_dir = output_dir if output_dir is not None else base_dir
+    entries = []
+    used_names = {} # The number of competitions with the same name, so their default report files do not collide
+    with open(file_name, "r", encoding="utf-8") as file:
+        for line_no, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            elements = [os.path.join(base_dir, item.strip()) if item.strip() else '' for item in line.split(",")]
+            if len(elements) > 4 or not elements[0]:
+                raise ValueError(f"Unexpected number of elements in manifest record (line {line_no})")
+            files = elements[:3]
+            while files and not files[-1]: # The optional files can be left empty
+                files.pop()
+            if '' in files:
+                raise ValueError(f"A challenge file is required with a student file (line {line_no})")
+            output_file = elements[3] if len(elements) == 4 and elements[3] else None
+            entry = BatchEntry(files, output_file)
+            used_names[entry.name] = used_names.get(entry.name, 0) + 1
+            if entry.output_file is None:
+                suffix = f'_{used_names[entry.name]}' if used_names[entry.name] > 1 else ''
+                entry.output_file = os.path.join(output_dir, f'{entry.name}{suffix}_report.txt')
+            entries.append(entry)
+    return entries
+
+
+def run_entry(entry: BatchEntry, snapshot_dir: str = None, compact = False, scoring_rule: ScoringRule = None) -> dict:
+    """
+    Read and report a single competition. Runs in a worker process.
+
+    Returns:
+    - dict: {'name', 'output_file', 'status' ('ok' or 'failed'), 'seconds', 'error'}
+    """
+    start = time.perf_counter()
+    summary = {'name': entry.name, 'output_file': entry.output_file, 'status': 'ok', 'seconds': 0.0, 'error': None}
+    try:
+        competition = Competition(compact, scoring_rule=scoring_rule)
+        competition.read_files(entry.files, snapshot_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(entry.output_file)), exist_ok=True)
+        competition.report_all(entry.output_file, print_terminal=False)
+    except (ValueError, OSError) as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+    except SystemExit: # TextEditor exits when the report file cannot be written
+        summary['status'] = 'failed'
+        summary['error'] = f'Could not write the report file {entry.output_file}'
+    except Exception as e: # An unexpected error in one competition must not stop the rest of the batch
+        summary['status'] = 'failed'
+        summary['error'] = f'{e.__class__.__name__}: {e}'
+
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def run_batch(entries: list, workers: int = None, snapshot_dir: str = None, compact = False, scoring_rule: ScoringRule = None) -> list:
+    """
+    Report every competition of the batch on a process pool.
+
+    Input:
+    - entries (list): The BatchEntry of every competition.
+    - workers (int): The number of worker processes. Default is the number of CPUs.
+    - snapshot_dir (str): The directory of the parsed competition snapshots. Not used if None.
+    - compact (bool): Keep the students and challenges of each competition as compact arrays.
+    - scoring_rule (ScoringRule): The placement points of every competition. The default rule if None.
+
+    Returns:
+    - list: The summary of every competition, in the order of the entries.
+    """
+    if workers is not None and workers < 1:
+        raise ValueError("The number of workers must be at least 1")
+    if workers == 1: # Avoid the cost of a process pool for a serial run
+        return [run_entry(entry, snapshot_dir, compact, scoring_rule) for entry in entries]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_entry, entries, [snapshot_dir] * len(entries), [compact] * len(entries), [scoring_rule] * len(entries)))
+
+
+def format_summary(summaries: list, total_seconds: float) -> str:
+    """ Returns the summary table of a batch run with the timing and the error of each competition."""
+    table = [['Competition', 'Status', 'Seconds', 'Report or error']]
+    for summary in summaries:
+        table.append([summary['name'], summary['status'], f"{summary['seconds']:.3f}", summary['error'] or summary['output_file']])
+    failed = len([summary for summary in summaries if summary['status'] != 'ok'])
+    footer = f'{len(summaries)} competitions processed in {total_seconds:.3f} seconds, {failed} failed.'
+    col_widths = [max(len(str(row[column])) for row in table) + 2 for column in range(len(table[0]))]
+    return Table.create_format_table("BATCH SUMMARY", table, col_widths, header_width_space=0, row_align='<') + '\n' + footer
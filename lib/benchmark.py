@@ -0,0 +1,143 @@
+"""
+Scaling benchmark of the file readers, the Result aggregates and the Competition reports.
+
+Every stage is timed on synthetic competitions over a grid of sizes. The results are saved as JSON
+so a later run can be compared against them with a regression threshold.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import datetime
+import tempfile
+from .competition import Competition
+from .synthetic import generate_competition
+
+
+def _result_stages(competition: Competition, challenge_weights: dict) -> dict:
+    """ Returns the Result aggregates to time. Each one is timed from an empty cache, so it includes the aggregates it depends on."""
+    result = competition.result
+    return {
+        'aggregate.student_totals': result.student_totals,
+        'aggregate.challenge_totals': result.challenge_totals,
+        'aggregate.ranking': lambda: result.ranking,
+        'aggregate.weighted_scores': lambda: result.student_scores(challenge_weights),
+        'aggregate.fastest_student': result.fastest_student,
+        'aggregate.highest_score_student': lambda: result.highest_score_student(challenge_weights),
+        'aggregate.hardest_challenge': result.return_hardest_challenge,
+        'leaderboard.top_fastest_50': lambda: result.top_fastest_students(50),
+        'leaderboard.top_wscore_50': lambda: result.top_score_students(50, challenge_weights),
+    }
+
+
+def _report_stages(competition: Competition) -> dict:
+    """ Returns the Competition reports to time, rendered without printing."""
+    return {
+        'report.results': lambda: competition.report_results(True, False),
+        'report.challenges': lambda: competition.report_challenges(True, False),
+        'report.student': lambda: competition.report_student(True, False),
+    }
+
+
+def _best_time(function, repeat: int, before = None) -> float:
+    """ Returns the best time in seconds of repeat calls of the function. The before function is called untimed before each call."""
+    best = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_size(directory: str, no_students: int, no_challenges: int, repeat: int = 3, **generator_options) -> list:
+    """
+    Generate a competition of the given size and time every stage on it.
+
+    Returns:
+    - list: One {'students', 'challenges', 'stage', 'seconds'} record per stage.
+    """
+    files = generate_competition(directory, no_students, no_challenges, **generator_options)
+    competition = Competition()
+    timings = {
+        'read.results': _best_time(lambda: competition.read_results(files[0]), repeat),
+        'read.challenges': _best_time(lambda: competition.read_challenges(files[1]), repeat, lambda: setattr(competition, 'challenge_manager', type(competition.challenge_manager)())),
+        'read.students': _best_time(lambda: competition.read_students(files[2]), repeat, lambda: setattr(competition, 'student_manager', type(competition.student_manager)())),
+    }
+    challenge_weights = competition.challenge_manager.all_challenges_weight()
+    for name, function in _result_stages(competition, challenge_weights).items():
+        timings[name] = _best_time(function, repeat, competition.result.invalidate_cache)
+    for name, function in _report_stages(competition).items():
+        timings[name] = _best_time(function, repeat, competition.result.invalidate_cache)
+    return [{'students': no_students, 'challenges': no_challenges, 'stage': stage, 'seconds': seconds} for stage, seconds in timings.items()]
+
+
+def run_benchmark(student_sizes: list, challenge_sizes: list, repeat: int = 3, directory: str = None, **generator_options) -> dict:
+    """
+    Time every stage over the grid of student and challenge sizes.
+
+    Input:
+    - student_sizes (list): The numbers of students of the grid.
+    - challenge_sizes (list): The numbers of challenges of the grid.
+    - repeat (int): The number of runs of each stage, the best time is kept.
+    - directory (str): The folder of the generated files. A temporary folder if None.
+    - generator_options: Passed to generate_competition (ongoing_ratio, absent_ratio, special_ratio, postgraduate_ratio, seed).
+
+    Returns:
+    - dict: {'meta': {...}, 'results': [...]} ready to be saved as JSON.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        for no_students in student_sizes:
+            for no_challenges in challenge_sizes:
+                size_directory = os.path.join(directory or temporary_directory, f'{no_students}x{no_challenges}')
+                results.extend(benchmark_size(size_directory, no_students, no_challenges, repeat, **generator_options))
+    meta = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'generator': generator_options,
+    }
+    return {'meta': meta, 'results': results}
+
+
+def save_benchmark(benchmark: dict, file_name: str) -> None:
+    """ Save the benchmark results as JSON."""
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(benchmark, file, indent=2)
+
+
+def load_benchmark(file_name: str) -> dict:
+    """ Load benchmark results saved by save_benchmark."""
+    with open(file_name, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare_benchmarks(baseline: dict, current: dict, threshold: float = 0.2, min_seconds: float = 0.001) -> list:
+    """
+    Compare the current benchmark against a baseline.
+
+    Input:
+    - threshold (float): The allowed slowdown. 0.2 means a stage may be up to 20% slower than the baseline.
+    - min_seconds (float): Stages faster than this in both runs are ignored, their timing is mostly noise.
+
+    Returns:
+    - list: One {'students', 'challenges', 'stage', 'baseline', 'current', 'ratio', 'regression'} record per stage found in both runs.
+    """
+    baseline_times = {(record['students'], record['challenges'], record['stage']): record['seconds'] for record in baseline['results']}
+    comparison = []
+    for record in current['results']:
+        key = (record['students'], record['challenges'], record['stage'])
+        if key not in baseline_times:
+            continue
+        old, new = baseline_times[key], record['seconds']
+        ratio = new / old if old > 0 else float('inf')
+        regression = max(old, new) >= min_seconds and ratio > 1 + threshold
+        comparison.append({'students': key[0], 'challenges': key[1], 'stage': key[2], 'baseline': old, 'current': new,
+                           'ratio': round(ratio, 3), 'regression': regression})
+    return comparison
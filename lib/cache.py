@@ -0,0 +1,71 @@
+"""
+Memoized cache for the derived aggregates of the result table.
+"""
+
+from .profiling import span
+
+
+class AggregateCache():
+    """
+    Cache of derived aggregates keyed by a tuple, the aggregate name first.
+
+    Attributes:
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that had to compute the aggregate.
+        computed (dict): The number of times each aggregate name was computed {name: count}.
+    """
+    def __init__(self):
+        self.__values = {}
+        self.hits = 0
+        self.misses = 0
+        self.computed = {}
+
+    def __str__(self):
+        return f'{self.__class__.__name__}(hits={self.hits}, misses={self.misses})'
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.__values
+
+    def get(self, key: tuple, compute):
+        """
+        Return the cached value of the key, computing and storing it on a miss.
+
+        Input:
+        - key (tuple): The key of the aggregate. Ex: ('scores', (('C01', 1.0),))
+        - compute (callable): A function without argument that computes the aggregate.
+        """
+        if key in self.__values:
+            self.hits += 1
+            return self.__values[key]
+        self.misses += 1
+        self.computed[key[0]] = self.computed.get(key[0], 0) + 1
+        with span('compute.' + key[0]): # Every aggregate computation is timed when tracing
+            value = compute()
+        self.__values[key] = value
+        return value
+
+    def peek(self, key: tuple, default = None):
+        """ Return the cached value of the key without computing it or counting a hit or a miss."""
+        return self.__values.get(key, default)
+
+    def invalidate(self, name: str = None) -> None:
+        """
+        Remove the cached aggregates.
+
+        Input:
+        - name (str): Only remove the aggregates with this name. Remove everything if None.
+        """
+        if name is None:
+            self.__values.clear()
+        else:
+            self.__values = {key: value for key, value in self.__values.items() if key[0] != name}
+
+    def reset_stats(self) -> None:
+        """ Reset the hit and miss counters."""
+        self.hits = 0
+        self.misses = 0
+        self.computed = {}
+
+    def stats(self) -> dict:
+        """ Returns the counters of the cache as a dictionary."""
+        return {'hits': self.hits, 'misses': self.misses, 'computed': dict(self.computed)}
@@ -2,6 +2,8 @@
 Challenge class
 """
 
+from array import array
+
 class Challenge():
     """
     Challenge class
@@ -13,10 +15,13 @@ class Challenge():
         weight (float): The weight of the challenge.
     
     """
+    __slots__ = ('__id', '__name', '__type', '__weight', '__index') # No per-instance __dict__
+
     def __init__(self, id:str, name:str):
         self.__id = id
         self.__name = name
         self.__type = None
+        self.__index = None # The ID index of the ChallengeManager holding the challenge, kept up to date by the id setter
     
     def __str__(self):
         """ Returns a string representation of the challenge."""
@@ -29,7 +34,17 @@ class Challenge():
     
     @id.setter
     def id(self, new_id):
-        self.__id = str(new_id)
+        new_id = str(new_id)
+        if self.__index is not None and new_id != self.__id: # The manager finds the challenge by its new ID
+            if new_id in self.__index:
+                raise ValueError(f"Duplicate challenge ID {new_id}")
+            del self.__index[self.__id]
+            self.__index[new_id] = self
+        self.__id = new_id
+
+    def _set_index(self, index: dict) -> None:
+        """ Attach the challenge to the ID index of a ChallengeManager, or detach it if None."""
+        self.__index = index
     
     @property
     def type(self):
@@ -70,6 +85,7 @@ class MandatoryChallenge(Challenge):
         name (str): The name of the challenge.
         weight (float): The weight of the challenge. Default for mandatory challenges is 1.0.
     """
+    __slots__ = ('__type',)
     weight = 1.0 # Mandatory challenges always have a weight of 1.0
 
     def __init__(self, id, name):
@@ -104,6 +120,8 @@ class SpecialChallenge(Challenge):
         name (str): The name of the challenge.
         weight (float): The weight of the challenge. Must be larger than 1.0.
     """
+    __slots__ = ('__type', '__weight')
+
     def __init__(self, id, name, weight):
         super().__init__(id, name)  # Remove the 'type' argument from the super().__init__() method call
         self.__type = 'S'
@@ -153,6 +171,27 @@ class ChallengeFactory():
         Raises:
             ValueError: If an invalid challenge type is provided.
         """
+        weight = ChallengeFactory.check_record(id, challenge_type, name, weight)
+
+        # Create the challenge object
+        if challenge_type == "M":
+            return MandatoryChallenge(id, name)
+        elif challenge_type == "S":
+            return SpecialChallenge(id, name, weight)
+        else:
+            raise ValueError("Invalid type")
+
+    @staticmethod
+    def check_record(id:str, challenge_type:str, name:str, weight = 1.0) -> float:
+        """
+        Check the fields of a challenge record.
+
+        Returns:
+            float: The weight of the challenge as a float.
+
+        Raises:
+            ValueError: If a field is invalid.
+        """
         # Validate id
         if not isinstance(id, str):
             raise ValueError("id must be an integer")
@@ -169,23 +208,155 @@ class ChallengeFactory():
         weight = float(weight)
         if not isinstance(weight, (int, float)) or weight < 1.0:
             raise ValueError("weight must be a number greater than or equal to 1.0")
+        return weight
 
-        # Create the challenge object
-        if challenge_type == "M":
-            return MandatoryChallenge(id, name)
-        elif challenge_type == "S":
-            return SpecialChallenge(id, name, weight)
-        else:
-            raise ValueError("Invalid type")
 
-class ChallengeManager():
-    """ This class is responsible for managing challenges."""
+class ChallengeView(Challenge):
+    """
+    A challenge read from a compact ChallengeRoster. The view is created on demand and reads and writes the roster.
+    """
+    __slots__ = ('__roster', '__challenge_id')
+
+    def __init__(self, roster, challenge_id):
+        self.__roster = roster
+        self.__challenge_id = challenge_id
+
+    def __str__(self):
+        """ Returns a string representation of the challenge."""
+        return f'{self.name}({self.type})'
+
+    def __repr__(self):
+        return f'{self.id}, {self.type}, {self.name}, {self.weight}'
+
+    def __eq__(self, other):
+        return isinstance(other, ChallengeView) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.__challenge_id)
+
+    @property
+    def id(self):
+        """ Returns the ID of the challenge."""
+        return self.__challenge_id
+
+    @id.setter
+    def id(self, new_id):
+        self.__roster.rename(self.__challenge_id, str(new_id))
+        self.__challenge_id = str(new_id)
+
+    @property
+    def type(self):
+        """ Returns the type of the challenge."""
+        return chr(self.__roster.types[self.__roster.row(self.__challenge_id)])
+
+    @property
+    def name(self):
+        """ Returns the name of the challenge."""
+        return self.__roster.names[self.__roster.row(self.__challenge_id)]
+
+    @name.setter
+    def name(self, new_name:str):
+        self.__roster.names[self.__roster.row(self.__challenge_id)] = str(new_name)
+
+    @property
+    def weight(self):
+        """ Returns the weight of the challenge."""
+        return self.__roster.weights[self.__roster.row(self.__challenge_id)]
+
+    @weight.setter
+    def weight(self, new_weight):
+        if float(new_weight) < 1.0:
+            raise ValueError("Invalid weight. Challenges must have a weight of at least 1.0.")
+        self.__roster.weights[self.__roster.row(self.__challenge_id)] = float(new_weight)
+
+
+class ChallengeRoster():
+    """
+    Struct-of-arrays storage of challenges: the IDs and the names in lists, the type of each challenge
+    as a single byte code and the weights in a float array. Challenge objects are only created as ChallengeView
+    when a caller asks for one.
+
+    Attributes:
+        ids (list): The challenge IDs in roster order.
+        names (list): The challenge names.
+        types (bytearray): The type code of each challenge (ord('M') or ord('S')).
+        weights (array): The weight of each challenge.
+    """
+    __slots__ = ('ids', 'names', 'types', 'weights', '__index')
+
     def __init__(self):
-        self.__challenges = []
+        self.ids = []
+        self.names = []
+        self.types = bytearray()
+        self.weights = array('d')
+        self.__index = {} # The row of each challenge ID {challenge_id: row}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, challenge_id) -> bool:
+        return challenge_id in self.__index
+
+    def __iter__(self):
+        for challenge_id in list(self.ids): # A copy, so a challenge can be removed while iterating
+            yield ChallengeView(self, challenge_id)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [ChallengeView(self, challenge_id) for challenge_id in self.ids[position]]
+        return ChallengeView(self, self.ids[position])
+
+    def row(self, challenge_id) -> int:
+        """ Returns the row of the challenge. Raises KeyError if the challenge is not in the roster."""
+        return self.__index[challenge_id]
+
+    def append(self, challenge_id, challenge_type, name, weight) -> None:
+        """ Add a challenge at the end of the roster, rejecting duplicate IDs."""
+        if challenge_id in self.__index:
+            raise ValueError(f"Duplicate challenge ID {challenge_id}")
+        self.__index[challenge_id] = len(self.ids)
+        self.ids.append(challenge_id)
+        self.names.append(name)
+        self.types.append(ord(challenge_type))
+        self.weights.append(weight)
+
+    def rename(self, challenge_id, new_id) -> None:
+        """ Change the ID of a challenge, keeping its row."""
+        if new_id in self.__index:
+            raise ValueError(f"Duplicate challenge ID {new_id}")
+        row = self.__index.pop(challenge_id)
+        self.ids[row] = new_id
+        self.__index[new_id] = row
+
+    def remove(self, challenge_id) -> None:
+        """ Remove a challenge from the roster. Raises KeyError if the challenge is not in the roster."""
+        row = self.__index.pop(challenge_id)
+        del self.ids[row]
+        del self.names[row]
+        del self.types[row]
+        del self.weights[row]
+        for next_row in range(row, len(self.ids)): # The following challenges move up a row
+            self.__index[self.ids[next_row]] = next_row
+
+class ChallengeManager():
+    """ This class is responsible for managing challenges.
+
+    Attributes:
+        compact (bool): Keep the challenges in a ChallengeRoster instead of a list of objects.
+    """
+    def __init__(self, compact = False):
+        self.__compact = compact
+        self.__challenges = ChallengeRoster() if compact else [] # A list of challenge objects, or the compact roster
+        self.__index = {} # The challenge objects by ID {challenge_id: challenge}. Not used by the compact roster
+
+    @property
+    def compact(self) -> bool:
+        """ Returns True if the challenges are kept in a compact roster."""
+        return self.__compact
 
     @property
     def challenges(self)-> list:
-        """ Returns the list of challenges."""
+        """ Returns the list of challenges. The compact roster creates the challenge views while it is iterated."""
         return self.__challenges
     
     def list_challenge_id(self) -> list:
@@ -195,23 +366,41 @@ class ChallengeManager():
         Returns:
             list: A list of challenges id
         """
+        if self.__compact:
+            return list(self.__challenges.ids)
         return [challenge.id for challenge in self.__challenges]
     
+    def __insert(self, challenge) -> None:
+        """ Adds a challenge object to the list and the index, rejecting duplicate IDs."""
+        if challenge.id in self.__index:
+            raise ValueError(f"Duplicate challenge ID {challenge.id}")
+        self.__challenges.append(challenge)
+        self.__index[challenge.id] = challenge
+        challenge._set_index(self.__index)
+
     def add_challenge(self, challenge_id, challenge_type, name, weight = 1.0) -> None:
         """ Adds a challenge to the list of challenges."""
+        if self.__compact: # Only the fields are kept, the roster rejects duplicate IDs
+            weight = ChallengeFactory.check_record(challenge_id, challenge_type, name, weight)
+            self.__challenges.append(challenge_id, challenge_type, name, MandatoryChallenge.weight if challenge_type == 'M' else weight)
+            return
         new_challenge = ChallengeFactory.create_challenge(challenge_id, challenge_type, name, weight)
-        self.__challenges.append(new_challenge)
+        self.__insert(new_challenge)
     
     def remove_challenge(self, challenge):
         """ Removes a challenge from the list of challenges."""
+        if self.__compact:
+            self.__challenges.remove(challenge.id)
+            return
         self.__challenges.remove(challenge)
+        del self.__index[challenge.id]
+        challenge._set_index(None)
     
     def get_challenge(self, challenge_id):
-        """ Returns a challenge with the given ID."""
-        for ch in self.__challenges:
-            if ch.id == challenge_id:
-                return ch
-        return None
+        """ Returns a challenge with the given ID. A ChallengeView created on demand for the compact roster."""
+        if self.__compact:
+            return ChallengeView(self.__challenges, challenge_id) if challenge_id in self.__challenges else None
+        return self.__index.get(challenge_id)
     
     def read_challenge_file(self, file_name):
         """
@@ -224,18 +413,43 @@ class ChallengeManager():
         if file_name is None:
             raise ValueError(f"Missing challenge file {file_name}")
         with open(file_name, "r", encoding="utf-8") as file:
-            for line in file:
-                if ',' not in line:
-                    raise ValueError("Challenge record must contain comma")
-                elements = [item.strip() for item in line.strip().split(",")]
-                if len(elements) == 4:
-                    challenge_obj = ChallengeFactory.create_challenge(elements[0], elements[1], elements[2], elements[3])
-                    self.__challenges.append(challenge_obj)
-                else:
-                    raise ValueError("Unexpected number of elements in challenge record or record is not separated by comma")
+            self.read_challenge_lines(file)
+
+    def read_challenge_lines(self, lines):
+        """
+        Add the challenges of the lines of a challenge file.
+
+        Input:
+        - lines (iterable): The lines of the file. Ex: an open file or the lines appended to it.
+        """
+        for line in lines:
+            self.add_challenge(*self.split_record(line))
+
+    @staticmethod
+    def split_record(line: str) -> list:
+        """
+        Split a line of the challenge file into its stripped fields: ID, type, name and weight.
+
+        Raises:
+        - ValueError: If the line is not separated by comma or does not have 4 fields.
+        """
+        if ',' not in line:
+            raise ValueError("Challenge record must contain comma")
+        elements = [item.strip() for item in line.strip().split(",")]
+        if len(elements) != 4:
+            raise ValueError("Unexpected number of elements in challenge record or record is not separated by comma")
+        return elements
     
+    def all_challenges_type(self) -> dict:
+        """ Returns the type of all challenges as a dictionary with challenge ID as key and type as value."""
+        if self.__compact:
+            return dict(zip(self.__challenges.ids, map(chr, self.__challenges.types)))
+        return {challenge.id: challenge.type for challenge in self.__challenges}
+
     def all_challenges_weight(self):
         """ Returns the total weight of all challenges as a dictionary with challenge ID as key and weight as value."""
+        if self.__compact:
+            return dict(zip(self.__challenges.ids, self.__challenges.weights))
         challenge_weight = {}
         for ch in self.__challenges:
             challenge_weight[ch.id] = ch.weight
@@ -0,0 +1,171 @@
+"""
+Memory-mapped parallel reader for very large result files.
+
+The file is memory-mapped and the student lines after the header are split into byte ranges that end on a
+new line. Each range is parsed by a worker process straight into one array('d') of times and one array('b')
+of status codes per challenge column, then the blocks are concatenated in the order of the ranges so the
+rows keep the order of the file.
+
+The workers do not know the line number of their first line. A worker that meets an invalid line stops and
+returns its position in the range, the line is parsed again once the line numbers of the previous ranges are
+known so the error reports the line number of the file, as ResultFileReader does.
+"""
+
+import os
+import mmap
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from .matrix import ResultMatrix
+from .reader import process_header_cell, split_result_line, parse_result_line
+
+MIN_CHUNK_BYTES = 1 << 20 # Smallest range given to a worker, smaller files are parsed in the calling process
+CHUNKS_PER_WORKER = 4 # Ranges per worker, so a worker that finishes early takes another range
+
+
+def parse_range(file_name: str, start: int, end: int, width: int) -> tuple:
+    """
+    Parse the student lines between two byte offsets of the result file.
+
+    Input:
+    - file_name (str): The path to the result file.
+    - start (int), end (int): The byte range to parse. Both are at the start of a line or at the end of the file.
+    - width (int): The number of cells of each line, the student ID and one cell per challenge.
+
+    Returns:
+    - tuple: (n_lines, student_ids, times, status, error). times and status hold the bytes of one array per
+        column. error is None or the (index, line) of the first invalid line, index counted from the start of the range.
+    """
+    with open(file_name, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        lines = mapped[start:end].decode("utf-8").split('\n')
+    if lines[-1] == '': # The range ends with a new line
+        lines.pop()
+    student_ids = []
+    times = [array('d') for _ in range(width - 1)]
+    status = [array('b') for _ in range(width - 1)]
+    error = None
+    for index, line in enumerate(lines):
+        if not line.strip(): # Skip blank lines such as a trailing new line
+            continue
+        try:
+            student_id, cells = parse_result_line(line, index + 1, width)
+        except ValueError:
+            error = (index, line)
+            break
+        student_ids.append(student_id)
+        for column, (cell_status, cell_time) in enumerate(cells):
+            status[column].append(cell_status)
+            times[column].append(cell_time)
+    return len(lines), student_ids, [column.tobytes() for column in times], [column.tobytes() for column in status], error
+
+
+class ChunkedResultReader():
+    """
+    Read a result file with a pool of worker processes.
+
+    Attributes:
+        file_name (str): The path to the result file.
+        workers (int): The number of worker processes. Default is the number of CPUs.
+        min_chunk_bytes (int): The smallest byte range given to a worker.
+        label (str): The top left cell of the header.
+        challenge_ids (list): The challenge IDs of the header.
+    """
+    def __init__(self, file_name: str, workers: int = None, min_chunk_bytes: int = MIN_CHUNK_BYTES):
+        if workers is not None and workers < 1:
+            raise ValueError("The number of workers must be at least 1")
+        if min_chunk_bytes < 1:
+            raise ValueError("Chunk size must be at least 1 byte")
+        self.file_name = file_name
+        self.workers = workers or os.cpu_count() or 1
+        self.min_chunk_bytes = min_chunk_bytes
+        self.label = None
+        self.challenge_ids = None
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.file_name}, {self.workers} workers)'
+
+    def __read_header(self, mapped) -> tuple:
+        """
+        Read the header, the first line that is not blank.
+
+        Returns:
+        - tuple: (offset, line_no), the byte offset of the line after the header and the line number of the header.
+
+        Raises:
+        - ValueError: If the file has no header.
+        """
+        offset = 0
+        line_no = 0
+        while offset < len(mapped):
+            end = mapped.find(b'\n', offset)
+            end = len(mapped) if end < 0 else end + 1
+            line = mapped[offset:end].decode("utf-8")
+            line_no += 1
+            offset = end
+            if line.strip():
+                header = [process_header_cell(cell) for cell in split_result_line(line, line_no)]
+                self.label, self.challenge_ids = header[0], header[1:]
+                return offset, line_no
+        raise ValueError("No result in the competition")
+
+    def ranges(self, mapped, start: int) -> list:
+        """ Returns the (start, end) byte ranges of the student lines, each range ends after a new line or at the end of the file."""
+        size = len(mapped)
+        chunk = max(self.min_chunk_bytes, -(-(size - start) // (self.workers * CHUNKS_PER_WORKER)))
+        ranges = []
+        while start < size:
+            end = mapped.find(b'\n', min(start + chunk, size) - 1)
+            end = size if end < 0 else end + 1
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def read_into(self, matrix: ResultMatrix = None) -> ResultMatrix:
+        """
+        Read the whole file into a result matrix.
+
+        Input:
+        - matrix (ResultMatrix): The matrix to fill. A new matrix is created from the header if None.
+
+        Raises:
+        - ValueError: If the file is empty or a line is invalid, with the line number in the file.
+        """
+        if os.path.getsize(self.file_name) == 0: # An empty file cannot be memory-mapped
+            raise ValueError("No result in the competition")
+        with open(self.file_name, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start, line_no = self.__read_header(mapped)
+            ranges = self.ranges(mapped, start)
+        if matrix is None:
+            matrix = ResultMatrix(self.challenge_ids, self.label)
+        elif matrix.challenge_ids != self.challenge_ids:
+            raise ValueError(f"The challenges of {self.file_name} do not match the result table")
+        width = len(self.challenge_ids) + 1
+        arguments = ([self.file_name] * len(ranges), [start for start, _ in ranges], [end for _, end in ranges], [width] * len(ranges))
+        if self.workers == 1 or len(ranges) <= 1: # Avoid the cost of a process pool for a small file
+            self.__concatenate(matrix, map(parse_range, *arguments), line_no)
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(ranges))) as executor:
+                self.__concatenate(matrix, executor.map(parse_range, *arguments), line_no)
+        return matrix
+
+    @staticmethod
+    def __concatenate(matrix: ResultMatrix, blocks, line_no: int) -> None:
+        """
+        Append the parsed blocks to the matrix in the order of the ranges.
+
+        Input:
+        - blocks (iterable): The results of parse_range, in the order of the file.
+        - line_no (int): The line number of the header.
+        """
+        for n_lines, student_ids, times, status, error in blocks:
+            for student_id in student_ids:
+                if student_id in matrix.student_index:
+                    raise ValueError(f"Duplicate student ID {student_id} in result record")
+                matrix.student_index[student_id] = len(matrix.student_ids)
+                matrix.student_ids.append(student_id)
+            for column in range(matrix.n_challenges):
+                matrix.times[column].frombytes(times[column])
+                matrix.status[column].frombytes(status[column])
+            if error is not None:
+                index, line = error
+                parse_result_line(line, line_no + index + 1, matrix.n_challenges + 1) # Raise the error with the line number in the file
+            line_no += n_lines
@@ -3,10 +3,17 @@ Competition class to store the competition data and process the data
 
 """
 import sys
+import itertools
 from .student import StudentManager
 from .challenge import ChallengeManager
 from .result import Result
-from .misc import Table, TextEditor
+from .ranking import ScoringRule
+from .matrix import parse_cell
+from .misc import Table, TextEditor, Control
+from .snapshot import SnapshotCache
+from .profiling import span
+from .eligibility import EligibilityEvaluator
+from .query import StudentQuery
 
 class Competition():
     """ Competition class to store the competition data and process the data
@@ -16,10 +23,17 @@ class Competition():
         challenges (list): A list of challenges
         students (list): A list of students
     """
-    def __init__(self):
-        self.result = Result()
-        self.student_manager = StudentManager()
-        self.challenge_manager = ChallengeManager()
+    CHALLENGE_HEADER = ['Challenge', 'Name', 'Type', 'Weight', 'Nfinish', 'Nongoing', 'AverageTime'] # The columns of the challenge report
+    STUDENT_HEADER = ['Student', 'Name', 'Type', 'Nfinish', 'Nongoing', 'AverageTime', 'Score', 'Wscore'] # The columns of the student report
+    # The sections of report_all and the number of input files each one needs (results, then challenges, then students)
+    REPORT_SECTIONS = {'results': 1, 'challenges': 2, 'students': 3, 'top': 1}
+
+    def __init__(self, compact = False, parse_workers: int = None, rank_workers: int = None, scoring_rule: ScoringRule = None):
+        self.result = Result(rank_workers=rank_workers, scoring_rule=scoring_rule)
+        self.parse_workers = parse_workers # The result file is parsed by this many processes when given
+        self.student_manager = StudentManager(compact) # The compact mode keeps the rosters as arrays instead of objects
+        self.challenge_manager = ChallengeManager(compact)
+        self.input_files = [] # The files read by read_all_files_on_command
 
     def __str__(self):
         """Return a string representation of the competition object."""
@@ -34,7 +48,8 @@ class Competition():
         - result_file (str): The path to the file to read.
             If None, use the value of the result_file attribute.
         """
-        self.result.read_results_file(result_file)
+        with span('read.results', file=result_file):
+            self.result.read_results_file(result_file, workers=self.parse_workers)
     
     def report_results(self, return_table = False, print_terminal = True) -> str:
         """
@@ -51,18 +66,35 @@ class Competition():
         Input:
         - return_table (bool): Return the table as a format string of the report if True.
         """
-        table = self.result # Get the result table
-        no_student = table.return_no_students()
-        no_challenge = table.return_no_challenges()
-        fastest_student, fastest_time = table.fastest_student()
-        table = Table.create_format_table("COMPETITION DASHBOARD", table.result_array, col_widths=None, width_space=8, header_width_space=5, header_align='^', row_align='^')
-        footer = f'There are {no_student} students and {no_challenge} challenges.\n' \
-                f'The top student is {fastest_student} with an average time of {fastest_time} minutes.'
-        table += '\n' + footer
+        return self._output_report(self.iter_report_results(), return_table, print_terminal)
+
+    @staticmethod
+    def _output_report(lines, return_table = False, print_terminal = True) -> str:
+        """ Join the lines of a report then print and/or return it."""
+        with span('render.report'):
+            table = '\n'.join(lines)
         if print_terminal:
             print(table)
         if return_table:
             return table
+
+    def iter_report_results(self):
+        """ Yield the lines of the report_results table and its footer one by one."""
+        table = self.result # Get the result table
+        rows = table.iter_student_rows() # The rows are rendered one by one instead of copying the whole table
+        yield from Table.iter_format_table("COMPETITION DASHBOARD", itertools.chain([table.header_row()], rows), col_widths=None, width_space=8, header_width_space=5, header_align='^', row_align='^')
+        yield from self.results_footer()
+
+    def results_footer(self) -> list:
+        """ Returns the footer lines of the report_results table."""
+        table = self.result
+        fastest_student, fastest_time = table.fastest_student()
+        footer = [f'There are {table.return_no_students()} students and {table.return_no_challenges()} challenges.']
+        if fastest_student is None:
+            footer.append('No student has finished a challenge yet.')
+        else:
+            footer.append(f'The top student is {fastest_student} with an average time of {fastest_time} minutes.')
+        return footer
         
     def read_students(self, file):
         """
@@ -72,7 +104,14 @@ class Competition():
         - file (str): The path to the file to read. If None, use the value of the students attribute.
         
         """
-        self.student_manager.read_student_file(file)
+        with span('read.students', file=file):
+            self.student_manager.read_student_file(file)
+        self.invalidate_roster_cache()
+
+    def invalidate_roster_cache(self) -> None:
+        """ Remove the cached aggregates that depend on the student types or the challenge weights.
+        Must be called after a roster is read or changed in place."""
+        self.result.cache.invalidate('query_index')
     
     def find_student(self, student_id: str):
         """
@@ -108,8 +147,45 @@ class Competition():
         - Challenge: The challenge object with the given ID.
         """
         return self.challenge_manager.get_challenge(challenge_id)
-                
-    def read_all_files_on_command(self):
+
+    def record_result(self, student_id: str, challenge_id: str, value) -> None:
+        """
+        Record a new result during the competition. The averages and ranks are updated incrementally.
+
+        Input:
+        - student_id (str): The ID of the student.
+        - challenge_id (str): The ID of the challenge.
+        - value (str or float): The result as written in the result file. Ex: 12.5, '444' or 'TBA' for ongoing, '-1' for not attempted.
+        """
+        status, time = parse_cell(str(value))
+        self.result.set_result(student_id, challenge_id, status, time)
+
+    def add_student(self, student_id: str, name: str, student_type: str) -> None:
+        """
+        Add a new student to the competition with an empty row of results.
+
+        Input:
+        - student_id (str): The ID of the student. Must start with 'S'.
+        - name (str): The name of the student.
+        - student_type (str): 'U' for Undergraduate, 'P' for Postgraduate.
+        """
+        self.student_manager.add_student_record(student_id, name, student_type)
+        self.result.add_student_row(student_id)
+
+    def add_challenge(self, challenge_id: str, challenge_type: str, name: str, weight = 1.0) -> None:
+        """
+        Add a new challenge to the competition with an empty column of results.
+
+        Input:
+        - challenge_id (str): The ID of the challenge.
+        - challenge_type (str): 'M' for Mandatory, 'S' for Special.
+        - name (str): The name of the challenge.
+        - weight (float): The weight of the challenge.
+        """
+        self.challenge_manager.add_challenge(challenge_id, challenge_type, name, weight)
+        self.result.add_challenge_column(challenge_id)
+
+    def read_all_files_on_command(self, files: list = None, snapshot_dir: str = None, sections: list = None):
         """
         Read all the data from the given files and save it to the appropriate attributes base on the command line arguments.
 
@@ -117,27 +193,70 @@ class Competition():
         - sys.argv[1]: The path to the file to read the results from.
         - sys.argv[2]: The path to the file to read the challenges from.
         - sys.argv[3]: The path to the file to read the students from.
-        
+
+        Input:
+        - files (list): The files to read in the same order, instead of the command line arguments.
+        - snapshot_dir (str): The directory of the parsed competition snapshots. When the input files did not change
+            since the last run, the competition is loaded from its snapshot instead of parsing the files again.
+            The snapshots are not used if None, unless --snapshot-dir or COMPETITION_SNAPSHOT_DIR is given on the command line.
+        - sections (list): Only read the files these report sections need. Every file is read if None.
         """
+        if files is None:
+            arguments = Control.parse_command_line()
+            files = arguments.files
+            snapshot_dir = snapshot_dir or arguments.snapshot_dir
+            sections = sections or arguments.sections
         try:
-            if len(sys.argv) == 1:
-                sys.exit('No results are available for the competition')
-            elif len(sys.argv) == 2:
-                self.read_results(sys.argv[1])
-            elif len(sys.argv) == 3:
-                self.read_results(sys.argv[1])
-                self.read_challenges(sys.argv[2])
-            elif len(sys.argv) == 4:
-                self.read_results(sys.argv[1])
-                self.read_challenges(sys.argv[2])
-                self.read_students(sys.argv[3])
-            else:
-                sys.exit('Invalid number of files')
+            self.read_files(files, snapshot_dir, sections)
         except ValueError as e:
             sys.exit(e)
         except FileNotFoundError as e:
             sys.exit(e)
 
+    def read_files(self, files: list, snapshot_dir: str = None, sections: list = None) -> None:
+        """
+        Read the result file, then optionally the challenge and student files.
+
+        Input:
+        - files (list): The paths to the files in this order.
+        - snapshot_dir (str): The directory of the parsed competition snapshots. Not used if None.
+        - sections (list): Only read the files these report sections need, the other files are not parsed. Every file is read if None.
+
+        Raises:
+        - ValueError: If the number of files is invalid, a section needs a file that is not given or a file is invalid.
+        - FileNotFoundError: If a file does not exist.
+        """
+        files = self.select_files(files, sections)
+        readers = [self.read_results, self.read_challenges, self.read_students]
+        snapshot_cache = SnapshotCache(snapshot_dir) if snapshot_dir else None
+        loaded = False
+        if snapshot_cache is not None:
+            with span('read.snapshot.load'):
+                loaded = snapshot_cache.load(self, files)
+        if not loaded:
+            for reader, file in zip(readers, files):
+                reader(file)
+            if snapshot_cache is not None:
+                with span('read.snapshot.save'):
+                    snapshot_cache.save(self, files)
+        self.input_files = files
+
+    def select_files(self, files: list, sections: list = None) -> list:
+        """
+        Check the number of input files and keep only the files the report sections need.
+
+        Raises:
+        - ValueError: If the number of files is invalid or a section needs a file that is not given.
+        """
+        files = list(files)
+        if len(files) == 0:
+            raise ValueError('No results are available for the competition')
+        elif len(files) > 3:
+            raise ValueError('Invalid number of files')
+        if sections is not None:
+            files = files[:max(1, self.files_needed(sections, len(files)))] # The result file is always read
+        return files
+
     def read_challenges(self, file):
         """
         Read the challenges from the given file and save it to the challenges attribute.
@@ -146,7 +265,9 @@ class Competition():
         - file (str): The path to the file to read. If None, use the value of the challenges attribute.
         
         """
-        self.challenge_manager.read_challenge_file(file)
+        with span('read.challenges', file=file):
+            self.challenge_manager.read_challenge_file(file)
+        self.invalidate_roster_cache()
     def report_challenges(self, return_table = False, print_terminal = True) -> str:
         """
         Print the report table of the competition to the console.
@@ -164,38 +285,33 @@ class Competition():
         Input:
         - return_table (bool): Return the table as a format string of the report if True.
         """
-        table =  [['Challenge', 'Name', 'Type', 'Weight', 'Nfinish', 'Nongoing', 'AverageTime']]
+        return self._output_report(self.iter_report_challenges(), return_table, print_terminal)
+
+    def iter_report_challenges(self):
+        """ Yield the lines of the report_challenges table and its footer one by one."""
         table_width = [10, 25, 10, 10, 10, 10, 15]
+        table = [self.CHALLENGE_HEADER] + self.challenge_rows()
+        yield from Table.iter_format_table("CHALLENGE INFORMATION", table, table_width, width_space=8, header_width_space=5, header_align='^', row_align='^')
+        yield from self.challenges_footer()
+
+    def challenge_rows(self) -> list:
+        """ Returns the rows of the report_challenges table, sorted by the average time from low to high.
+        A challenge that no student finished has no average time and comes last."""
         result_table = self.result # Get the latest result
-        most_difficult_challenge, most_difficult_average_time= result_table.return_hardest_challenge() # Get the most difficult challenge
-        inversed_result_table = result_table.transpose() # Invert the result table so that we can get the number of finished and ongoing challenges
         rows = [] # Define row variable for the table
         for challenge in self.challenge_manager.challenges:
-            for row in inversed_result_table[1:]:
-                if row[0] == challenge.id:
-                    valid_result = [float(x) for x in row[1:] if x not in ['--', '', None]]
-                    nfinish = len(valid_result) # Get the number of finished challenges
-                    nongoing = len([x for x in row if x == '--']) # Get the number of ongoing challenges
-                    if nfinish > 0:
-                        average_time = round((sum(valid_result) / nfinish),2) # Calculate the average time and round to 2 decimal places
-                    else:
-                        average_time = None
-                    rows.append([challenge.id, str(challenge), challenge.type, f'{challenge.weight:.1f}', nfinish, nongoing, average_time])
-                    if not most_difficult_average_time or average_time > most_difficult_average_time:
-                        most_difficult_challenge = challenge.id
-                        most_difficult_average_time = average_time
+            statistics = result_table.challenge_statistics(challenge.id) # Get the number of finished and ongoing results and the average time
+            if statistics is not None:
+                nfinish, nongoing, average_time = statistics
+                rows.append([challenge.id, str(challenge), challenge.type, f'{challenge.weight:.1f}', nfinish, nongoing, average_time])
         #sort the table using the key lambda function to sort by the average time from low to high [2]
-        rows = sorted(rows, key=lambda x: x[6])
-        # Add the sorted row to the table
-        for row in rows:
-            table.append(row)
-        table = Table.create_format_table("CHALLENGE INFORMATION", table, table_width, width_space=8, header_width_space=5, header_align='^', row_align='^')
-        footer = f'The most difficult challenge is {most_difficult_challenge} with an average time of {average_time} minutes'
-        table += '\n' + footer
-        if print_terminal:
-            print(table)
-        if return_table:
-            return table
+        return sorted(rows, key=lambda x: (x[6] is None, x[6] or 0.0))
+
+    def challenges_footer(self) -> list:
+        """ Returns the footer lines of the report_challenges table."""
+        most_difficult_challenge, most_difficult_average_time = self.result.return_hardest_challenge() # Get the most difficult challenge
+        return [f'The most difficult challenge is {most_difficult_challenge} with an average time of {most_difficult_average_time} minutes']
+
     def return_student_participation_with_type(self, student_id: str) -> dict:
         """This function take a student id and return a dictionary with the challenge_id as the key and a tuple that contain challenge type and the student particiation status.
 
@@ -211,6 +327,32 @@ class Competition():
             participation_dict[challenge_id] = (challenge_type, participation_dict[challenge_id]) # Update the dictionary with the challenge type
         return participation_dict
 
+    def query(self) -> StudentQuery:
+        """
+        Start a query over the students of the result table. See lib/query.py for the fields.
+
+        Ex: competition.query().where('type', '==', 'P').where('wscore', '>', 10).order_by('wscore', descending=True).limit(10).student_ids()
+        """
+        return StudentQuery(self)
+
+    def student_eligibility(self, with_reasons = False, thresholds: dict = None) -> dict:
+        """
+        Evaluate the requirements of every student of the result table in one pass.
+
+        Input:
+        - with_reasons (bool): Also return why each student does not meet the requirements.
+        - thresholds (dict): The number of special challenges each student type must finish. Default is 1 for U and 2 for P.
+
+        Returns:
+        - dict: {student_id: eligible} where eligible is True, False or None for a student missing from the student file.
+            With with_reasons, {student_id: (eligible, reasons)}.
+        """
+        matrix = self.result.matrix
+        evaluator = EligibilityEvaluator(matrix.challenge_ids, self.challenge_manager.all_challenges_type(), thresholds)
+        student_types = self.student_manager.student_types()
+        eligibility = evaluator.evaluate(matrix, [student_types.get(student_id) for student_id in matrix.student_ids], with_reasons)
+        return dict(zip(matrix.student_ids, eligibility))
+
     def report_student(self, return_table = False, print_terminal = True) -> str:
         """
         Print the report table of the student result to the console.
@@ -229,74 +371,142 @@ class Competition():
         - return_table (bool): Return the table as a format string of the report if True
         - print_terminal (bool): Print the table to the console if True
         """
-        table =  [['Student', 'Name', 'Type', 'Nfinish', 'Nongoing', 'AverageTime', 'Score', 'Wscore']]
+        return self._output_report(self.iter_report_student(), return_table, print_terminal)
+
+    def iter_report_student(self):
+        """ Yield the lines of the report_student table and its footer one by one."""
         table_width = [10, 25, 10, 10, 10, 15, 10 ,10]
-        result_table = self.result
+        table = [self.STUDENT_HEADER] + self.student_rows()
+        yield from Table.iter_format_table("STUDENT INFORMATION", table, table_width, width_space=8, header_width_space=5, header_align='^', row_align='^')
+        yield from self.student_footer()
+
+    def challenge_weights(self) -> dict:
+        """ Returns the weight of each challenge used by the weighted scores, with the type weights of the scoring rule applied."""
         challenge_weights = self.challenge_manager.all_challenges_weight()
+        if self.result.scoring_rule.type_weights is None:
+            return challenge_weights
+        return self.result.scoring_rule.challenge_weights(challenge_weights, self.challenge_manager.all_challenges_type())
+
+    def set_scoring_rule(self, rule: ScoringRule) -> None:
+        """ Score the students with another rule from now on."""
+        self.result.set_scoring_rule(rule)
+
+    def student_rows(self) -> list:
+        """ Returns the rows of the report_student table, sorted by the weighted score from high to low.
+        The name of the students that do not meet the requirements starts with '!'."""
+        result_table = self.result
+        challenge_weights = self.challenge_weights()
+        eligibility = self.student_eligibility() # The requirements of every student are evaluated together
         rows = [] # Define row variable for the table
         for student in self.student_manager.students:
             student_name = student.name
-            for row in result_table.result_array[1:]:
-                if row[0] == student.id:
-                    valid_result = [float(x) for x in row[1:] if x not in ['--', '', None]]
-                    nfinish = len(valid_result)
-                    nongoing = len([x for x in row if x == '--'])
-                    score = result_table.return_student_score(student.id)
-                    wscore = round(result_table.return_student_score(student.id, challenge_weights),2)
-                    if not student.meets_requirements(self.return_student_participation_with_type(student.id)):
-                        student_name = '!'+student_name
-                    if nfinish > 0:
-                        average_time = round((sum(valid_result) / nfinish),2)
-                    else:
-                        average_time = None
-                    rows.append([student.id, student_name, student.type, nfinish, nongoing, average_time, score, wscore])
+            statistics = result_table.student_statistics(student.id) # Get the number of finished and ongoing challenges and the average time
+            if statistics is not None:
+                nfinish, nongoing, average_time = statistics
+                score = result_table.return_student_score(student.id)
+                wscore = round(result_table.return_student_score(student.id, challenge_weights),2)
+                if not eligibility[student.id]:
+                    student_name = '!'+student_name
+                rows.append([student.id, student_name, student.type, nfinish, nongoing, average_time, score, wscore])
         #sort the table using the key lambda function to sort by the weighted score from hight to low [2]
-        rows = sorted(rows, key=lambda x: x[7], reverse=True)
-        # Add the sorted row to the table
-        for row in rows:
-            table.append(row)
-        table = Table.create_format_table("STUDENT INFORMATION", table, table_width, width_space=8, header_width_space=5, header_align='^', row_align='^')
+        return sorted(rows, key=lambda x: x[7], reverse=True)
+
+    def student_footer(self) -> list:
+        """ Returns the footer lines of the report_student table."""
+        result_table = self.result
+        challenge_weights = self.challenge_weights()
+        if result_table.fastest_student()[0] is None:
+            return ['No student has finished a challenge yet.']
         fastest_student_name = self.student_manager.get_student(result_table.fastest_student()[0])
         highest_score_student_name = self.student_manager.get_student(result_table.highest_score_student()[0])
         higest_wscore_student_name = self.student_manager.get_student(result_table.highest_score_student(challenge_weights)[0])
-        footer = f'The student with the fatest average time is {fastest_student_name} with an average time of {result_table.fastest_student()[1]:.2f} minutes.' \
-                f'\nThe student with the highest score is {highest_score_student_name} with a score of {result_table.highest_score_student()[1]}.' \
-                f'\nThe student with the highest weighted score is {higest_wscore_student_name} with a weighted score of {result_table.highest_score_student(challenge_weights)[1]:.1f}.'
-        table += '\n' + footer
-        if print_terminal:
-            print(table)
-        if return_table:
-            return table
+        return [
+            f'The student with the fatest average time is {fastest_student_name} with an average time of {result_table.fastest_student()[1]:.2f} minutes.',
+            f'The student with the highest score is {highest_score_student_name} with a score of {result_table.highest_score_student()[1]}.',
+            f'The student with the highest weighted score is {higest_wscore_student_name} with a weighted score of {result_table.highest_score_student(challenge_weights)[1]:.1f}.',
+        ]
+
+    @classmethod
+    def check_sections(cls, sections: list) -> list:
+        """
+        Check the names of report sections.
+
+        Returns:
+        - list: The sections in the given order without duplicates.
+
+        Raises:
+        - ValueError: If a section is unknown.
+        """
+        unknown = [section for section in sections if section not in cls.REPORT_SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown report section {', '.join(unknown)}. The sections are {', '.join(cls.REPORT_SECTIONS)}")
+        return list(dict.fromkeys(sections))
 
-    def report_all(self, output_file = 'competition_report.txt'):
+    @classmethod
+    def files_needed(cls, sections: list, no_files: int = 3) -> int:
+        """
+        Returns the number of input files the report sections need.
+
+        Input:
+        - sections (list): The names of the sections.
+        - no_files (int): The number of input files available.
+
+        Raises:
+        - ValueError: If a section is unknown or needs more files than available.
+        """
+        needed = max((cls.REPORT_SECTIONS[section] for section in cls.check_sections(sections)), default=0)
+        if needed > no_files:
+            missing = [section for section in sections if cls.REPORT_SECTIONS[section] > no_files]
+            raise ValueError(f"The {', '.join(missing)} section needs {needed} input files, {no_files} given")
+        return needed
+
+    def iter_report_top(self):
+        """ Yield the one line summary of the top student. Only the student averages are computed."""
+        yield self.results_footer()[-1]
+
+    def report_all(self, output_file = 'competition_report.txt', print_terminal = True, sections: list = None):
         """
         Print the report of the competition to the given file.
 
         Input:
         - output_file (str): The path to the file to write. Default is 'competition_report.txt'
+        - print_terminal (bool): Print the report to the console if True
+        - sections (list): The sections to report in this order: 'results', 'challenges', 'students' and 'top' (the one line
+            summary of the top student). Default is every section the input files allow, except 'top'.
+            Only the aggregates of the chosen sections are computed.
         
         Output:
         - A report of the competition to the given file 
             or only print to the console if the output_file is None.
+
+        Raises:
+        - ValueError: If a section is unknown or needs an input file that was not read.
         """
-        print_terminal = True # Define print_terminal variable
-        return_table = True # Define return_table variable
-        content = '' # Define content variable
         footer_message = f'Report {output_file} generated!'
-        if len(sys.argv) == 2 : # Define output_file variable
-            content += self.report_results(return_table, print_terminal)+'\n'
-            print(footer_message)
-        elif len(sys.argv) == 3 :
-            content += self.report_results(return_table, print_terminal)+'\n'
-            content += self.report_challenges(return_table, print_terminal)+'\n'
-            print(footer_message)
-        elif len(sys.argv) == 4:
-            content += self.report_results(return_table, print_terminal)+'\n'
-            content += self.report_challenges(return_table, print_terminal)+'\n'
-            content += self.report_student(return_table, print_terminal)+'\n'
+        no_files = len(self.input_files) # The default sections depend on the number of files read
+        if sections is None:
+            sections = ['results', 'challenges', 'students'][:no_files]
+        self.files_needed(sections, no_files)
+        generators = {'results': self.iter_report_results, 'challenges': self.iter_report_challenges,
+                      'students': self.iter_report_student, 'top': self.iter_report_top}
+        # The line generators of the sections to report
+        sections = [generators[section] for section in self.check_sections(sections)]
+        # The report is streamed line by line to the terminal and the file instead of being joined in memory,
+        # the log drops the part already written if a section raises
+        TextEditor.add_to_file(output_file, self._iter_report_content(sections, footer_message, print_terminal))
+
+    @staticmethod
+    def _iter_report_content(sections: list, footer_message: str, print_terminal = True):
+        """ Yield the content of the report file line by line, printing each line to the terminal as it goes."""
+        for section in sections:
+            with span('render.' + section.__name__.replace('iter_report_', '')):
+                for line in section():
+                    if print_terminal:
+                        print(line)
+                    yield line + '\n'
+        if sections and print_terminal:
             print(footer_message)
-        content += f'{footer_message}\n' # Add the footer message to the content so terminal content and file content are the same
-        TextEditor.add_to_file(output_file, content)
+        yield f'{footer_message}\n' # Add the footer message to the content so terminal content and file content are the same
 
         
 
@@ -0,0 +1,106 @@
+"""
+Bulk evaluation of the competition requirements of every student.
+
+A student meets the requirements when they finished every mandatory challenge and at least the number of
+special challenges of their type (1 for undergraduates, 2 for postgraduates).
+"""
+
+from .matrix import FINISHED
+
+SPECIAL_THRESHOLDS = {'U': 1, 'P': 2} # The number of special challenges each student type must finish
+
+
+class EligibilityEvaluator():
+    """
+    Evaluate the requirements of every student of a result matrix at once.
+
+    The mandatory and special columns are found once from the challenge types, then the completions of every
+    student are counted in one pass over the status columns.
+
+    Attributes:
+        mandatory_columns (list): The columns of the mandatory challenges.
+        special_columns (list): The columns of the special challenges.
+        thresholds (dict): The number of special challenges each student type must finish {type: count}.
+    """
+    def __init__(self, challenge_ids: list, challenge_types: dict, thresholds: dict = None):
+        """
+        Input:
+        - challenge_ids (list): The challenge of each column of the result matrix.
+        - challenge_types (dict): The type of each challenge {challenge_id: 'M' or 'S'}. Columns of unknown challenges are ignored.
+        - thresholds (dict): The number of special challenges each student type must finish. Default is SPECIAL_THRESHOLDS.
+        """
+        self.challenge_ids = list(challenge_ids)
+        self.mandatory_columns = [column for column, challenge_id in enumerate(self.challenge_ids) if challenge_types.get(challenge_id) == 'M']
+        self.special_columns = [column for column, challenge_id in enumerate(self.challenge_ids) if challenge_types.get(challenge_id) == 'S']
+        self.thresholds = dict(SPECIAL_THRESHOLDS if thresholds is None else thresholds)
+
+    def counts(self, matrix) -> tuple:
+        """
+        Count the completions of every student.
+
+        Returns:
+        - tuple: (missing_mandatory, special_finished), the number of unfinished mandatory challenges and
+            of finished special challenges of each row.
+        """
+        missing_mandatory = [0] * matrix.n_students
+        special_finished = [0] * matrix.n_students
+        for column in self.mandatory_columns:
+            missing_mandatory = [count + (status != FINISHED) for count, status in zip(missing_mandatory, matrix.status[column])]
+        for column in self.special_columns:
+            special_finished = [count + (status == FINISHED) for count, status in zip(special_finished, matrix.status[column])]
+        return missing_mandatory, special_finished
+
+    def evaluate(self, matrix, student_types: list, with_reasons = False) -> list:
+        """
+        Evaluate the requirements of every student of the matrix.
+
+        Input:
+        - matrix (ResultMatrix): The results, with the columns in the order of challenge_ids.
+        - student_types (list): The type of the student of each row, None for a student that is not in the student file.
+        - with_reasons (bool): Also return why each student does not meet the requirements.
+
+        Returns:
+        - list: For each row, True if the student meets the requirements, False if not and None if the type is unknown.
+            With with_reasons, a (eligible, reasons) tuple for each row where reasons is a list of strings, empty if eligible.
+
+        Raises:
+        - ValueError: If a student type has no threshold.
+        """
+        if list(matrix.challenge_ids) != self.challenge_ids:
+            raise ValueError("The challenges of the result matrix do not match the evaluator")
+        missing_mandatory, special_finished = self.counts(matrix)
+        eligibility = []
+        for row, student_type in enumerate(student_types):
+            if student_type is None:
+                eligibility.append((None, []) if with_reasons else None)
+                continue
+            if student_type not in self.thresholds:
+                raise ValueError(f"Invalid student type {student_type}")
+            eligible = missing_mandatory[row] == 0 and special_finished[row] >= self.thresholds[student_type]
+            if with_reasons:
+                eligibility.append((eligible, [] if eligible else self.__reasons(matrix, row, student_type, special_finished[row])))
+            else:
+                eligibility.append(eligible)
+        return eligibility
+
+    def __reasons(self, matrix, row: int, student_type: str, special_count: int) -> list:
+        """ Returns why the student of the row does not meet the requirements."""
+        missing = [self.challenge_ids[column] for column in self.mandatory_columns if matrix.status[column][row] != FINISHED]
+        return failure_reasons(missing, special_count, self.thresholds[student_type])
+
+
+def failure_reasons(missing_mandatory: list, special_count: int, special_threshold: int) -> list:
+    """
+    Returns why a student does not meet the requirements.
+
+    Input:
+    - missing_mandatory (list): The IDs of the mandatory challenges the student did not finish.
+    - special_count (int): The number of special challenges the student finished.
+    - special_threshold (int): The number of special challenges the student must finish.
+    """
+    reasons = []
+    if missing_mandatory:
+        reasons.append(f"Mandatory challenges not finished: {', '.join(missing_mandatory)}")
+    if special_count < special_threshold:
+        reasons.append(f"Finished {special_count} of the {special_threshold} special challenges required")
+    return reasons
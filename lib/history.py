@@ -0,0 +1,400 @@
+"""
+History of the rounds of a competition that is run again and again with the same challenges.
+
+Each round is saved in its own file of the history directory, next to an index (history.json):
+
+    keyframe round: magic | metadata length | metadata (JSON) | padding to 8 bytes |
+                    times (float64, one block per challenge column) | status (int8, one block per challenge column)
+    delta round:    magic | metadata length | metadata (JSON) | padding to 8 bytes |
+                    times (float64) | rows (int32) | columns (int32) | status (int8), one item per changed cell
+
+A delta round only holds the cells that changed since the previous round, and the students and challenges
+appended after the ones of the previous round. A round is saved as a keyframe every keyframe_interval rounds,
+when its students or challenges are not the ones of the previous round followed by new ones, or when its delta
+would not be smaller than the full matrix.
+
+The trend queries replay a single challenge column or a single student row from round to round: only that
+column or row is read from the keyframes and only its cells are taken from the deltas, so no full result
+matrix is built. The statistics are computed like the ones of Result, so they are the same as the reports of
+each round.
+"""
+
+import os
+import json
+import mmap
+from array import array
+from .matrix import ResultMatrix, FINISHED, ONGOING, NOT_ATTEMPTED
+from .snapshot import HEADER, data_offset
+from .totals import RunningTotals
+from .misc import Table
+
+MAGIC = b'MYCOMPR1'
+HISTORY_VERSION = 1
+INDEX_FILE = 'history.json'
+DEFAULT_KEYFRAME_INTERVAL = 8 # A round out of this many is saved in full, which bounds the deltas applied by round_matrix
+
+
+def delta_cells(previous: ResultMatrix, current: ResultMatrix) -> tuple:
+    """
+    Find the cells of a round that changed since the previous round.
+
+    Input:
+    - previous (ResultMatrix): The result matrix of the previous round.
+    - current (ResultMatrix): The result matrix of the new round.
+
+    Returns:
+    - tuple: (times, rows, columns, status) arrays with one item per changed cell. The cells of the new students
+        and challenges are included unless they are not attempted. None if the students or challenges of the
+        previous round are not the first ones of the new round, in the same order.
+    """
+    n_previous = previous.n_students
+    if current.student_ids[:n_previous] != previous.student_ids or current.challenge_ids[:previous.n_challenges] != previous.challenge_ids:
+        return None
+    times, rows, columns, status = array('d'), array('i'), array('i'), array('b')
+    for column in range(current.n_challenges):
+        new_times, new_status = current.times[column], current.status[column]
+        old_times = old_status = None
+        first_row = 0
+        if column < previous.n_challenges:
+            old_times, old_status = previous.times[column], previous.status[column]
+            if new_status[:n_previous] == old_status and new_times[:n_previous].tobytes() == old_times.tobytes():
+                first_row = n_previous # Only the cells of the new students can differ
+        for row in range(first_row, current.n_students):
+            cell_status = new_status[row]
+            if old_status is not None and row < n_previous:
+                if cell_status == old_status[row] and (cell_status != FINISHED or new_times[row] == old_times[row]):
+                    continue
+            elif cell_status == NOT_ATTEMPTED: # A new cell starts as not attempted
+                continue
+            times.append(new_times[row])
+            rows.append(row)
+            columns.append(column)
+            status.append(cell_status)
+    return times, rows, columns, status
+
+
+def column_statistics(times, status) -> tuple:
+    """
+    Returns the (nfinish, nongoing, average_time) of the cells of a challenge column or of a student row.
+    The times are summed in order, like Result.challenge_statistics and Result.student_statistics.
+    """
+    totals = RunningTotals(1)
+    for row, cell_status in enumerate(status):
+        if cell_status == FINISHED:
+            totals.totals[0] += times[row]
+            totals.nfinish[0] += 1
+        elif cell_status == ONGOING:
+            totals.nongoing[0] += 1
+    return totals.statistics(0)
+
+
+class RoundHistory():
+    """
+    Directory of the rounds of a competition, the oldest first.
+
+    Attributes:
+        directory (str): The directory of the history.
+        keyframe_interval (int): A round out of this many is saved in full.
+        rounds (list): The index entry of each round {'label', 'file', 'keyframe', 'students', 'challenges', 'changes'}.
+    """
+    def __init__(self, directory: str, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        if keyframe_interval < 1:
+            raise ValueError("The keyframe interval must be at least 1")
+        self.directory = directory
+        self.keyframe_interval = keyframe_interval
+        self.rounds = self.__read_index()
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.directory}, {len(self.rounds)} rounds)'
+
+    def __len__(self):
+        return len(self.rounds)
+
+    def labels(self) -> list:
+        """ Returns the label of every round, the oldest first."""
+        return [entry['label'] for entry in self.rounds]
+
+    def __read_index(self) -> list:
+        """
+        Returns the rounds of the index, an empty list for a new history.
+
+        Raises:
+        - ValueError: If the index is not a history index of this version.
+        """
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except FileNotFoundError:
+            return []
+        if index.get('version') != HISTORY_VERSION:
+            raise ValueError(f"Unsupported history version {index.get('version')} in {self.directory}")
+        return index['rounds']
+
+    def __write_file(self, name: str, content: bytes) -> None:
+        """ Write a file of the history, replacing the old one only once the new one is complete."""
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', "wb") as file:
+            file.write(content)
+        os.replace(path + '.tmp', path)
+
+    def __read_round(self, index: int) -> tuple:
+        """ Returns the (metadata, mapped file) of a round. The mapped file must be closed by the caller."""
+        with open(os.path.join(self.directory, self.rounds[index]['file']), "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, metadata_length = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            mapped.close()
+            raise ValueError(f"{self.rounds[index]['file']} is not a round of the history")
+        metadata = json.loads(mapped[HEADER.size:HEADER.size + metadata_length].decode("utf-8"))
+        metadata['offset'] = data_offset(metadata_length)
+        return metadata, mapped
+
+    @staticmethod
+    def __read_delta(metadata: dict, mapped) -> tuple:
+        """ Returns the (times, rows, columns, status) arrays of the changed cells of a delta round."""
+        offset = metadata['offset']
+        changes = metadata['changes']
+        blocks = []
+        for typecode in 'diib':
+            block = array(typecode)
+            block.frombytes(mapped[offset:offset + block.itemsize * changes])
+            offset += block.itemsize * changes
+            blocks.append(block)
+        return tuple(blocks)
+
+    def __keyframe_before(self, index: int) -> int:
+        """ Returns the index of the last keyframe round up to the given round."""
+        while not self.rounds[index]['keyframe']:
+            index -= 1
+        return index
+
+    def __check_round(self, index: int) -> int:
+        """ Returns the round index, counted from the end if negative. Raises ValueError if there is no such round."""
+        if not -len(self.rounds) <= index < len(self.rounds):
+            raise ValueError(f"No round {index} in the history, it has {len(self.rounds)} rounds")
+        return index % len(self.rounds)
+
+    def round_matrix(self, index: int = -1) -> ResultMatrix:
+        """
+        Rebuild the result matrix of a round from the last keyframe before it and the following deltas.
+
+        Input:
+        - index (int): The round, the last one by default.
+        """
+        index = self.__check_round(index)
+        first = self.__keyframe_before(index)
+        metadata, mapped = self.__read_round(first)
+        try:
+            matrix = ResultMatrix(metadata['challenge_ids'], metadata['result_label'])
+            n_students = len(metadata['student_ids'])
+            status_offset = metadata['offset'] + 8 * n_students * matrix.n_challenges
+            for column in range(matrix.n_challenges):
+                start = metadata['offset'] + 8 * n_students * column
+                matrix.times[column].frombytes(mapped[start:start + 8 * n_students])
+                start = status_offset + n_students * column
+                matrix.status[column].frombytes(mapped[start:start + n_students])
+        finally:
+            mapped.close()
+        matrix.student_ids = metadata['student_ids']
+        matrix.student_index = {student_id: row for row, student_id in enumerate(matrix.student_ids)}
+        for delta in range(first + 1, index + 1):
+            metadata, mapped = self.__read_round(delta)
+            try:
+                times, rows, columns, status = self.__read_delta(metadata, mapped)
+            finally:
+                mapped.close()
+            matrix.label = metadata['result_label']
+            for student_id in metadata['added_students']:
+                matrix.add_student(student_id)
+            for challenge_id in metadata['added_challenges']:
+                matrix.add_challenge(challenge_id)
+            for time, row, column, cell_status in zip(times, rows, columns, status):
+                matrix.set_cell(row, column, cell_status, time)
+        return matrix
+
+    def add_round(self, matrix: ResultMatrix, label: str = None) -> int:
+        """
+        Save a round after the last one.
+
+        Input:
+        - matrix (ResultMatrix): The results of the round.
+        - label (str): The name of the round, such as a date. Default is the number of the round.
+
+        Returns:
+        - int: The index of the new round.
+
+        Raises:
+        - ValueError: If a round already has this label.
+        """
+        index = len(self.rounds)
+        label = str(index + 1) if label is None else label
+        if label in self.labels():
+            raise ValueError(f"Duplicate round {label} in the history")
+        changes = delta_cells(self.round_matrix(), matrix) if self.rounds else None
+        n_cells = matrix.n_students * matrix.n_challenges
+        keyframe = (changes is None or index - self.__keyframe_before(index - 1) >= self.keyframe_interval
+                    or 17 * len(changes[0]) >= 9 * n_cells) # A delta cell takes 17 bytes, a keyframe cell 9 bytes
+        metadata = {'label': label, 'result_label': matrix.label}
+        if keyframe:
+            metadata.update({'student_ids': matrix.student_ids, 'challenge_ids': matrix.challenge_ids})
+            blocks = matrix.times + matrix.status
+        else:
+            previous = self.rounds[-1]
+            metadata.update({'added_students': matrix.student_ids[previous['students']:],
+                             'added_challenges': matrix.challenge_ids[previous['challenges']:], 'changes': len(changes[0])})
+            blocks = list(changes)
+        encoded = json.dumps(metadata).encode("utf-8")
+        content = [HEADER.pack(MAGIC, len(encoded)), encoded, b'\0' * (data_offset(len(encoded)) - HEADER.size - len(encoded))]
+        content.extend(block.tobytes() for block in blocks)
+        file_name = f'round-{index + 1:04d}.{"key" if keyframe else "delta"}'
+        os.makedirs(self.directory, exist_ok=True)
+        self.__write_file(file_name, b''.join(content))
+        self.rounds.append({'label': label, 'file': file_name, 'keyframe': keyframe, 'students': matrix.n_students,
+                            'challenges': matrix.n_challenges, 'changes': None if keyframe else len(changes[0])})
+        self.__write_file(INDEX_FILE, json.dumps({'version': HISTORY_VERSION, 'rounds': self.rounds}).encode("utf-8"))
+        return index
+
+    def __iter_column(self, challenge_id: str):
+        """
+        Yield the state of a challenge column after each round.
+
+        Yields:
+        - tuple: (label, student_index, times, status). times and status are None if the challenge is not in the round.
+        """
+        student_ids, student_index, challenge_ids = [], {}, []
+        times = status = None
+        for index, entry in enumerate(self.rounds):
+            metadata, mapped = self.__read_round(index)
+            try:
+                if entry['keyframe']:
+                    student_ids, challenge_ids = metadata['student_ids'], metadata['challenge_ids']
+                    student_index = {student_id: row for row, student_id in enumerate(student_ids)}
+                    times = status = None
+                    if challenge_id in challenge_ids:
+                        n_students, column = len(student_ids), challenge_ids.index(challenge_id)
+                        start = metadata['offset'] + 8 * n_students * column
+                        times = array('d', mapped[start:start + 8 * n_students])
+                        start = metadata['offset'] + 8 * n_students * len(challenge_ids) + n_students * column
+                        status = array('b', mapped[start:start + n_students])
+                else:
+                    for student_id in metadata['added_students']:
+                        student_index[student_id] = len(student_ids)
+                        student_ids.append(student_id)
+                    challenge_ids.extend(metadata['added_challenges'])
+                    if status is None and challenge_id in metadata['added_challenges']:
+                        times, status = array('d'), array('b')
+                    if status is not None:
+                        times.extend([float('nan')] * (len(student_ids) - len(times)))
+                        status.extend([NOT_ATTEMPTED] * (len(student_ids) - len(status)))
+                        column = challenge_ids.index(challenge_id)
+                        for time, row, cell_column, cell_status in zip(*self.__read_delta(metadata, mapped)):
+                            if cell_column == column:
+                                times[row] = time
+                                status[row] = cell_status
+            finally:
+                mapped.close()
+            yield entry['label'], student_index, times, status
+
+    def __iter_row(self, student_id: str):
+        """
+        Yield the cells of a student row after each round.
+
+        Yields:
+        - tuple: (label, status, times), the cells in the order of the challenge columns. None if the student is not in the round.
+        """
+        row = None
+        times = status = None
+        for index, entry in enumerate(self.rounds):
+            metadata, mapped = self.__read_round(index)
+            try:
+                if entry['keyframe']:
+                    student_ids, n_challenges = metadata['student_ids'], len(metadata['challenge_ids'])
+                    row = student_ids.index(student_id) if student_id in student_ids else None
+                    times = status = None
+                    if row is not None:
+                        n_students = len(student_ids)
+                        start = metadata['offset'] + 8 * row
+                        times = array('d', b''.join(mapped[start + 8 * n_students * column:start + 8 * n_students * column + 8] for column in range(n_challenges)))
+                        status_offset = metadata['offset'] + 8 * n_students * n_challenges
+                        status = array('b', bytes(mapped[status_offset + n_students * column + row] for column in range(n_challenges)))
+                else:
+                    if row is None and student_id in metadata['added_students']:
+                        row = entry['students'] - len(metadata['added_students']) + metadata['added_students'].index(student_id)
+                        times, status = array('d'), array('b')
+                    if row is not None:
+                        times.extend([float('nan')] * (entry['challenges'] - len(times)))
+                        status.extend([NOT_ATTEMPTED] * (entry['challenges'] - len(status)))
+                        for time, cell_row, column, cell_status in zip(*self.__read_delta(metadata, mapped)):
+                            if cell_row == row:
+                                times[column] = time
+                                status[column] = cell_status
+            finally:
+                mapped.close()
+            yield entry['label'], status, times
+
+    def challenge_trend(self, challenge_id: str) -> list:
+        """
+        Returns the statistics of a challenge in every round.
+
+        Returns:
+        - list: (label, statistics) of each round. statistics is the (nfinish, nongoing, average_time) tuple of
+            Result.challenge_statistics, None if the challenge is not in the round.
+        """
+        return [(label, column_statistics(times, status) if status is not None else None) for label, _, times, status in self.__iter_column(challenge_id)]
+
+    def student_trend(self, student_id: str) -> list:
+        """
+        Returns the statistics of a student in every round.
+
+        Returns:
+        - list: (label, statistics) of each round. statistics is the (nfinish, nongoing, average_time) tuple of
+            Result.student_statistics, None if the student is not in the round.
+        """
+        return [(label, column_statistics(times, status) if status is not None else None) for label, status, times in self.__iter_row(student_id)]
+
+    def rank_trajectory(self, student_id: str, challenge_id: str) -> list:
+        """
+        Returns the rank of a student in a challenge in every round, as given by Result.return_challenge_rank.
+
+        Returns:
+        - list: (label, rank) of each round. rank starts from 1 and is None if the student did not finish the
+            challenge or if the student or the challenge is not in the round.
+        """
+        trajectory = []
+        for label, student_index, times, status in self.__iter_column(challenge_id):
+            row = student_index.get(student_id)
+            rank = None
+            if status is not None and row is not None and status[row] == FINISHED:
+                # Equal times are ranked in the order of the result table, like the ranking engine
+                key = (times[row], row)
+                rank = 1 + sum(1 for other, cell_status in enumerate(status) if cell_status == FINISHED and (times[other], other) < key)
+            trajectory.append((label, rank))
+        return trajectory
+
+
+def format_trend(history: RoundHistory, item_ids: list) -> str:
+    """
+    Returns the trend table of a challenge, a student, or the rank of a student in a challenge.
+
+    Input:
+    - history (RoundHistory): The rounds of the competition.
+    - item_ids (list): [challenge_id], [student_id] or [student_id, challenge_id].
+
+    Raises:
+    - ValueError: If an ID is not in any round.
+    """
+    if len(item_ids) == 2:
+        title = f'RANK OF {item_ids[0]} IN {item_ids[1]}'
+        table = [['Round', 'Rank']] + [[label, rank] for label, rank in history.rank_trajectory(*item_ids)]
+    else:
+        trend = history.challenge_trend(item_ids[0])
+        title = f'CHALLENGE {item_ids[0]}'
+        if all(statistics is None for _, statistics in trend):
+            trend = history.student_trend(item_ids[0])
+            title = f'STUDENT {item_ids[0]}'
+        if all(statistics is None for _, statistics in trend):
+            raise ValueError(f"{item_ids[0]} is not in any round of the history")
+        table = [['Round', 'Nfinish', 'Nongoing', 'AverageTime']]
+        table.extend([label, *statistics] if statistics is not None else [label, None, None, None] for label, statistics in trend)
+    col_widths = [max(len(str(row[column])) for row in table) + 2 for column in range(len(table[0]))]
+    return Table.create_format_table(f'TREND OF {title}', table, col_widths, header_width_space=0)
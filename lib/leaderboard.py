@@ -0,0 +1,51 @@
+"""
+Top-K selection of the leaderboards.
+
+The leaders are selected with a bounded heap in O(n log k) instead of sorting every student.
+Ties are always broken by the row of the student in the result table, so the same results give the same leaderboard.
+"""
+
+import heapq
+import itertools
+
+EXCLUDE = 'exclude' # Students without a finished result are left out of the leaderboard
+LAST = 'last' # Students without a finished result come after every student with a result, in row order
+NO_RESULTS_POLICIES = (EXCLUDE, LAST)
+
+
+def check_top_arguments(k: int, no_results: str = EXCLUDE) -> None:
+    """
+    Check the size and the no results policy of a leaderboard.
+
+    Raises:
+    - ValueError: If k is negative or the policy is unknown.
+    """
+    if k < 0:
+        raise ValueError(f"The size of a leaderboard cannot be negative ({k})")
+    if no_results not in NO_RESULTS_POLICIES:
+        raise ValueError(f"Unknown no results policy '{no_results}', expected one of {', '.join(NO_RESULTS_POLICIES)}")
+
+
+def top_rows(values, has_results, k: int, largest = False, no_results: str = EXCLUDE) -> list:
+    """
+    Select the rows of the k best values.
+
+    Input:
+    - values (sequence): The value of each row. Only read for the rows with results.
+    - has_results (sequence): True for each row that has at least one finished result.
+    - k (int): The number of rows to select.
+    - largest (bool): The best values are the largest if True, the smallest if False.
+    - no_results (str): EXCLUDE or LAST, what to do with the rows without results.
+
+    Returns:
+    - list: The selected rows, best first. Equal values are in row order.
+    """
+    check_top_arguments(k, no_results)
+    sign = -1 if largest else 1
+    # The row is part of the heap key, so ties are broken by row order and the keys are never equal
+    keys = ((sign * values[row], row) for row in range(len(values)) if has_results[row])
+    rows = [row for _, row in heapq.nsmallest(k, keys)]
+    if no_results == LAST and len(rows) < k:
+        without_results = (row for row in range(len(values)) if not has_results[row])
+        rows.extend(itertools.islice(without_results, k - len(rows)))
+    return rows
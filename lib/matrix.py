@@ -0,0 +1,174 @@
+"""
+Columnar storage for the competition results.
+
+Every cell of the result file is parsed once into a float time and a small status code so the
+aggregates in the Result class never have to convert strings again.
+"""
+
+from array import array
+
+# Status codes of a result cell. The values match the participation codes used by Result.return_student_participation
+FINISHED = 1
+ONGOING = 0
+NOT_ATTEMPTED = -1
+
+NO_TIME = float('nan') # Time stored for the cells that are not finished
+
+
+def parse_cell(value: str) -> tuple:
+    """
+    Parse a raw result cell into a (status, time) tuple.
+
+    Input:
+    - value (str): The raw value of the cell in the result file.
+
+    Returns:
+    - tuple: (status, time). The time is NO_TIME when the status is not FINISHED.
+
+    Raises:
+    - ValueError: If the value is not a valid time.
+    """
+    value = value.strip()
+    if value == '' or value == '-1':
+        return NOT_ATTEMPTED, NO_TIME
+    if value.lower() in ['444', 'tba', '--']: # 444, tba, TBA and the processed '--' mean the challenge is still ongoing
+        return ONGOING, NO_TIME
+    if value.isalpha(): # Any other word means the student did not attempt the challenge
+        return NOT_ATTEMPTED, NO_TIME
+    try:
+        return FINISHED, float(value)
+    except ValueError:
+        raise ValueError(f"Invalid result value '{value}'") from None
+
+
+class ResultMatrix():
+    """
+    Columnar result store.
+
+    Attributes:
+        label (str): The label of the top left cell of the result table.
+        student_ids (list): The student ID of each row.
+        challenge_ids (list): The challenge ID of each column.
+        times (list): One array('d') of finish times per challenge column.
+        status (list): One array('b') of status codes per challenge column.
+        student_index (dict): The row index of each student ID {student_id: row}
+        challenge_index (dict): The column index of each challenge ID {challenge_id: column}
+    """
+    def __init__(self, challenge_ids = None, label = 'Results'):
+        self.label = label
+        self.student_ids = []
+        self.challenge_ids = list(challenge_ids) if challenge_ids else []
+        self.times = [array('d') for _ in self.challenge_ids]
+        self.status = [array('b') for _ in self.challenge_ids]
+        self.student_index = {}
+        self.challenge_index = {}
+        for column, challenge_id in enumerate(self.challenge_ids):
+            if challenge_id in self.challenge_index:
+                raise ValueError(f"Duplicate challenge ID {challenge_id} in result record")
+            self.challenge_index[challenge_id] = column
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.n_students} students, {self.n_challenges} challenges)'
+
+    @property
+    def n_students(self) -> int:
+        """ Returns the number of student rows."""
+        return len(self.student_ids)
+
+    @property
+    def n_challenges(self) -> int:
+        """ Returns the number of challenge columns."""
+        return len(self.challenge_ids)
+
+    def append_row(self, student_id: str, cells) -> None:
+        """
+        Append a student row.
+
+        Input:
+        - student_id (str): The ID of the student.
+        - cells (iterable): One (status, time) tuple per challenge column.
+        """
+        if student_id in self.student_index:
+            raise ValueError(f"Duplicate student ID {student_id} in result record")
+        cells = list(cells)
+        if len(cells) != self.n_challenges:
+            raise ValueError(f"Student {student_id} has {len(cells)} results but there are {self.n_challenges} challenges")
+        for column, (status, time) in enumerate(cells):
+            self.status[column].append(status)
+            self.times[column].append(time)
+        self.student_index[student_id] = len(self.student_ids)
+        self.student_ids.append(student_id)
+
+    def add_student(self, student_id: str) -> int:
+        """ Append a student row without any result and return its row index."""
+        self.append_row(student_id, [(NOT_ATTEMPTED, NO_TIME)] * self.n_challenges)
+        return self.student_index[student_id]
+
+    def add_challenge(self, challenge_id: str) -> int:
+        """ Append a challenge column without any result and return its column index."""
+        if challenge_id in self.challenge_index:
+            raise ValueError(f"Duplicate challenge ID {challenge_id} in result record")
+        self.challenge_index[challenge_id] = self.n_challenges
+        self.challenge_ids.append(challenge_id)
+        self.times.append(array('d', [NO_TIME]) * self.n_students)
+        self.status.append(array('b', [NOT_ATTEMPTED]) * self.n_students)
+        return self.challenge_index[challenge_id]
+
+    def set_cell(self, row: int, column: int, status: int, time: float = NO_TIME) -> tuple:
+        """
+        Change a cell and return its previous (status, time).
+
+        Input:
+        - row (int), column (int): The cell to change.
+        - status (int): The new status code. The time is ignored if the status is not FINISHED.
+        - time (float): The new finish time.
+        """
+        old = (self.status[column][row], self.times[column][row])
+        self.status[column][row] = status
+        self.times[column][row] = float(time) if status == FINISHED else NO_TIME
+        return old
+
+    def extend_rows(self, rows) -> None:
+        """
+        Append a batch of student rows.
+
+        Input:
+        - rows (iterable): (student_id, cells) tuples as accepted by append_row.
+        """
+        for student_id, cells in rows:
+            self.append_row(student_id, cells)
+
+    @classmethod
+    def from_rows(cls, rows: list):
+        """
+        Build a matrix from a list of string rows, the header row first.
+
+        Input:
+        - rows (list): Ex: [['Results', 'C01', 'C02'], ['S01', '12.5', '--']]
+        """
+        header = rows[0]
+        matrix = cls(header[1:], header[0])
+        for row in rows[1:]:
+            matrix.append_row(row[0], [parse_cell(cell) for cell in row[1:]])
+        return matrix
+
+    def cell_text(self, row: int, column: int) -> str:
+        """ Returns the display text of a cell: the time, '--' if ongoing or '' if not attempted."""
+        status = self.status[column][row]
+        if status == FINISHED:
+            return str(self.times[column][row])
+        if status == ONGOING:
+            return '--'
+        return ''
+
+    def header_row(self) -> list:
+        """ Returns the header row of the result table."""
+        return [self.label] + self.challenge_ids
+
+    def student_row(self, row: int) -> list:
+        """ Returns the display row of a student: the student ID followed by the cell text of each challenge."""
+        return [self.student_ids[row]] + [self.cell_text(row, column) for column in range(self.n_challenges)]
+
+    def to_rows(self) -> list:
+        """ Returns the result table as a list of string rows, the header row first."""
+        return [self.header_row()] + [self.student_row(row) for row in range(self.n_students)]
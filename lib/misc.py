@@ -3,8 +3,15 @@ This is the misc.py file that contains the misc functions
 """
 
 # Import required librarys
+import os
+import argparse
+import itertools
 import sys
+import struct
+import shutil
+import tempfile
 import datetime
+from .profiling import span
 
 class Table():
     """Table class"""
@@ -32,14 +39,28 @@ class Table():
         +--------------+--------------+
 
         """
-        # Replace None values with an empty string
-        table_2d_list = [[col if col is not None else '' for col in row] for row in table_2d_list]
+        return '\n'.join(Table.iter_format_table(title, table_2d_list, col_widths, width_space, header_width_space, header_align, row_align))
+
+    @staticmethod
+    def iter_format_table(title:str, table_2d_list, col_widths = None, width_space= 8, header_width_space = 5, header_align = '^', row_align = '<'):
+        """
+        Yield the lines of the table made by create_format_table one by one, without the line breaks.
+        The first line is empty so joining the lines with '\n' gives the same string as create_format_table.
+
+        Input:
+        - table_2d_list (iterable): The header row followed by the rows of the table. The rows can be a generator
+            so a large table is never held in memory.
+        - The other inputs are the same as create_format_table.
+        """
+        rows = iter(table_2d_list)
+        header = next(rows)
 
         # Calculate the columns width if not given
         if col_widths is None: # Use zip to transpose the table_2d_list [1] “Built-in functions,” Python documentation, https://docs.python.org/3/library/functions.html#zip (accessed Jan. 17, 2024). 
-            widths = [(max(map(len, str(col))) + width_space) for col in zip(*table_2d_list)]
+            # The automatic width only depends on the number of columns, so it is taken from the header and the rows can be streamed
+            widths = [(max(map(len, str(col))) + width_space) for col in zip(header)]
         else:
-            widths = col_widths
+            widths = list(col_widths)
         widths[0] += header_width_space
 
         # Create the row template
@@ -47,19 +68,35 @@ class Table():
         # Create the separator
         separator = '+'+'+'.join('-'* w for w in widths)+'+'
 
-        # Create the table in string format
-        table =  '\n' + title + '\n' + separator + '\n'
+        # Create the table title
+        yield ''
+        yield title
+        yield separator
 
         # Add the header to the table
         header_template = '|'+'|'.join(f"{{:{header_align}{width}}}" for width in widths) +'|'
-        table += header_template.format(*table_2d_list[0], *widths) + '\n' + separator + '\n'
+        yield header_template.format(*header, *widths)
+        yield separator
 
-        # Print table content
-        for row in table_2d_list[1:]:
-            table += row_template.format(*row, *widths) + '\n'
-        table += separator
+        # Print table content, replacing None values with an empty string
+        for row in rows:
+            yield row_template.format(*[col if col is not None else '' for col in row], *widths)
+        yield separator
+
+    @staticmethod
+    def write_format_table(stream, title:str, table_2d_list, col_widths = None, width_space= 8, header_width_space = 5, header_align = '^', row_align = '<') -> None:
+        """
+        Write the table made by create_format_table line by line into a file-like object such as sys.stdout or an open file.
+
+        Input:
+        - stream: Any object with a write method.
+        - The other inputs are the same as iter_format_table.
+        """
+        lines = Table.iter_format_table(title, table_2d_list, col_widths, width_space, header_width_space, header_align, row_align)
+        stream.write(next(lines)) # The empty first line
+        for line in lines:
+            stream.write('\n' + line)
 
-        return table
     @staticmethod
     def resuls_table_process(value) -> str:
         """Process the value in the result table to remove the leading and trailing whitespace 
@@ -92,28 +129,246 @@ class Control:
             print('<result file> is required, <student file> and <challenge file> are optional')
             sys.exit(0)
 
+    @staticmethod
+    def parse_command_line(argv: list = None):
+        """
+        Parse the command line arguments and options.
+
+        Input:
+        - argv (list): The arguments to parse without the program name. Default is sys.argv[1:].
+
+        Returns:
+        - argparse.Namespace: files (list of the result, challenge and student files) and the options.
+        """
+        parser = argparse.ArgumentParser(prog='my_competition.py', description='Student competition report')
+        parser.add_argument('files', nargs='*', help='<result file> [<challenge file> [<student file>]]')
+        parser.add_argument('--snapshot-dir', default=os.environ.get('COMPETITION_SNAPSHOT_DIR'),
+                            help='Directory of the parsed input snapshots, reused while the input files are unchanged (env COMPETITION_SNAPSHOT_DIR)')
+        parser.add_argument('--batch', metavar='MANIFEST',
+                            help='Report every competition listed in MANIFEST (<result file>, <challenge file>, <student file>, <report file> per line)')
+        parser.add_argument('--workers', type=int, default=None, help='Number of worker processes of the batch mode. Default is the number of CPUs')
+        parser.add_argument('--output-dir', default=None, help='Folder of the batch reports that have no report file in the manifest')
+        parser.add_argument('--summary-file', default=None, help='Also write the batch summary to this file')
+        parser.add_argument('--sections', type=lambda value: [section.strip() for section in value.split(',') if section.strip()], default=None,
+                            help='Comma separated report sections: results, challenges, students, top (one line summary of the top student). '
+                                 'Only the input files the sections need are read. Default is every section the input files allow')
+        parser.add_argument('--serve', action='store_true', help='Serve the reports as HTML and JSON on a local HTTP dashboard instead of writing the report')
+        parser.add_argument('--host', default='127.0.0.1', help='Address of the dashboard server. Default is 127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000, help='Port of the dashboard server. Default is 8000')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep the competition loaded and report again when an input file changes. Only the changed lines are parsed '
+                                 'and only the sections whose input files changed are rendered again')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between two checks of the input files in watch mode. Default is 2')
+        parser.add_argument('--compact', action='store_true',
+                            help='Keep the students and challenges as compact arrays instead of one object each, for very large rosters')
+        parser.add_argument('--parse-workers', type=int, default=None, metavar='N',
+                            help='Memory-map the result file and parse it in byte ranges with N worker processes, for very large result files')
+        parser.add_argument('--rank-workers', type=int, default=None, metavar='N',
+                            help='Rank and score the challenge columns on N worker processes, for results with thousands of challenges')
+        parser.add_argument('--history', metavar='DIR', default=None,
+                            help='Save the results of the run as a new round of the competition history in DIR. Only the cells that changed since the previous round are stored')
+        parser.add_argument('--round', metavar='LABEL', default=None, help='Label of the round saved with --history. Default is the number of the round')
+        parser.add_argument('--trend', metavar='ID', nargs='+', default=None,
+                            help='Print the statistics of a challenge or a student in every round of --history, or the rank of a student in a challenge with --trend STUDENT CHALLENGE')
+        parser.add_argument('--scoring-rule', metavar='FILE', default=None,
+                            help='JSON file of the placement points: points by rank, other_points, last_place, last_place_in_table, ties (row or shared) and type_weights')
+        parser.add_argument('--validate', action='store_true',
+                            help='Check the input files in one pass and print every error with its file, line and column instead of writing the report')
+        parser.add_argument('--max-errors', type=int, default=1000, metavar='N', help='Number of errors printed by --validate. Default is 1000')
+        parser.add_argument('--sqlite', metavar='DATABASE', default=None,
+                            help='Load the input files into the SQLite DATABASE and compute the report aggregates in SQL. '
+                                 'Only the files that changed since the last run are loaded again')
+        parser.add_argument('--trace', metavar='FILE', default=os.environ.get('COMPETITION_TRACE'),
+                            help='Write the timing spans and call counters of the run to FILE as JSON (env COMPETITION_TRACE)')
+        parser.add_argument('--profile', metavar='FILE', default=os.environ.get('COMPETITION_PROFILE'),
+                            help='Write the cProfile statistics of the run to FILE (env COMPETITION_PROFILE)')
+        return parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+
+class ReportLog():
+    """
+    Append-only report log with an offset index.
+
+    Each report is appended at the end of the log file and its byte offset and length are appended to a
+    small binary index file (<file>.idx), so the newest reports can be read first by seeking instead of
+    rewriting the whole file every time a report is added.
+
+    Attributes:
+        file (str): The path to the log file.
+        index_file (str): The path to the offset index of the log file.
+        max_bytes (int): Rotate the log when a report would make it larger than this size. A streamed report is only
+            measured once it is written, so if it ends past the limit it is moved to the new log after the rotation.
+            A single report larger than this size is kept alone in its log. No limit if None.
+        max_reports (int): Rotate the log when it already holds this number of reports. No limit if None.
+        backup_count (int): The number of rotated logs to keep (<file>.1, <file>.2, ...).
+    """
+    ENTRY = struct.Struct('<QQ') # Offset and length of a report in bytes
+
+    def __init__(self, file, max_bytes = None, max_reports = None, backup_count = 1):
+        self.file = file
+        self.index_file = file + '.idx'
+        self.max_bytes = max_bytes
+        self.max_reports = max_reports
+        self.backup_count = backup_count
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.file})'
+
+    def __len__(self):
+        return len(self.entries())
+
+    def entries(self) -> list:
+        """ Returns the (offset, length) of every indexed report, the oldest first."""
+        try:
+            with open(self.index_file, "rb") as index:
+                data = index.read()
+        except FileNotFoundError:
+            return []
+        data = data[:len(data) - len(data) % self.ENTRY.size] # Ignore an incomplete entry left by an interrupted write
+        return list(self.ENTRY.iter_unpack(data))
+
+    def __file_size(self) -> int:
+        """ Returns the size of the log file, 0 if it does not exist."""
+        try:
+            return os.path.getsize(self.file)
+        except FileNotFoundError:
+            return 0
+
+    def __index_tail(self) -> None:
+        """
+        Index the part of the log file that is not indexed yet, as a single report. This covers a log written
+        before the index existed (Ex: a report file made by the old prepend writer) or an interrupted append.
+        """
+        entries = self.entries()
+        indexed_end = entries[-1][0] + entries[-1][1] if entries else 0
+        size = self.__file_size()
+        if size > indexed_end:
+            with open(self.index_file, "ab") as index:
+                index.write(self.ENTRY.pack(indexed_end, size - indexed_end))
+
+    def __should_rotate(self, new_size: int) -> bool:
+        """ Check the rotation policy before appending a report of new_size bytes."""
+        size = self.__file_size()
+        if size == 0:
+            return False
+        if self.max_bytes is not None and size + new_size > self.max_bytes:
+            return True
+        if self.max_reports is not None and len(self) >= self.max_reports:
+            return True
+        return False
+
+    def rotate(self) -> None:
+        """ Move the log to <file>.1, shifting the older backups up and dropping the ones above backup_count."""
+        for path in (self.file, self.index_file):
+            for number in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(f'{path}.{number}'):
+                    os.replace(f'{path}.{number}', f'{path}.{number + 1}')
+            if not os.path.exists(path):
+                continue
+            if self.backup_count > 0:
+                os.replace(path, f'{path}.1')
+            else:
+                os.remove(path)
+
+    def append(self, report: str) -> None:
+        """
+        Append a report at the end of the log and index it.
+
+        Input:
+        - report (str or iterable): The report to add, or an iterable of strings that are written one by one.
+
+        Raises:
+        - Any exception raised by the iterable. The part of the report already written is truncated from the log first.
+        """
+        if isinstance(report, str):
+            report = [report]
+            new_size = len(report[0].encode("utf-8"))
+        else:
+            new_size = 0 # The size of a streamed report is only known after it is written
+        if self.__should_rotate(new_size):
+            self.rotate()
+        self.__index_tail()
+        with open(self.file, "ab") as log:
+            offset = log.tell()
+            try:
+                for chunk in report:
+                    log.write(chunk.encode("utf-8"))
+            except BaseException: # A report that fails while it is rendered is removed, so it is never indexed
+                log.truncate(offset)
+                raise
+            length = log.tell() - offset
+        if offset > 0 and self.max_bytes is not None and offset + length > self.max_bytes:
+            self.__move_to_new_log(offset)
+            offset = 0
+        with open(self.index_file, "ab") as index: # The index is written last so it never points past the end of the log
+            index.write(self.ENTRY.pack(offset, length))
+
+    def __move_to_new_log(self, offset: int) -> None:
+        """ Move the report written at offset to a new log, after rotating the reports before it."""
+        with tempfile.TemporaryFile() as report:
+            with open(self.file, "r+b") as log:
+                log.seek(offset)
+                shutil.copyfileobj(log, report)
+                log.truncate(offset)
+            self.rotate()
+            report.seek(0)
+            with open(self.file, "wb") as log:
+                shutil.copyfileobj(report, log)
+
+    def read_report(self, offset: int, length: int) -> str:
+        """ Read a single report from the log."""
+        with open(self.file, "rb") as log:
+            log.seek(offset)
+            return log.read(length).decode("utf-8")
+
+    def newest_first(self, limit = None):
+        """
+        Yield the reports of the log from the newest to the oldest.
+
+        Input:
+        - limit (int): The maximum number of reports to read. All the reports if None.
+        """
+        self.__index_tail()
+        entries = self.entries()[::-1]
+        if limit is not None:
+            entries = entries[:limit]
+        with open(self.file, "rb") as log:
+            for offset, length in entries:
+                log.seek(offset)
+                yield log.read(length).decode("utf-8")
+
+
 class TextEditor():
     """TextEditor class"""
     @staticmethod
-    def add_to_file(file, new_content):
-        """This function add new content to the beginning of the file
+    def add_to_file(file, new_content, max_bytes = None, max_reports = None):
+        """This function add new content to the report log of the file. The content is appended at the end of
+        the file and indexed so the newest reports can still be read first with TextEditor.read_newest_first
         
         Input:
         - file (str): The path to the file to add the content to.
-        - new_content (str): The content to add to the file.
+        - new_content (str or iterable): The content to add to the file, or an iterable of strings written one by one.
+        - max_bytes (int): Rotate the file to <file>.1 when the new report would make it grow above this size. No limit if None.
+        - max_reports (int): Rotate the file to <file>.1 when it holds this number of reports. No limit if None.
         """
         current_date ='\n' + 'REPORT UPDATE ON: ' + datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S") + '\n' # Get the current date
         try:
-            with open(file, "r+", encoding="utf-8") as file:
-                content = file.read() # Read the content of the file
-                file.seek(0, 0)
-                file.write(current_date + new_content + '\n' + content)
-        except FileNotFoundError:
-            # As we are not allow to use the os module, we will cath the FileNotFoundError exception to create the file
-            with open(file, "w", encoding="utf-8") as file:
-                file.write(current_date + new_content + '\n')
+            if isinstance(new_content, str):
+                new_content = [new_content]
+            with span('write.report', file=file): # Includes the rendering when the content is a generator
+                ReportLog(file, max_bytes, max_reports).append(itertools.chain([current_date], new_content, ['\n']))
         except IOError as e:
             # If there is an error while writing to the file, we will print the error and exit the program to prevent further error
             print(f'An error occurred while writing to the file: {e}')
             print('Please check the file before try again')
-            sys.exit(0)
\ No newline at end of file
+            sys.exit(0)
+
+    @staticmethod
+    def read_newest_first(file, limit = None) -> str:
+        """This function return the reports of the file from the newest to the oldest
+
+        Input:
+        - file (str): The path to the report file.
+        - limit (int): The maximum number of reports to return. All the reports if None.
+        """
+        return ''.join(ReportLog(file).newest_first(limit))
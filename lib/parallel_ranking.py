@@ -0,0 +1,217 @@
+"""
+Ranking engine that ranks and scores the challenge columns on a pool of worker processes.
+
+Each challenge is ranked independently, so the columns are split into contiguous blocks and every block is
+sorted, ranked and scored by a worker. The times and status codes of the matrix are copied once into shared
+memory, which the workers attach to instead of receiving a pickled copy of the matrix, and the workers write
+the order, the ranks and the points of their columns back into shared blocks. Each worker also returns the
+partial unweighted score vector of its columns, and the partial vectors are added up into the scores.
+
+A weighted score vector is computed by blocks of rows instead, each row still summing its points in the order
+of the columns, so the weighted scores are the same floats as the ones of the serial engine. The unweighted
+scores of a scoring rule with float points are computed the same way.
+"""
+
+import os
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor
+from .matrix import FINISHED
+from .ranking import RankingEngine, ScoringRule
+
+MIN_PARALLEL_CELLS = 1 << 16 # Smaller matrices are ranked in the calling process, the pool would cost more than it saves
+BLOCKS_PER_WORKER = 4 # Blocks per worker, so a worker that finishes early takes another block
+
+
+def share_columns(columns: list, typecode: str, n_rows: int, copy = True) -> SharedMemory:
+    """
+    Returns a shared memory block holding the columns one after the other.
+
+    Input:
+    - columns (list): The arrays of the columns, each of n_rows items of the typecode. Only their number is used if copy is False.
+    - typecode (str): The array typecode of the items.
+    - n_rows (int): The number of items of each column.
+    - copy (bool): Copy the columns into the block. A new block is filled with zeros.
+    """
+    itemsize = array(typecode).itemsize
+    memory = SharedMemory(create=True, size=max(1, itemsize * n_rows * len(columns)))
+    if copy:
+        for column, values in enumerate(columns):
+            memory.buf[column * n_rows * itemsize:(column + 1) * n_rows * itemsize] = memoryview(values).cast('B')
+    return memory
+
+
+def split_blocks(n_items: int, n_blocks: int) -> list:
+    """ Returns the (start, end) of n_blocks contiguous blocks of about the same size covering n_items."""
+    n_blocks = max(1, min(n_items, n_blocks))
+    return [(n_items * block // n_blocks, n_items * (block + 1) // n_blocks) for block in range(n_blocks)]
+
+
+def rank_block(names: tuple, n_students: int, start: int, end: int, rule: ScoringRule) -> tuple:
+    """
+    Rank the challenge columns of a block.
+
+    Input:
+    - names (tuple): The names of the shared blocks of the times, status, orders, ranks and points.
+    - n_students (int): The number of rows of each column.
+    - start (int), end (int): The columns of the block.
+    - rule (ScoringRule): The placement points of the ranks.
+
+    Returns:
+    - tuple: (counts, scores), the number of finished students of each column of the block and the bytes of
+        the array('q') of the points of each row in the columns of the block. scores is None if the points are floats.
+    """
+    memories = [SharedMemory(name=name) for name in names]
+    views = [memory.buf.cast(typecode) for memory, typecode in zip(memories, 'dbii' + rule.typecode)]
+    times, status, orders, ranks, points = views
+    try:
+        counts = []
+        scores = array('q', bytes(8 * n_students)) if rule.typecode != 'd' else None
+        for column in range(start, end):
+            offset = column * n_students
+            column_times = times[offset:offset + n_students].tolist()
+            column_status = status[offset:offset + n_students].tolist()
+            order = [(column_times[row], row) for row, cell_status in enumerate(column_status) if cell_status == FINISHED]
+            order.sort() # By time, then by row so equal times keep the order of the result file
+            column_ranks = array('i', bytes(4 * n_students))
+            position_ranks = rule.column_ranks(order)
+            for (_, row), rank in zip(order, position_ranks):
+                column_ranks[row] = rank
+            lookup = rule.points_lookup(position_ranks[-1] if order else 0)
+            column_points = array(rule.typecode, map(lookup.__getitem__, column_ranks))
+            if scores is not None:
+                for (_, row), rank in zip(order, position_ranks):
+                    scores[row] += lookup[rank]
+            orders[offset:offset + len(order)] = array('i', [row for _, row in order]) # Each column is copied in one go
+            ranks[offset:offset + n_students] = column_ranks
+            points[offset:offset + n_students] = column_points
+            counts.append(len(order))
+        return counts, scores.tobytes() if scores is not None else None
+    finally:
+        for view in views:
+            view.release()
+        for memory in memories:
+            memory.close()
+
+
+def weigh_block(names: tuple, n_students: int, n_challenges: int, start: int, end: int, weights: list, typecode: str = 'b') -> list:
+    """
+    Returns the weighted score of the rows of a block.
+
+    Input:
+    - names (tuple): The names of the shared blocks of the status and points.
+    - n_students (int), n_challenges (int): The size of the matrix.
+    - start (int), end (int): The rows of the block.
+    - weights (list): The weight of each challenge column.
+    - typecode (str): The array typecode of the points.
+    """
+    memories = [SharedMemory(name=name) for name in names]
+    views = [memory.buf.cast(typecode) for memory, typecode in zip(memories, 'b' + typecode)]
+    status, points = views
+    try:
+        scores = [0] * (end - start)
+        for column in range(n_challenges):
+            offset = column * n_students
+            column_status = status[offset + start:offset + end].tolist()
+            column_points = points[offset + start:offset + end].tolist()
+            weight = weights[column]
+            for index, cell_status in enumerate(column_status):
+                if cell_status == FINISHED: # Only the finished students score in a challenge
+                    scores[index] += column_points[index] * weight
+        return scores
+    finally:
+        for view in views:
+            view.release()
+        for memory in memories:
+            memory.close()
+
+
+class ParallelRankingEngine(RankingEngine):
+    """
+    Ranking engine that computes the ranks and the scores on a process pool.
+    The engine is updated in place by the update methods of RankingEngine, like the serial engine.
+
+    Attributes:
+        workers (int): The number of worker processes. Default is the number of CPUs.
+    """
+    def __init__(self, matrix, workers: int = None, rule: ScoringRule = None):
+        if workers is not None and workers < 1:
+            raise ValueError("The number of workers must be at least 1")
+        self.workers = workers or os.cpu_count() or 1
+        self.__scores = None # The unweighted scores reduced while ranking, returned by the first _sum_points
+        super().__init__(matrix, rule)
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.workers} workers)'
+
+    def __serial(self) -> bool:
+        """ Returns True if the matrix is too small to be worth a process pool."""
+        return self.workers == 1 or self.matrix.n_students * self.matrix.n_challenges < MIN_PARALLEL_CELLS
+
+    def _rank_columns(self) -> None:
+        """ Rank the blocks of columns on the process pool and reduce their partial score vectors."""
+        matrix = self.matrix
+        n_students = matrix.n_students
+        if self.__serial() or matrix.n_challenges < 2:
+            super()._rank_columns()
+            return
+        memories = [share_columns(matrix.times, 'd', n_students), share_columns(matrix.status, 'b', n_students),
+                    share_columns(matrix.status, 'i', n_students, copy=False), share_columns(matrix.status, 'i', n_students, copy=False),
+                    share_columns(matrix.status, self.rule.typecode, n_students, copy=False)]
+        try:
+            names = tuple(memory.name for memory in memories)
+            blocks = split_blocks(matrix.n_challenges, self.workers * BLOCKS_PER_WORKER)
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(blocks))) as executor:
+                partials = list(executor.map(rank_block, [names] * len(blocks), [n_students] * len(blocks),
+                                             [start for start, _ in blocks], [end for _, end in blocks], [self.rule] * len(blocks)))
+            counts = [count for block_counts, _ in partials for count in block_counts]
+            if self.rule.typecode != 'd': # Integer points are added up exactly in any order
+                self.__scores = [0] * n_students
+                for _, block_scores in partials:
+                    self.__scores = [score + points for score, points in zip(self.__scores, array('q', block_scores))]
+            self.__read_columns(memories, counts)
+        finally:
+            for memory in memories:
+                memory.close()
+                memory.unlink()
+
+    def __read_columns(self, memories: list, counts: list) -> None:
+        """ Copy the orders, ranks and points written by the workers into the engine."""
+        n_students = self.matrix.n_students
+        orders = memories[2].buf.cast('i')
+        try:
+            for column, count in enumerate(counts):
+                offset = column * n_students
+                rows = orders[offset:offset + count].tolist()
+                self.orders.append(list(zip(map(self.matrix.times[column].__getitem__, rows), rows)))
+                ranks = array('i')
+                ranks.frombytes(memories[3].buf[4 * offset:4 * (offset + n_students)])
+                self.ranks.append(ranks)
+                points = array(self.rule.typecode)
+                points.frombytes(memories[4].buf[points.itemsize * offset:points.itemsize * (offset + n_students)])
+                self.points.append(points)
+        finally:
+            orders.release()
+
+    def _sum_points(self, weights: list = None) -> list:
+        """ Sum the points of every column for all the rows, the weighted sums are computed by blocks of rows on the process pool."""
+        if weights is None and self.__scores is not None:
+            scores, self.__scores = self.__scores, None
+            return scores
+        if self.__serial():
+            return super()._sum_points(weights)
+        weights = weights if weights is not None else [1] * self.matrix.n_challenges
+        n_students = self.matrix.n_students
+        memories = [share_columns(self.matrix.status, 'b', n_students), share_columns(self.points, self.rule.typecode, n_students)]
+        try:
+            names = tuple(memory.name for memory in memories)
+            blocks = split_blocks(n_students, self.workers * BLOCKS_PER_WORKER)
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(blocks))) as executor:
+                partials = executor.map(weigh_block, [names] * len(blocks), [n_students] * len(blocks), [self.matrix.n_challenges] * len(blocks),
+                                        [start for start, _ in blocks], [end for _, end in blocks], [weights] * len(blocks),
+                                        [self.rule.typecode] * len(blocks))
+                return [score for block_scores in partials for score in block_scores]
+        finally:
+            for memory in memories:
+                memory.close()
+                memory.unlink()
@@ -0,0 +1,226 @@
+"""
+Lightweight timing instrumentation of the competition program.
+
+Stages are wrapped in nested timing spans (read, compute, render, write) and the hot Result methods
+count their calls. Nothing is recorded until the tracer is enabled, a disabled span is a shared
+no-op object and a counted method is the plain method: its counting wrapper is only installed on
+the class while the tracer is enabled.
+"""
+
+import os
+import sys
+import json
+import time
+import datetime
+import functools
+
+TRACE_ENV = 'COMPETITION_TRACE' # Path of the JSON trace, enables the tracer when set
+PROFILE_ENV = 'COMPETITION_PROFILE' # Path of the cProfile dump
+
+
+class _NullSpan():
+    """ The span returned while the tracer is disabled. It does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span():
+    """ A timing span recorded by the tracer."""
+    __slots__ = ('tracer', 'name', 'attributes', 'start', 'seconds', 'children')
+
+    def __init__(self, tracer, name: str, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.seconds = 0.0
+        self.children = []
+
+    def __enter__(self):
+        self.tracer._push(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.start
+        self.tracer._pop(self)
+        return False
+
+    def to_dict(self, origin: float) -> dict:
+        """ Returns the span and its children as a dictionary, the start time relative to origin."""
+        span = {'name': self.name, 'start': round(self.start - origin, 6), 'seconds': round(self.seconds, 6)}
+        if self.attributes:
+            span['attributes'] = self.attributes
+        if self.children:
+            span['children'] = [child.to_dict(origin) for child in self.children]
+        return span
+
+
+class Tracer():
+    """
+    Collect nested timing spans and call counters.
+
+    Attributes:
+        enabled (bool): Spans and counters are only recorded when True.
+        counters (dict): The number of calls of each counted function {name: count}.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.__roots = []
+        self.__stack = []
+        self.__origin = 0.0
+
+    def __str__(self):
+        return f'{self.__class__.__name__}(enabled={self.enabled}, spans={len(self.__roots)})'
+
+    def enable(self) -> None:
+        """ Start recording, dropping anything recorded before, and install the counting wrappers of the counted methods."""
+        self.reset()
+        self.enabled = True
+        for owner, name, function in _COUNTED_METHODS:
+            setattr(owner, name, self.__counting(function))
+
+    def disable(self) -> None:
+        """ Stop recording and put the plain counted methods back. The recorded spans are kept."""
+        self.enabled = False
+        for owner, name, function in _COUNTED_METHODS:
+            if getattr(owner.__dict__.get(name), '__wrapped__', None) is function:
+                setattr(owner, name, function)
+
+    def __counting(self, function):
+        """ Returns a wrapper of the function adding each call to the counter of its qualified name."""
+        name = function.__qualname__
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.counters[name] = self.counters.get(name, 0) + 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    def reset(self) -> None:
+        """ Remove the recorded spans and counters."""
+        self.counters = {}
+        self.__roots = []
+        self.__stack = []
+        self.__origin = time.perf_counter()
+
+    def span(self, name: str, **attributes):
+        """
+        Return a context manager timing the code inside it.
+
+        Input:
+        - name (str): The name of the stage. Ex: 'read.results'
+        - attributes: Extra values saved with the span. Ex: file='results.txt'
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, attributes)
+
+    def count(self, name: str) -> None:
+        """ Add a call to the counter of the name."""
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def _push(self, span: _Span) -> None:
+        (self.__stack[-1].children if self.__stack else self.__roots).append(span)
+        self.__stack.append(span)
+
+    def _pop(self, span: _Span) -> None:
+        if self.__stack and self.__stack[-1] is span:
+            self.__stack.pop()
+
+    def totals(self) -> dict:
+        """ Returns the number of spans and the total seconds of each span name {name: {'count', 'seconds'}}."""
+        totals = {}
+        pending = list(self.__roots)
+        while pending:
+            span = pending.pop()
+            total = totals.setdefault(span.name, {'count': 0, 'seconds': 0.0})
+            total['count'] += 1
+            total['seconds'] += span.seconds
+            pending.extend(span.children)
+        return {name: {'count': total['count'], 'seconds': round(total['seconds'], 6)} for name, total in sorted(totals.items())}
+
+    def to_dict(self) -> dict:
+        """ Returns the trace as a dictionary: the span tree, the totals by span name and the call counters."""
+        return {
+            'meta': {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0], 'argv': sys.argv},
+            'spans': [span.to_dict(self.__origin) for span in self.__roots],
+            'totals': self.totals(),
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def save(self, file_name: str) -> None:
+        """ Write the trace to the file as JSON."""
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+_COUNTED_METHODS = [] # The (class, name, method) of the methods decorated with counted
+TRACER = Tracer() # The tracer of the program, disabled unless a trace is requested
+
+
+def span(name: str, **attributes):
+    """ Return a timing span of the program tracer. Ex: with span('read.results'): ..."""
+    return TRACER.span(name, **attributes)
+
+
+class _Counted():
+    """ A method marked by counted. It registers the method once the class is created and leaves the plain method in the class."""
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __set_name__(self, owner, name):
+        _COUNTED_METHODS.append((owner, name, self.function))
+        setattr(owner, name, self.function)
+
+
+def counted(function):
+    """
+    Decorator counting the calls of a method in the tracer while it is enabled.
+    The method is not wrapped while the tracer is disabled, so counting costs nothing in a normal run.
+    """
+    return _Counted(function)
+
+
+def run_instrumented(function, trace_file: str = None, profile_file: str = None):
+    """
+    Run the function with the tracer and the profiler enabled as requested.
+
+    Input:
+    - function (callable): The function without argument to run.
+    - trace_file (str): Write the JSON trace of the run to this file. Not traced if None.
+    - profile_file (str): Write the cProfile statistics of the run to this file. Not profiled if None.
+
+    Returns:
+    - The return value of the function.
+    """
+    trace_file = trace_file or os.environ.get(TRACE_ENV)
+    profile_file = profile_file or os.environ.get(PROFILE_ENV)
+    profiler = None
+    if profile_file:
+        import cProfile # Only imported when a profile is requested
+        profiler = cProfile.Profile()
+    if trace_file:
+        TRACER.enable()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        with TRACER.span('run'):
+            return function()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+        if trace_file:
+            TRACER.disable()
+            TRACER.save(trace_file)
@@ -0,0 +1,227 @@
+"""
+Query API over the students and their results.
+
+    competition.query().where('type', '==', 'P').where('wscore', '>', 10).where('time:C09', '<', 18) \\
+        .order_by('wscore', descending=True).limit(10).student_ids()
+
+The fields are:
+- type: The student type ('U' or 'P').
+- score, wscore: The score and the weighted score.
+- average, nfinish, nongoing: The average time and the number of finished and ongoing challenges.
+- time:<challenge_id>: The finish time of a challenge. Only finished results have a time.
+- status:<challenge_id>: The status of a challenge: 'finished', 'ongoing' or 'not attempted' (or FINISHED, ONGOING, NOT_ATTEMPTED).
+
+Every field has a sorted index built on the first query and kept until the results change, so a range filter
+is a binary search and an ordered query with a limit only reads the first rows of the index.
+"""
+
+import heapq
+import bisect
+import operator
+from .matrix import FINISHED, ONGOING, NOT_ATTEMPTED
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+NUMERIC_FIELDS = ('score', 'wscore', 'average', 'nfinish', 'nongoing')
+STATUS_NAMES = {'finished': FINISHED, 'ongoing': ONGOING, 'not attempted': NOT_ATTEMPTED}
+
+
+class SortedIndex():
+    """
+    The values of a field sorted with their row, for binary search range lookups.
+    Equal values are sorted by row. The rows without a value are kept apart.
+
+    Attributes:
+        keys (list): The sorted values.
+        rows (list): The row of each value.
+        missing (list): The rows without a value, in row order.
+    """
+    __slots__ = ('keys', 'rows', 'missing')
+
+    def __init__(self, values: list):
+        pairs = sorted((value, row) for row, value in enumerate(values) if value is not None)
+        self.keys = [value for value, _ in pairs]
+        self.rows = [row for _, row in pairs]
+        self.missing = [row for row, value in enumerate(values) if value is None]
+
+    def span(self, op: str, value) -> tuple:
+        """ Returns the (start, end) positions of the values matching the comparison. None for '!=' which is not a range."""
+        if op == '<':
+            return 0, bisect.bisect_left(self.keys, value)
+        if op == '<=':
+            return 0, bisect.bisect_right(self.keys, value)
+        if op == '>':
+            return bisect.bisect_right(self.keys, value), len(self.keys)
+        if op == '>=':
+            return bisect.bisect_left(self.keys, value), len(self.keys)
+        if op == '==':
+            return bisect.bisect_left(self.keys, value), bisect.bisect_right(self.keys, value)
+        return None
+
+    def ordered_rows(self, descending = False):
+        """ Yield the rows by value, equal values in row order, then the rows without a value."""
+        if not descending:
+            yield from self.rows
+        else:
+            end = len(self.keys)
+            while end > 0: # Walk the runs of equal values from the end, each run in row order
+                start = bisect.bisect_left(self.keys, self.keys[end - 1], 0, end)
+                yield from self.rows[start:end]
+                end = start
+        yield from self.missing
+
+
+class QueryIndex():
+    """
+    The field values and the sorted indexes of the students of a competition. The indexes are built on first use.
+
+    Attributes:
+        student_ids (list): The student of each row of the result table.
+    """
+    def __init__(self, competition):
+        result = competition.result
+        matrix = result.matrix
+        self.student_ids = matrix.student_ids
+        self.__matrix = matrix
+        self.__result = result
+        self.__weights = competition.challenge_weights()
+        self.__types = competition.student_manager.student_types()
+        self.__values = {} # The value of each row for each field {field: list}
+        self.__indexes = {} # {field: SortedIndex}
+
+    def check_field(self, field: str) -> None:
+        """ Raises ValueError if the field is unknown."""
+        name, _, challenge_id = field.partition(':')
+        if name in ('time', 'status'):
+            if self.__matrix.challenge_index.get(challenge_id) is None:
+                raise ValueError(f"Challenge {challenge_id} is not in the result table")
+        elif field not in NUMERIC_FIELDS and field != 'type':
+            raise ValueError(f"Unknown query field {field}")
+
+    def values(self, field: str) -> list:
+        """ Returns the value of the field for each row, None when a row has no value."""
+        if field not in self.__values:
+            self.__values[field] = self.__compute_values(field)
+        return self.__values[field]
+
+    def __compute_values(self, field: str) -> list:
+        matrix = self.__matrix
+        name, _, challenge_id = field.partition(':')
+        if name == 'time':
+            column = matrix.challenge_index[challenge_id]
+            return [time if status == FINISHED else None for time, status in zip(matrix.times[column], matrix.status[column])]
+        if name == 'status':
+            return list(matrix.status[matrix.challenge_index[challenge_id]])
+        if field == 'type':
+            return [self.__types.get(student_id) for student_id in matrix.student_ids]
+        if field == 'score':
+            return list(self.__result.student_scores())
+        if field == 'wscore':
+            return list(self.__result.student_scores(self.__weights))
+        totals = self.__result.student_totals()
+        if field == 'average':
+            return [round(total / nfinish, 2) if nfinish else None for total, nfinish in zip(totals.totals, totals.nfinish)]
+        return list(totals.nfinish if field == 'nfinish' else totals.nongoing)
+
+    def index(self, field: str) -> SortedIndex:
+        """ Returns the sorted index of the field."""
+        if field not in self.__indexes:
+            self.__indexes[field] = SortedIndex(self.values(field))
+        return self.__indexes[field]
+
+
+class StudentQuery():
+    """
+    A query over the students of a competition. The filters are combined with 'and'.
+    Build it with Competition.query(), then chain where, order_by and limit.
+    """
+    def __init__(self, competition):
+        self.__competition = competition
+        self.__filters = [] # (field, op, value)
+        self.__order = None # (field, descending)
+        self.__limit = None
+
+    def where(self, field: str, op: str, value) -> 'StudentQuery':
+        """
+        Keep the students whose field compares to the value. Students without a value for the field never match.
+
+        Input:
+        - field (str): The field to compare. Ex: 'wscore', 'time:C09'
+        - op (str): One of <, <=, >, >=, ==, !=
+        - value: The value to compare with.
+        """
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown query operator {op}")
+        if field.startswith('status:'):
+            value = STATUS_NAMES.get(str(value).lower(), value)
+        self.__filters.append((field, op, value))
+        return self
+
+    def order_by(self, field: str, descending = False) -> 'StudentQuery':
+        """ Sort the students by a numeric field or a challenge time. Equal values are in the order of the result table
+        and the students without a value come last."""
+        if field not in NUMERIC_FIELDS and not field.startswith('time:'):
+            raise ValueError(f"Cannot order by {field}")
+        self.__order = (field, descending)
+        return self
+
+    def limit(self, count: int) -> 'StudentQuery':
+        """ Only return the first count students."""
+        if count < 0:
+            raise ValueError("The limit cannot be negative")
+        self.__limit = count
+        return self
+
+    def __index(self) -> QueryIndex:
+        competition = self.__competition
+        return competition.result.cache.get(('query_index',), lambda: QueryIndex(competition))
+
+    def rows(self) -> list:
+        """ Returns the rows of the result table matching the query, in the query order."""
+        index = self.__index()
+        for field, _, _ in self.__filters:
+            index.check_field(field)
+        if self.__order is not None:
+            index.check_field(self.__order[0])
+        candidates = self.__candidates(index)
+        if self.__order is None:
+            rows = range(len(index.student_ids)) if candidates is None else sorted(candidates)
+            return list(rows)[:self.__limit] if self.__limit is not None else list(rows)
+        field, descending = self.__order
+        if candidates is None: # Without filters the index is already in the query order
+            ordered = index.index(field).ordered_rows(descending)
+            return list(ordered) if self.__limit is None else [row for row, _ in zip(ordered, range(self.__limit))]
+        values = index.values(field)
+        sign = -1 if descending else 1
+        key = lambda row: (values[row] is None, sign * values[row] if values[row] is not None else 0, row)
+        return sorted(candidates, key=key) if self.__limit is None else heapq.nsmallest(self.__limit, candidates, key=key)
+
+    def __candidates(self, index: QueryIndex):
+        """ Returns the rows matching every filter, None if there is no filter.
+        The rows of the most selective indexed filter are read from its index and the other filters are checked on them."""
+        if not self.__filters:
+            return None
+        spans = []
+        for position, (field, op, value) in enumerate(self.__filters):
+            span = index.index(field).span(op, value)
+            if span is not None:
+                spans.append((span[1] - span[0], position, span))
+        if spans:
+            _, position, (start, end) = min(spans)
+            candidates = index.index(self.__filters[position][0]).rows[start:end]
+            others = self.__filters[:position] + self.__filters[position + 1:]
+        else: # Only != filters, every row is checked
+            candidates = range(len(index.student_ids))
+            others = self.__filters
+        checks = [(index.values(field), OPERATORS[op], value) for field, op, value in others]
+        return [row for row in candidates if all(values[row] is not None and compare(values[row], value) for values, compare, value in checks)]
+
+    def student_ids(self) -> list:
+        """ Returns the IDs of the students matching the query, in the query order."""
+        student_ids = self.__index().student_ids
+        return [student_ids[row] for row in self.rows()]
+
+    def records(self) -> list:
+        """ Returns a dictionary of the student ID and the queried fields for each student matching the query."""
+        index = self.__index()
+        fields = list(dict.fromkeys(['type', 'score', 'wscore', 'average'] + [field for field, _, _ in self.__filters] + ([self.__order[0]] if self.__order else [])))
+        return [dict([('student_id', index.student_ids[row])] + [(field, index.values(field)[row]) for field in fields]) for row in self.rows()]
@@ -0,0 +1,308 @@
+"""
+Ranking and scoring engine for the competition results.
+
+Each challenge column is sorted once, which gives the rank of every student in every challenge
+and the placement points used for the scores of all the students at the same time.
+
+The placement points are defined by a ScoringRule. The rule turns the ranks of a challenge into a points
+lookup table, so the points of a whole rank column are read from the table in one pass.
+"""
+
+import json
+import bisect
+from array import array
+from .matrix import FINISHED
+
+# Define the score of each place
+FIRST_PLACE_SCORE = 3
+SECOND_PLACE_SCORE = 2
+THIRD_PLACE_SCORE = 1
+EVERY_OTHER_PLACE_SCORE = 0
+LAST_PLACE_SCORE = -1
+
+
+ROW_ORDER = 'row' # Equal times are ranked in the order of the result table
+SHARED = 'shared' # Equal times share the best of their ranks, the next rank is skipped
+TIE_POLICIES = (ROW_ORDER, SHARED)
+SCORING_RULE_KEYS = ('points', 'other_points', 'last_place', 'last_place_in_table', 'ties', 'type_weights')
+
+
+class ScoringRule():
+    """
+    Definition of the placement points of the challenges. The default rule gives 3, 2 and 1 points to the first three
+    ranks, 0 to the other ranks and -1 to the last rank when it comes after the first three.
+
+    Attributes:
+        points (tuple): The points of the ranks 1, 2, 3 and so on.
+        other_points (int or float): The points of the ranks after the points table.
+        last_place (int or float): The points of the last rank, None to give the last rank the points of the other ranks.
+        last_place_in_table (bool): Also apply the last place points when the last rank is in the points table.
+            By default the last place only applies after the ranks of the points table.
+        ties (str): ROW_ORDER or SHARED, how equal times are ranked.
+        type_weights (dict): The factor of the weight of each challenge type {type: factor}. The weights are not changed if None.
+        typecode (str): The array typecode that holds every points value of the rule.
+    """
+    def __init__(self, points = (FIRST_PLACE_SCORE, SECOND_PLACE_SCORE, THIRD_PLACE_SCORE), other_points = EVERY_OTHER_PLACE_SCORE,
+                 last_place = LAST_PLACE_SCORE, last_place_in_table = False, ties: str = ROW_ORDER, type_weights: dict = None):
+        """
+        Raises:
+        - ValueError: If a points value is not a number, the tie policy is unknown or an argument has the wrong type.
+        """
+        if not isinstance(points, (list, tuple)) or (type_weights is not None and not isinstance(type_weights, dict)):
+            raise ValueError("The points table of a scoring rule must be a list and its type weights a dictionary")
+        self.points = tuple(points)
+        self.other_points = other_points
+        self.last_place = last_place
+        self.last_place_in_table = bool(last_place_in_table)
+        self.ties = ties
+        self.type_weights = dict(type_weights) if type_weights is not None else None
+        values = self.points + (other_points,) + ((last_place,) if last_place is not None else ())
+        if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            raise ValueError("The points of a scoring rule must be numbers")
+        if ties not in TIE_POLICIES:
+            raise ValueError(f"Unknown tie policy '{ties}', expected one of {', '.join(TIE_POLICIES)}")
+        if self.type_weights is not None and not all(isinstance(factor, (int, float)) for factor in self.type_weights.values()):
+            raise ValueError("The type weights of a scoring rule must be numbers")
+        if all(isinstance(value, int) for value in values):
+            self.typecode = 'b' if all(-128 <= value <= 127 for value in values) else 'q'
+        else:
+            self.typecode = 'd'
+
+    def __str__(self):
+        return f'{self.__class__.__name__}(points={list(self.points)}, other={self.other_points}, last={self.last_place}, ties={self.ties})'
+
+    @classmethod
+    def from_dict(cls, definition: dict):
+        """
+        Build a rule from a dictionary such as the content of a JSON file.
+
+        Input:
+        - definition (dict): The arguments of the rule. Ex: {"points": [10, 6, 4, 2], "last_place": null, "ties": "shared"}
+
+        Raises:
+        - ValueError: If a key is unknown or a value is invalid.
+        """
+        unknown = [key for key in definition if key not in SCORING_RULE_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown scoring rule keys {', '.join(unknown)}, expected {', '.join(SCORING_RULE_KEYS)}")
+        return cls(**definition)
+
+    def rank_points(self, rank: int, last_rank: int):
+        """
+        Returns the points of a rank.
+
+        Input:
+        - rank (int): The rank, starting from 1.
+        - last_rank (int): The rank of the last finished students of the challenge.
+        """
+        if self.last_place is not None and rank == last_rank and (self.last_place_in_table or rank > len(self.points)):
+            return self.last_place
+        return self.points[rank - 1] if rank <= len(self.points) else self.other_points
+
+    def points_lookup(self, last_rank: int) -> list:
+        """ Returns the points of every rank up to the last rank, indexed by rank. The index 0 is for the students that did not finish."""
+        lookup = [0] + list(self.points[:last_rank]) + [self.other_points] * (last_rank - len(self.points))
+        if last_rank:
+            lookup[last_rank] = self.rank_points(last_rank, last_rank)
+        return lookup
+
+    def column_ranks(self, order: list) -> list:
+        """
+        Returns the rank of each position of a challenge order.
+
+        Input:
+        - order (list): The (time, row) of the finished students, sorted.
+        """
+        if self.ties == ROW_ORDER:
+            return list(range(1, len(order) + 1))
+        ranks = []
+        for position, (time, _) in enumerate(order):
+            ranks.append(ranks[-1] if position and order[position - 1][0] == time else position + 1)
+        return ranks
+
+    def challenge_weights(self, challenge_weights: dict, challenge_types: dict) -> dict:
+        """
+        Returns the weights of the challenges multiplied by the factor of their type.
+
+        Input:
+        - challenge_weights (dict): The weight of each challenge {challenge_id: weight}
+        - challenge_types (dict): The type of each challenge {challenge_id: type}
+        """
+        if self.type_weights is None:
+            return challenge_weights
+        return {challenge_id: weight * self.type_weights.get(challenge_types.get(challenge_id), 1)
+                for challenge_id, weight in challenge_weights.items()}
+
+
+DEFAULT_SCORING_RULE = ScoringRule()
+
+
+def read_scoring_rule(file_name: str) -> ScoringRule:
+    """
+    Read a scoring rule from a JSON file.
+
+    Ex: {"points": [10, 6, 4, 3, 2, 1], "last_place": null, "ties": "shared", "type_weights": {"S": 2}}
+
+    Raises:
+    - ValueError: If the file is not a valid scoring rule.
+    """
+    with open(file_name, "r", encoding="utf-8") as file:
+        try:
+            definition = json.load(file)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid scoring rule file {file_name}: {e}") from None
+    if not isinstance(definition, dict):
+        raise ValueError(f"Invalid scoring rule file {file_name}: expected a JSON object")
+    return ScoringRule.from_dict(definition)
+
+
+class RankingEngine():
+    """
+    Compute the ranks and the scores of every student in a single pass over the result matrix.
+
+    Attributes:
+        orders (list): For each challenge column, the (time, row) of the finished students sorted by time, then by row
+            so equal times keep the order of the result file.
+        ranks (list): For each challenge column, an array('i') with the rank of each row (0 if not finished).
+        points (list): For each challenge column, an array with the placement score of each row.
+        scores (list): The unweighted score of each row.
+        rule (ScoringRule): The placement points of the ranks.
+    """
+    def __init__(self, matrix, rule: ScoringRule = None):
+        self.matrix = matrix
+        self.rule = rule if rule is not None else DEFAULT_SCORING_RULE
+        self.orders = []
+        self.ranks = []
+        self.points = []
+        self.__weighted = {} # The weighted score vectors by weights key {key: (weights, scores)}
+        self._rank_columns()
+        self.scores = self._sum_points()
+
+    def _rank_columns(self) -> None:
+        """ Sort every challenge column and store their orders, ranks and points."""
+        for column in range(self.matrix.n_challenges):
+            self._rank_column(column)
+
+    def _rank_column(self, column: int) -> None:
+        """ Sort a challenge column once and store its order, ranks and points."""
+        times = self.matrix.times[column]
+        order = [(times[row], row) for row, status in enumerate(self.matrix.status[column]) if status == FINISHED]
+        order.sort()
+        ranks = array('i', bytes(4 * self.matrix.n_students))
+        position_ranks = self.rule.column_ranks(order)
+        for (_, row), rank in zip(order, position_ranks):
+            ranks[row] = rank
+        lookup = self.rule.points_lookup(position_ranks[-1] if order else 0)
+        points = array(self.rule.typecode, map(lookup.__getitem__, ranks)) # The points of the whole column in one lookup
+        self.orders.append(order)
+        self.ranks.append(ranks)
+        self.points.append(points)
+
+    def _sum_points(self, weights: list = None) -> list:
+        """ Sum the points of every column for all the rows, multiplied by the weight of each column if given."""
+        scores = [0] * self.matrix.n_students
+        for column, points in enumerate(self.points):
+            weight = weights[column] if weights is not None else 1
+            for _, row in self.orders[column]: # Only the finished students score in a challenge
+                scores[row] += points[row] * weight
+        return scores
+
+    def weighted_scores(self, challenge_weights: dict) -> list:
+        """
+        Return the weighted score of each row. The vector is kept up to date by the update methods.
+
+        Input:
+        - challenge_weights (dict): A dictionary of the challenge id and their weight {challenge_id: weight}
+        """
+        key = tuple(sorted(challenge_weights.items()))
+        if key not in self.__weighted:
+            weights = [challenge_weights[challenge_id] for challenge_id in self.matrix.challenge_ids]
+            self.__weighted[key] = (weights, self._sum_points(weights))
+        return self.__weighted[key][1]
+
+    def rescore(self, rule: ScoringRule, challenge_weights: dict = None) -> list:
+        """
+        Return the score of each row under another scoring rule, reusing the sorted challenges of the engine.
+        The engine itself is not changed.
+
+        Input:
+        - rule (ScoringRule): The rule to score with.
+        - challenge_weights (dict): A dictionary of the challenge id and their weight {challenge_id: weight}. Unweighted if None.
+        """
+        weights = [challenge_weights[challenge_id] for challenge_id in self.matrix.challenge_ids] if challenge_weights is not None else None
+        scores = [0] * self.matrix.n_students
+        for column, order in enumerate(self.orders):
+            position_ranks = rule.column_ranks(order)
+            lookup = rule.points_lookup(position_ranks[-1] if order else 0)
+            weight = weights[column] if weights is not None else 1
+            for (_, row), rank in zip(order, position_ranks):
+                scores[row] += lookup[rank] * weight
+        return scores
+
+    def challenge_order(self, column: int) -> list:
+        """ Return the student ids of a challenge column sorted by their rank."""
+        return [self.matrix.student_ids[row] for _, row in self.orders[column]]
+
+    def __set_points(self, row: int, column: int, rank: int, points: int) -> None:
+        """ Change the rank and points of a cell and apply the difference to the score vectors."""
+        self.ranks[column][row] = rank
+        delta = points - self.points[column][row]
+        if delta:
+            self.points[column][row] = points
+            self.scores[row] += delta
+            for weights, scores in self.__weighted.values():
+                scores[row] += delta * weights[column]
+
+    def update_cell(self, row: int, column: int, old_status: int, old_time: float) -> None:
+        """
+        Update the ranking after a cell of the matrix changed. Only the order of the changed column is adjusted,
+        by binary insertion, and only the scores of the rows whose points changed are updated.
+
+        Input:
+        - row (int), column (int): The changed cell.
+        - old_status (int), old_time (float): The value of the cell before the change.
+        """
+        order = self.orders[column]
+        removed = inserted = None # The positions where the old time was removed and the new time was inserted
+        if old_status == FINISHED:
+            removed = bisect.bisect_left(order, (old_time, row))
+            del order[removed]
+            self.__set_points(row, column, 0, 0)
+        if self.matrix.status[column][row] == FINISHED:
+            key = (self.matrix.times[column][row], row)
+            inserted = bisect.bisect_left(order, key)
+            order.insert(inserted, key)
+        if removed is None and inserted is None:
+            return
+        no_finished = len(order)
+        if self.rule.ties != ROW_ORDER: # A shared rank can move the ranks of a whole group of equal times, the column is ranked again
+            position_ranks = self.rule.column_ranks(order)
+            for (_, other_row), rank in zip(order, position_ranks):
+                self.__set_points(other_row, column, rank, self.rule.rank_points(rank, position_ranks[-1]))
+            return
+        if removed is not None and inserted is not None:
+            # Same number of finished students: only the ranks between the two positions moved
+            start, end = min(removed, inserted), max(removed, inserted) + 1
+        else:
+            # The ranks after the change moved by one, and the last place may have changed hands
+            changed = removed if removed is not None else inserted
+            start = max(0, min(changed, no_finished - 2))
+            end = no_finished
+        for position in range(start, end):
+            self.__set_points(order[position][1], column, position + 1, self.rule.rank_points(position + 1, no_finished))
+
+    def add_row(self) -> None:
+        """ Extend the ranking after an empty student row was appended to the matrix."""
+        for column in range(len(self.orders)):
+            self.ranks[column].append(0)
+            self.points[column].append(0)
+        self.scores.append(0)
+        for _, scores in self.__weighted.values():
+            scores.append(0)
+
+    def add_column(self) -> None:
+        """ Extend the ranking after an empty challenge column was appended to the matrix."""
+        self.orders.append([])
+        self.ranks.append(array('i', bytes(4 * self.matrix.n_students)))
+        self.points.append(array(self.rule.typecode, bytes(array(self.rule.typecode).itemsize * self.matrix.n_students)))
+        self.__weighted.clear() # The weight of the new challenge is not known by the existing weighted vectors
@@ -0,0 +1,118 @@
+"""
+Streaming reader for the result file.
+
+The number of challenge columns is taken from the header line and the student rows are parsed
+in fixed-size batches, so only one batch of text is held in memory at any time.
+"""
+
+from .matrix import ResultMatrix, parse_cell
+
+DEFAULT_BATCH_SIZE = 4096 # Number of student rows parsed per batch
+
+
+def process_header_cell(value: str) -> str:
+    """ Strip a header cell and replace the empty top left cell with "Results"."""
+    value = value.strip()
+    return value if value else 'Results'
+
+
+def split_result_line(line: str, line_no: int, width: int = None) -> list:
+    """
+    Split a line of the result file into its cells.
+
+    Input:
+    - line (str): The line to split.
+    - line_no (int): The line number in the file, used in the error messages.
+    - width (int): The expected number of cells. Not checked if None.
+
+    Raises:
+    - ValueError: If the line is not separated by comma or has an unexpected number of cells.
+    """
+    if ',' not in line:
+        raise ValueError(f"Result record must be separated by comma (line {line_no})")
+    cells = line.strip().split(",")
+    if width is not None and len(cells) != width: # Every record must have one cell per challenge + 1 for the student id
+        raise ValueError(f"Unexpected number of elements in result record, expected {width} but found {len(cells)} (line {line_no})")
+    return cells
+
+
+def parse_result_line(line: str, line_no: int, width: int) -> tuple:
+    """
+    Parse a student line of the result file.
+
+    Returns:
+    - tuple: (student_id, [(status, time), ...])
+    """
+    cells = split_result_line(line, line_no, width)
+    try:
+        return cells[0].strip(), [parse_cell(cell) for cell in cells[1:]]
+    except ValueError as e:
+        raise ValueError(f"{e} (line {line_no})") from None
+
+
+class ResultFileReader():
+    """
+    Read a result file header first, then the student rows in batches.
+
+    Attributes:
+        file_name (str): The path to the result file.
+        batch_size (int): The number of rows in each batch.
+        label (str): The top left cell of the header.
+        challenge_ids (list): The challenge IDs of the header.
+    """
+    def __init__(self, file_name: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.file_name = file_name
+        self.batch_size = batch_size
+        self.label = None
+        self.challenge_ids = None
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.file_name})'
+
+    def batches(self):
+        """
+        Yield the student rows of the file in lists of at most batch_size parsed rows.
+        The header is read before the first batch is yielded.
+
+        Raises:
+        - ValueError: If the file is empty or a line is invalid.
+        """
+        with open(self.file_name, "r", encoding="utf-8") as file:
+            width = None
+            batch = []
+            for line_no, line in enumerate(file, start=1):
+                if not line.strip(): # Skip blank lines such as a trailing new line
+                    continue
+                if width is None: # The first line is the header, its length gives the number of columns
+                    header = [process_header_cell(cell) for cell in split_result_line(line, line_no)]
+                    self.label, self.challenge_ids = header[0], header[1:]
+                    width = len(header)
+                    continue
+                batch.append(parse_result_line(line, line_no, width))
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if width is None:
+                raise ValueError("No result in the competition")
+            if batch:
+                yield batch
+
+    def read_into(self, matrix: ResultMatrix = None) -> ResultMatrix:
+        """
+        Read the whole file batch by batch into a result matrix.
+
+        Input:
+        - matrix (ResultMatrix): The matrix to fill. A new matrix is created from the header if None.
+        """
+        batches = self.batches()
+        first_batch = next(batches, [])
+        if matrix is None:
+            matrix = ResultMatrix(self.challenge_ids, self.label)
+        elif matrix.challenge_ids != self.challenge_ids:
+            raise ValueError(f"The challenges of {self.file_name} do not match the result table")
+        matrix.extend_rows(first_batch)
+        for batch in batches:
+            matrix.extend_rows(batch)
+        return matrix
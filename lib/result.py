@@ -3,24 +3,166 @@ This result file contain all relevant structure to handle the result class
 """
 
 from .challenge import Challenge
+from .matrix import ResultMatrix, FINISHED, ONGOING, NOT_ATTEMPTED, NO_TIME
+from .reader import ResultFileReader, DEFAULT_BATCH_SIZE
+from .chunked_reader import ChunkedResultReader
+from .ranking import RankingEngine, ScoringRule, DEFAULT_SCORING_RULE
+from .parallel_ranking import ParallelRankingEngine
+from .cache import AggregateCache
+from .totals import RunningTotals
+from .profiling import counted
+from .leaderboard import top_rows, check_top_arguments, EXCLUDE
 
 class Result():
     """ This is the result class"""
-    def __init__(self, result_array = None):
-        self.result_array = result_array if result_array else []
+    rank_workers = None # The ranks and scores are computed by this many processes when given
+    scoring_rule = DEFAULT_SCORING_RULE # The placement points of the ranks
+
+    def __init__(self, result_array = None, rank_workers: int = None, scoring_rule: ScoringRule = None):
+        self.cache = AggregateCache() # Derived aggregates are computed once and reused until the results change
+        self.rank_workers = rank_workers
+        if scoring_rule is not None:
+            self.scoring_rule = scoring_rule
+        self.matrix = ResultMatrix.from_rows(result_array) if result_array else ResultMatrix()
+
+    @property
+    def matrix(self) -> ResultMatrix:
+        """ Returns the result matrix."""
+        return self.__matrix
+
+    @matrix.setter
+    def matrix(self, new_matrix: ResultMatrix):
+        self.__matrix = new_matrix
+        self.invalidate_cache() # The aggregates are computed again from the new matrix when needed
+
+    def invalidate_cache(self) -> None:
+        """ Remove every cached aggregate. Must be called after the result matrix is changed in place."""
+        self.cache.invalidate()
+
+    @staticmethod
+    def _weights_key(challenge_weights: dict) -> tuple:
+        """ Return a hashable cache key for the challenge weights dictionary"""
+        return tuple(sorted(challenge_weights.items())) if challenge_weights is not None else None
+
+    @property
+    def ranking(self) -> RankingEngine:
+        """ Returns the ranking engine of the result matrix, computing it on the first use."""
+        if self.rank_workers is not None:
+            return self.cache.get(('ranking',), lambda: ParallelRankingEngine(self.matrix, self.rank_workers, self.scoring_rule))
+        return self.cache.get(('ranking',), lambda: RankingEngine(self.matrix, self.scoring_rule))
+
+    def set_scoring_rule(self, rule: ScoringRule) -> None:
+        """ Score the results with another rule from now on. The ranks and scores are computed again when needed."""
+        self.scoring_rule = rule
+        self.invalidate_cache()
+
+    def rescore(self, rule: ScoringRule, challenge_weights: dict = None) -> list:
+        """
+        Return the score of every student under another scoring rule, in the order of the result table.
+        The sorted challenges of the current ranking are reused and the scoring rule of the results is not changed,
+        so many rules can be compared on the same results.
+
+        Input:
+        - rule (ScoringRule): The rule to score with.
+        - challenge_weights (dict): A dictionary of the challenge id and their weight {challenge_id: weight}. Unweighted if None.
+        """
+        return self.ranking.rescore(rule, challenge_weights)
+
+    @counted
+    def student_scores(self, challenge_weights: dict = None) -> list:
+        """
+        Return the score of every student, in the order of the result table.
+
+        Input:
+        - challenge_weights (dict): A dictionary of the challenge id and their weight {challenge_id: weight}
+        """
+        if challenge_weights is None:
+            return self.ranking.scores
+        return self.cache.get(('scores', self._weights_key(challenge_weights)), lambda: self.ranking.weighted_scores(challenge_weights))
+
+    @property
+    def result_array(self) -> list:
+        """ Returns the result table as a list of string rows, the header row first."""
+        return self.matrix.to_rows()
+
+    @result_array.setter
+    def result_array(self, new_result_array: list):
+        self.matrix = ResultMatrix.from_rows(new_result_array) if new_result_array else ResultMatrix()
 
     def transpose(self):
         """ Transpose the result table"""
         return list(map(list, zip(*self.result_array)))  # Base on a code idea from stack overflow [1]
-    
+
+    @property
+    def student_ids(self) -> list:
+        """ Returns the student ID of each row of the result table."""
+        return self.matrix.student_ids
+
+    @property
+    def challenge_ids(self) -> list:
+        """ Returns the challenge ID of each column of the result table."""
+        return self.matrix.challenge_ids
+
+    def _student_row(self, student_id: str):
+        """ Return the row index of the student in the result matrix or None if not found"""
+        return self.matrix.student_index.get(student_id)
+
+    def _challenge_column(self, challenge_id: str):
+        """ Return the column index of the challenge in the result matrix or None if not found"""
+        return self.matrix.challenge_index.get(challenge_id)
+
     def return_challenge_result(self, challenge_id:str) -> list:
         """ Return the result of a challenge"""
-        transpose_result = self.transpose() # Transpose the result table so that the challenge id is in the first column
-        for row in transpose_result[1:]:
-            if row[0] == challenge_id:
-                return row
+        column = self._challenge_column(challenge_id)
+        if column is None:
             return None
-    
+        return [challenge_id] + [self.matrix.cell_text(row, column) for row in range(self.matrix.n_students)]
+
+    @counted
+    def challenge_statistics(self, challenge_id: str) -> tuple:
+        """
+        Calculate the number of finished and ongoing results and the average time of a challenge.
+
+        Input:
+        - challenge_id (str): The ID of the challenge to find.
+
+        Returns:
+        - tuple: (nfinish, nongoing, average_time) or None if the challenge is not in the result table.
+            The average time is None if no student finished the challenge.
+        """
+        column = self._challenge_column(challenge_id)
+        if column is None:
+            return None
+        return self.challenge_totals().statistics(column)
+
+    def all_challenge_statistics(self) -> list:
+        """ Return the (nfinish, nongoing, average_time) tuple of every challenge, in the order of the result table."""
+        totals = self.challenge_totals()
+        return [totals.statistics(column) for column in range(len(totals))]
+
+    def challenge_totals(self) -> RunningTotals:
+        """ Return the running totals of every challenge column."""
+        return self.cache.get(('challenge_totals',), self._compute_challenge_totals)
+
+    def _compute_challenge_totals(self) -> RunningTotals:
+        """ Compute the totals of every challenge with one pass over each column"""
+        challenge_totals = RunningTotals(self.matrix.n_challenges)
+        for column, (times, status_column) in enumerate(zip(self.matrix.times, self.matrix.status)):
+            total = 0.0
+            nfinish = 0
+            nongoing = 0
+            for row, status in enumerate(status_column):
+                if status == FINISHED:
+                    total += times[row]
+                    nfinish += 1
+                elif status == ONGOING:
+                    nongoing += 1
+            challenge_totals.totals[column] = total
+            challenge_totals.nfinish[column] = nfinish
+            challenge_totals.nongoing[column] = nongoing
+        return challenge_totals
+
+    @counted
     def challenge_average_times(self, challenge_id: str) -> float:
         """
         Calculate the average time for the challenge with the given ID.
@@ -31,18 +173,18 @@ class Result():
         Returns:
         - float: The average time for the challenge with the given ID.
         """
-        for i in range(1, len(self.result_array)):
-            if self.result_array[i][0] == challenge_id:
-                row = self.return_challenge_result(challenge_id)
-                print(row)
-                times = [float(x) for x in row[1:] if x not in ['--', '', None]]
-                valid_times = len(times)
-                return round(float(sum(times) / valid_times), 2)
+        statistics = self.challenge_statistics(challenge_id)
+        return statistics[2] if statistics else None
 
+    @counted
     def return_hardest_challenge(self)-> tuple:
         """ Return a tuple of the hardest challenge and its average time"""
+        return self.cache.get(('hardest_challenge',), self._compute_hardest_challenge)
+
+    def _compute_hardest_challenge(self) -> tuple:
+        """ Find the challenge with the highest average time"""
         challenge_average_times = {}
-        for challenge_id in self.result_array[0][1:]:
+        for challenge_id in self.challenge_ids:
             average_time = self.challenge_average_times(challenge_id)
             if average_time is not None:
                 challenge_average_times[challenge_id] = average_time
@@ -54,7 +196,7 @@ class Result():
 
     def return_no_challenges(self):
         """ Return the number of challenges"""
-        return len(self.result_array[0]) - 1
+        return self.matrix.n_challenges
     
     @staticmethod
     def result_table_process(value) -> str:
@@ -69,38 +211,77 @@ class Result():
             return ''
         return value
 
-    def read_results_file(self, file_name):
-        """ Read the result file"""
-        result_array = []  # Define result_array variable
-        # open the file with explicit encoding
-        with open(file_name, "r", encoding="utf-8") as file:
-            # read the rest of the file
-            for line in file:
-                if ',' not in line:
-                    raise ValueError("Result record must be separated by comma")
-                row = []
-                cells = line.strip().split(",")
-                if len(cells) != 6: # Check if the number of elements in the result record is equal to the number of challenges + 1 header
-                    raise ValueError("Unexpected number of elements in result record or record is not separated by comma")
-                for cell in cells:
-                    cell = Result.result_table_process(cell)  # Define self variable
-                    row.append(cell)
-                result_array.append(row)
-        if not result_array:
-            raise ValueError("No result in the competition")
-        self.result_array = result_array
+    def read_results_file(self, file_name, batch_size = DEFAULT_BATCH_SIZE, workers: int = None):
+        """
+        Read the result file. The number of challenges is taken from the header line
+        and the rows are parsed in batches of batch_size lines.
+        With workers, the file is memory-mapped and its lines are parsed in byte ranges by that many processes instead.
+        """
+        if workers is None:
+            self.matrix = ResultFileReader(file_name, batch_size).read_into()
+        else:
+            self.matrix = ChunkedResultReader(file_name, workers).read_into()
+
+    def header_row(self) -> list:
+        """ Return the header row of the result table: the label and the challenge IDs"""
+        return self.matrix.header_row()
+
+    def iter_student_rows(self):
+        """ Yield the display row of every student one by one: the student ID and the text of each result"""
+        for row in range(self.matrix.n_students):
+            yield self.matrix.student_row(row)
 
     def return_student_result(self, student_id) -> list:
         """ Return the result of a student"""
-        for row in self.result_array:
-            if row[0] == student_id:
-                return row
-        return None
+        row = self._student_row(student_id)
+        if row is None:
+            return None
+        return self.matrix.student_row(row)
     
     def return_no_students(self):
         """ Return the number of students"""
-        return len(self.result_array) - 1 # Exclude the header row
+        return self.matrix.n_students
 
+    @counted
+    def student_statistics(self, student_id: str) -> tuple:
+        """
+        Calculate the number of finished and ongoing challenges and the average time of a student.
+
+        Input:
+        - student_id (str): The ID of the student to find.
+
+        Returns:
+        - tuple: (nfinish, nongoing, average_time) or None if the student is not in the result table.
+            The average time is None if the student did not finish any challenge.
+        """
+        row = self._student_row(student_id)
+        if row is None:
+            return None
+        return self.student_totals().statistics(row)
+
+    def all_student_statistics(self) -> list:
+        """ Return the (nfinish, nongoing, average_time) tuple of every student, in the order of the result table."""
+        totals = self.student_totals()
+        return [totals.statistics(row) for row in range(len(totals))]
+
+    def student_totals(self) -> RunningTotals:
+        """ Return the running totals of every student row."""
+        return self.cache.get(('student_totals',), self._compute_student_totals)
+
+    def _compute_student_totals(self) -> RunningTotals:
+        """ Compute the totals of every student together with one pass over each column"""
+        student_totals = RunningTotals(self.matrix.n_students)
+        totals, nfinish, nongoing = student_totals.totals, student_totals.nfinish, student_totals.nongoing
+        for times, status_column in zip(self.matrix.times, self.matrix.status):
+            for row, status in enumerate(status_column):
+                if status == FINISHED:
+                    totals[row] += times[row]
+                    nfinish[row] += 1
+                elif status == ONGOING:
+                    nongoing[row] += 1
+        return student_totals
+
+    @counted
     def student_average_time(self, student_id: str) -> float:
         """
         Calculate the average time for the student with the given ID.
@@ -111,12 +292,10 @@ class Result():
         Returns:
         - float: The average time for the student with the given ID.
         """
-        for i in range(1, len(self.result_array)):
-            if self.result_array[i][0] == student_id:
-                times = [float(x) for x in self.result_array[i][1:] if x not in ['--', '', None]]
-                valid_times = len(times)
-                return round(float(sum(times) / valid_times), 2) if valid_times else None
+        statistics = self.student_statistics(student_id)
+        return statistics[2] if statistics else None
     
+    @counted
     def return_student_participation(self, student_id: str) -> dict:
         """
         This function return a dictionary of the challenge that indicate whether the student participated in the challenge or not.
@@ -128,49 +307,97 @@ class Result():
         - dict: A dictionary of the challenge that indicate whether the student participated in the challenge or not.
         The value of the dictionary is -1 if the student did not participate, 0 if the student participated but did not finish, 1 if the student participated and finished.
         """
-        student_result = self.return_student_result(student_id)
-        if student_result is None:
+        row = self._student_row(student_id)
+        if row is None:
             return None
-        student_participation = {}
-        for i in range(1, len(student_result)):
-            if student_result[i] in ['', None]: 
-                student_participation[self.result_array[0][i]] = -1 # If the student did not participate
-            elif student_result[i] in ['TBA', 'tba', '444', '--']: 
-                student_participation[self.result_array[0][i]] = 0 # If the student participated but did not finish
-            else:
-                student_participation[self.result_array[0][i]] = 1 # If the student participated and finished
-        return student_participation
+        # The status codes of the matrix are the participation codes
+        return {challenge_id: status[row] for challenge_id, status in zip(self.matrix.challenge_ids, self.matrix.status)}
 
+    @counted
     def fastest_student(self) -> tuple:
         """
         Display the fastest student in the latest result record with their average time.
 
         Returns:
-        - tuple: A tuple containing the fastest student id and their average time.
-        """
-        # Since the latest result is always the top of the list, we can access index 0 to get the latest result
-        student_average_times = {}
-        for student in self.result_array[1:]:
-            student_average_times[student[0]] = self.student_average_time(student[0])
-        fastest_student = min(student_average_times, key=student_average_times.get)
-        return (fastest_student, student_average_times[fastest_student])
+        - tuple: A tuple containing the fastest student id and their average time. (None, None) if no student finished a challenge.
+        """
+        return self.cache.get(('fastest_student',), self._compute_fastest_student)
+
+    def _compute_fastest_student(self) -> tuple:
+        """ Find the student with the lowest average time"""
+        leaders = self.top_fastest_students(1)
+        return leaders[0] if leaders else (None, None)
     
+    @counted
     def highest_score_student(self, challenge_weights:dict = None) -> tuple:
         """
         Display the highest score student in the latest result record with their score.
 
         Returns:
-        - tuple: A tuple containing the highest score student object and their score.
+        - tuple: A tuple containing the highest score student object and their score. (None, None) if no student finished a challenge.
         """
-        # Since the latest result is always the top of the list, we can access index 0 to get the latest result
-        student_scores = {}
-        for student in self.result_array[1:]:
-            student_scores[student[0]] = self.return_student_score(student[0], challenge_weights)
-        highest_score_student = max(student_scores, key=student_scores.get)
-        return (highest_score_student, student_scores[highest_score_student])
+        return self.cache.get(('highest_score_student', self._weights_key(challenge_weights)), lambda: self._compute_highest_score_student(challenge_weights))
 
+    def _compute_highest_score_student(self, challenge_weights: dict = None) -> tuple:
+        """ Find the student with the highest score"""
+        leaders = self.top_score_students(1, challenge_weights)
+        return leaders[0] if leaders else (None, None)
 
-    
+    def top_fastest_students(self, k: int, no_results: str = EXCLUDE) -> list:
+        """
+        Return the k students with the lowest average time, fastest first.
+
+        Input:
+        - k (int): The number of students.
+        - no_results (str): 'exclude' to leave out the students without a finished challenge,
+            'last' to put them after the other students with an average time of None.
+
+        Returns:
+        - list: The (student_id, average_time) of the leaders. Equal averages are in the order of the result table.
+        """
+        totals = self.student_totals()
+        # The averages are rounded like in the reports, so the students that show the same average are tied
+        averages = [round(total / nfinish, 2) if nfinish else None for total, nfinish in zip(totals.totals, totals.nfinish)]
+        rows = top_rows(averages, totals.nfinish, k, largest=False, no_results=no_results)
+        return [(self.student_ids[row], averages[row]) for row in rows]
+
+    def top_score_students(self, k: int, challenge_weights: dict = None, no_results: str = EXCLUDE) -> list:
+        """
+        Return the k students with the highest score, highest first.
+
+        Input:
+        - k (int): The number of students.
+        - challenge_weights (dict): Use the weighted score with these weights {challenge_id: weight}. The plain score if None.
+        - no_results (str): 'exclude' to leave out the students without a finished challenge, 'last' to put them after the other students.
+
+        Returns:
+        - list: The (student_id, score) of the leaders. Equal scores are in the order of the result table.
+        """
+        scores = self.student_scores(challenge_weights)
+        rows = top_rows(scores, self.student_totals().nfinish, k, largest=True, no_results=no_results)
+        return [(self.student_ids[row], scores[row]) for row in rows]
+
+    def top_challenge_students(self, challenge_id: str, k: int) -> list:
+        """
+        Return the k fastest students of a challenge. Only the students that finished the challenge are ranked.
+
+        Returns:
+        - list: The (student_id, time) of the leaders. Equal times are in the order of the result table.
+        """
+        check_top_arguments(k)
+        column = self._challenge_column(challenge_id)
+        if column is None:
+            raise ValueError(f"Challenge {challenge_id} is not in the result table")
+        ranking = self.cache.peek(('ranking',))
+        if ranking is not None: # The ranking already holds the finished students of the challenge in order
+            leaders = ranking.orders[column][:k]
+        else:
+            times, status = self.matrix.times[column], self.matrix.status[column]
+            finished = [code == FINISHED for code in status]
+            leaders = [(times[row], row) for row in top_rows(times, finished, k)]
+        return [(self.matrix.student_ids[row], time) for time, row in leaders]
+
+    @counted
     def return_challenge_rank(self, challenge_id: str) -> list:
         """ 
         Return a list of student id that participate in the challenge with the given id with their rank
@@ -181,11 +408,12 @@ class Result():
         Returns:
         - list: A list of student id that participate in the challenge with the given id sort by their rank
         """
-        challenge_index = self.result_array[0].index(challenge_id)
-        student_results = {student[0]: float(student[challenge_index]) for student in self.result_array[1:] if student[challenge_index] not in ['', None, 'TBA', 'tba', '444', '--']}
-        sorted_student_results = sorted(student_results.items(), key=lambda x: x[1])
-        return [student_id for student_id, _ in sorted_student_results]  # Return a list of student id that participate in the challenge with the given id with their rank
-            
+        column = self._challenge_column(challenge_id)
+        if column is None:
+            raise ValueError(f"Challenge {challenge_id} is not in the result table")
+        return self.ranking.challenge_order(column)  # Return a list of student id that participate in the challenge with the given id with their rank
+
+    @counted
     def return_student_score(self, student_id, challenge_weights: dict = None) -> int:
         """
         This function return the score of a student. Score is compute base on if student come first, second or last in each 
@@ -197,33 +425,84 @@ class Result():
         Returns:
         - int: The score of the student.
         """
-        # Define the score of each place
-        first_place_score = 3
-        second_place_score = 2
-        third_place_score = 1
-        every_other_place_score = 0
-        last_place_score = -1
-        # Define the score of the student
-        student_score = 0
-        for challenge_id in self.result_array[0][1:]:
-            challenge_rank_list = self.return_challenge_rank(challenge_id)
-            if student_id in challenge_rank_list:
-                student_rank = challenge_rank_list.index(student_id) + 1 # Get the index of the student in the challenge rank list and add 1 to it to get the rank of the student
-                if challenge_weights is not None:
-                    challenge_weight = challenge_weights[challenge_id]
-                else:
-                    challenge_weight = 1 # If the challenge weight is not provided then set it to 1
-                if student_rank == 1:
-                    student_score += first_place_score * challenge_weight
-                elif student_rank == 2:
-                    student_score += second_place_score * challenge_weight
-                elif student_rank == 3:
-                    student_score += third_place_score * challenge_weight
-                elif student_rank == len(challenge_rank_list):
-                    student_score += last_place_score * challenge_weight
-                elif student_rank > 3:
-                    student_score += every_other_place_score * challenge_weight
-        return student_score
+        row = self._student_row(student_id)
+        if row is None:
+            return 0
+        return self.student_scores(challenge_weights)[row]
+
+    def __locate(self, student_id: str, challenge_id: str) -> tuple:
+        """ Return the (row, column) of a result or raise a ValueError if the student or the challenge is unknown"""
+        row = self._student_row(student_id)
+        if row is None:
+            raise ValueError(f"Student {student_id} is not in the result table")
+        column = self._challenge_column(challenge_id)
+        if column is None:
+            raise ValueError(f"Challenge {challenge_id} is not in the result table")
+        return row, column
+
+    def _invalidate_leaders(self) -> None:
+        """ Remove the cached aggregates that are derived from every student or challenge"""
+        for name in ('fastest_student', 'highest_score_student', 'hardest_challenge', 'query_index'):
+            self.cache.invalidate(name)
+
+    @counted
+    def set_result(self, student_id: str, challenge_id: str, status: int, time: float = NO_TIME) -> None:
+        """
+        Change a single result and update the cached totals and ranking incrementally.
+        Only the order of the changed challenge is adjusted instead of computing every aggregate again.
+
+        Input:
+        - student_id (str): The ID of the student.
+        - challenge_id (str): The ID of the challenge.
+        - status (int): FINISHED, ONGOING or NOT_ATTEMPTED.
+        - time (float): The finish time, only used if the status is FINISHED.
+        """
+        row, column = self.__locate(student_id, challenge_id)
+        old_status, old_time = self.matrix.set_cell(row, column, status, time)
+        new_time = self.matrix.times[column][row]
+        for totals, index in ((self.cache.peek(('student_totals',)), row), (self.cache.peek(('challenge_totals',)), column)):
+            if totals is not None:
+                totals.add(index, old_status, old_time, -1)
+                totals.add(index, status, new_time)
+        ranking = self.cache.peek(('ranking',))
+        if ranking is not None:
+            ranking.update_cell(row, column, old_status, old_time) # The weighted score vectors are updated in place too
+        self._invalidate_leaders()
+
+    def record_time(self, student_id: str, challenge_id: str, time: float) -> None:
+        """ Record the finish time of a student in a challenge."""
+        self.set_result(student_id, challenge_id, FINISHED, float(time))
+
+    def mark_ongoing(self, student_id: str, challenge_id: str) -> None:
+        """ Mark the result of a student in a challenge as ongoing."""
+        self.set_result(student_id, challenge_id, ONGOING)
+
+    def clear_result(self, student_id: str, challenge_id: str) -> None:
+        """ Mark a student as not attempting a challenge."""
+        self.set_result(student_id, challenge_id, NOT_ATTEMPTED)
+
+    def add_student_row(self, student_id: str) -> None:
+        """ Add a student to the result table without any result."""
+        self.matrix.add_student(student_id)
+        totals = self.cache.peek(('student_totals',))
+        if totals is not None:
+            totals.append()
+        ranking = self.cache.peek(('ranking',))
+        if ranking is not None:
+            ranking.add_row()
+        self._invalidate_leaders()
+
+    def add_challenge_column(self, challenge_id: str) -> None:
+        """ Add a challenge to the result table without any result."""
+        self.matrix.add_challenge(challenge_id)
+        totals = self.cache.peek(('challenge_totals',))
+        if totals is not None:
+            totals.append()
+        ranking = self.cache.peek(('ranking',))
+        if ranking is not None:
+            ranking.add_column()
+        self.cache.invalidate('scores') # The weighted scores need the weight of the new challenge
+        self._invalidate_leaders()
 
         
 if __name__ == "__main__":
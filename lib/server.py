@@ -0,0 +1,310 @@
+"""
+Local HTTP dashboard of a competition.
+
+The competition is read once and its reports are served as HTML and JSON:
+
+    /                   The dashboard page with the links to the reports
+    /results            /results.json       The result table
+    /challenges         /challenges.json    The challenge report (needs the challenge file)
+    /students           /students.json      The student report (needs the challenge and student files)
+    /report.txt         The plain text report, as written by my_competition.py
+
+Each view is rendered once and kept with its ETag until the input files change, so any number of viewers
+can reload the dashboard without computing the Result aggregates again. A client sending the ETag back in
+If-None-Match, weak or not, or sending * gets a 304 Not Modified without a body. A view that cannot be
+rendered is answered with a 500 and the error.
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from .competition import Competition
+from .ranking import ScoringRule
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+CHECK_INTERVAL = 1.0 # Seconds between two checks of the input files
+
+VIEWS = {
+    '/': ('index', 'html'),
+    '/index.html': ('index', 'html'),
+    '/results': ('results', 'html'),
+    '/results.json': ('results', 'json'),
+    '/challenges': ('challenges', 'html'),
+    '/challenges.json': ('challenges', 'json'),
+    '/students': ('students', 'html'),
+    '/students.json': ('students', 'json'),
+    '/report.txt': ('report', 'text'),
+}
+CONTENT_TYPES = {'html': 'text/html; charset=utf-8', 'json': 'application/json', 'text': 'text/plain; charset=utf-8'}
+ETAG_PATTERN = re.compile(r'(?:W/)?"[^"]*"|\*') # An entity tag of an If-None-Match list, or *
+FILES_NEEDED = {'index': 1, 'results': 1, 'report': 1, 'challenges': 2, 'students': 3} # The number of input files each report needs
+
+
+class RenderedView():
+    """
+    A rendered view kept by the dashboard.
+
+    Attributes:
+        body (bytes): The encoded content of the view.
+        content_type (str): The HTTP content type of the view.
+        etag (str): The quoted hash of the body, sent as the ETag header.
+    """
+    __slots__ = ('body', 'content_type', 'etag')
+
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class DashboardState():
+    """
+    The competition served by the dashboard and its rendered views.
+
+    Attributes:
+        files (list): The result file, then optionally the challenge and student files.
+        competition (Competition): The competition read from the files.
+        scoring_rule (ScoringRule): The placement points of the competition. The default rule if None.
+        version (int): The number of times the files were read.
+    """
+    def __init__(self, files: list, snapshot_dir: str = None, compact = False, check_interval = CHECK_INTERVAL, scoring_rule: ScoringRule = None):
+        self.files = list(files)
+        self.snapshot_dir = snapshot_dir
+        self.compact = compact
+        self.check_interval = check_interval
+        self.scoring_rule = scoring_rule
+        self.competition = None
+        self.version = 0
+        self.__lock = threading.Lock() # Result is not thread safe, the views are rendered one at a time
+        self.__check_lock = threading.Lock() # Only one request checks the input files at a time
+        self.__views = {} # The rendered views {(name, format): RenderedView}
+        self.__stats = None # The (size, mtime) of the input files when they were read
+        self.__failed_stats = None # The (size, mtime) of the input files that could not be read, not retried until they change
+        self.__last_check = 0.0
+        self.reload()
+
+    def __file_stats(self) -> list:
+        """ Returns the (size, mtime) of each input file."""
+        stats = []
+        for file in self.files:
+            stat = os.stat(file)
+            stats.append((stat.st_size, stat.st_mtime_ns))
+        return stats
+
+    def reload(self) -> None:
+        """
+        Read the input files again and drop the rendered views.
+
+        Raises:
+        - ValueError: If a file is invalid.
+        - FileNotFoundError: If a file does not exist.
+        """
+        stats = self.__file_stats()
+        competition = Competition(self.compact, scoring_rule=self.scoring_rule)
+        competition.read_files(self.files, self.snapshot_dir) # Read outside the lock, the old views are served meanwhile
+        with self.__lock:
+            self.competition = competition
+            self.__stats = stats
+            self.__views = {}
+            self.version += 1
+
+    def refresh(self) -> None:
+        """ Reload the competition if an input file changed. The files are checked at most once per check interval."""
+        if time.monotonic() - self.__last_check < self.check_interval or not self.__check_lock.acquire(blocking=False):
+            return
+        stats = None
+        try:
+            self.__last_check = time.monotonic()
+            stats = self.__file_stats()
+            if stats != self.__stats and stats != self.__failed_stats:
+                self.reload()
+        except (ValueError, OSError) as e: # A file that is being written is read again when it changes
+            self.__failed_stats = stats
+            print(f'The competition files could not be read again, serving the previous version: {e}', file=sys.stderr)
+        finally:
+            self.__check_lock.release()
+
+    def view(self, name: str, view_format: str) -> RenderedView:
+        """ Returns the rendered view, rendering it on the first request after the files were read. None if the view is not available."""
+        if len(self.files) < FILES_NEEDED[name]:
+            return None
+        key = (name, view_format)
+        rendered = self.__views.get(key)
+        if rendered is None:
+            with self.__lock:
+                rendered = self.__views.get(key) # Another request may have rendered it while waiting for the lock
+                if rendered is None:
+                    rendered = RenderedView(render_view(self.competition, name, view_format, self.files), CONTENT_TYPES[view_format])
+                    self.__views[key] = rendered
+        return rendered
+
+
+def report_data(competition: Competition, name: str) -> dict:
+    """ Returns the title, columns, rows and footer lines of a report."""
+    if name == 'results':
+        result = competition.result
+        return {'title': 'Competition dashboard', 'columns': result.header_row(), 'rows': list(result.iter_student_rows()),
+                'footer': competition.results_footer()}
+    if name == 'challenges':
+        return {'title': 'Challenge information', 'columns': competition.CHALLENGE_HEADER, 'rows': competition.challenge_rows(),
+                'footer': competition.challenges_footer()}
+    if name == 'students':
+        return {'title': 'Student information', 'columns': competition.STUDENT_HEADER, 'rows': competition.student_rows(),
+                'footer': competition.student_footer()}
+    raise ValueError(f"Unknown report {name}")
+
+
+def render_view(competition: Competition, name: str, view_format: str, files: list) -> bytes:
+    """ Returns the encoded content of a view."""
+    if name == 'report':
+        sections = [competition.iter_report_results, competition.iter_report_challenges, competition.iter_report_student][:len(files)]
+        return '\n'.join(line for section in sections for line in section()).encode("utf-8")
+    if name == 'index':
+        return render_index(competition, files).encode("utf-8")
+    data = report_data(competition, name)
+    if view_format == 'json':
+        return json.dumps(data).encode("utf-8")
+    return render_html_page(data['title'], render_html_table(data['columns'], data['rows']), data['footer']).encode("utf-8")
+
+
+def render_html_table(columns: list, rows: list) -> str:
+    """ Returns the HTML table of the columns and the rows."""
+    lines = ['<table>', '<tr>' + ''.join(f'<th>{html.escape(str(column))}</th>' for column in columns) + '</tr>']
+    for row in rows:
+        lines.append('<tr>' + ''.join(f'<td>{html.escape(str(cell))}</td>' for cell in row) + '</tr>')
+    lines.append('</table>')
+    return '\n'.join(lines)
+
+
+def render_html_page(title: str, content: str, footer: list) -> str:
+    """ Returns a full HTML page with the navigation links, the content and the footer lines."""
+    links = ' | '.join(f'<a href="{path}">{label}</a>' for path, label in
+                       [('/', 'Dashboard'), ('/results', 'Results'), ('/challenges', 'Challenges'), ('/students', 'Students'), ('/report.txt', 'Text report')])
+    paragraphs = '\n'.join(f'<p>{html.escape(line)}</p>' for line in footer)
+    return f'''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #999; padding: 0.3em 0.8em; text-align: center; }}
+th {{ background: #eee; }}
+</style>
+</head>
+<body>
+<nav>{links}</nav>
+<h1>{html.escape(title)}</h1>
+{content}
+{paragraphs}
+</body>
+</html>
+'''
+
+
+def render_index(competition: Competition, files: list) -> str:
+    """ Returns the dashboard page with the available reports and the leaders."""
+    result = competition.result
+    items = [f'<li><a href="/results">Results</a> (<a href="/results.json">JSON</a>): {result.return_no_students()} students and {result.return_no_challenges()} challenges</li>']
+    if len(files) >= FILES_NEEDED['challenges']:
+        items.append('<li><a href="/challenges">Challenges</a> (<a href="/challenges.json">JSON</a>)</li>')
+    if len(files) >= FILES_NEEDED['students']:
+        items.append('<li><a href="/students">Students</a> (<a href="/students.json">JSON</a>)</li>')
+    content = '<ul>\n' + '\n'.join(items) + '\n</ul>'
+    return render_html_page('Competition', content, competition.results_footer())
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Returns True if an If-None-Match header matches the ETag of a view. The comparison is weak as If-None-Match requires,
+    so W/"tag" matches "tag", and * matches any view.
+    """
+    for tag in ETAG_PATTERN.findall(if_none_match or ''):
+        if tag == '*' or (tag[2:] if tag.startswith('W/') else tag) == etag:
+            return True
+    return False
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    """ Serve the views of the DashboardState of the server."""
+    server_version = 'CompetitionDashboard/1.0'
+
+    def do_GET(self):
+        self.__respond(send_body=True)
+
+    def do_HEAD(self):
+        self.__respond(send_body=False)
+
+    def __respond(self, send_body: bool) -> None:
+        path = self.path.split('?', 1)[0]
+        if path not in VIEWS:
+            self.send_error(404, 'Unknown report')
+            return
+        state = self.server.state
+        try:
+            state.refresh()
+            rendered = state.view(*VIEWS[path])
+        except Exception as e: # The error is sent to the client instead of dropping the connection
+            self.log_error('Could not render %s: %r', path, e)
+            self.__send_text(500, f'The report could not be rendered: {e.__class__.__name__}: {e}\n', send_body)
+            return
+        if rendered is None:
+            self.send_error(404, 'The input files of this report were not given')
+            return
+        if etag_matches(self.headers.get('If-None-Match'), rendered.etag):
+            self.send_response(304) # The client already has this version
+            self.send_header('ETag', rendered.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', rendered.content_type)
+        self.send_header('Content-Length', str(len(rendered.body)))
+        self.send_header('ETag', rendered.etag)
+        self.send_header('Cache-Control', 'no-cache') # Clients revalidate with the ETag so a change of the files is seen at once
+        self.end_headers()
+        if send_body:
+            self.wfile.write(rendered.body)
+
+    def __send_text(self, code: int, text: str, send_body: bool) -> None:
+        """ Send a plain text response that is not cached."""
+        body = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header('Content-Type', CONTENT_TYPES['text'])
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def create_server(state: DashboardState, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, quiet = False) -> ThreadingHTTPServer:
+    """ Returns the HTTP server of the dashboard, each request is handled in its own thread."""
+    server = ThreadingHTTPServer((host, port), DashboardHandler)
+    server.daemon_threads = True
+    server.state = state
+    server.quiet = quiet
+    return server
+
+
+def serve(files: list, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, snapshot_dir: str = None, compact = False, scoring_rule: ScoringRule = None) -> None:
+    """ Read the competition and serve its dashboard until the program is interrupted."""
+    server = create_server(DashboardState(files, snapshot_dir, compact, scoring_rule=scoring_rule), host, port)
+    print(f'Serving the competition dashboard on http://{host}:{server.server_address[1]}/ (Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
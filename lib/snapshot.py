@@ -0,0 +1,175 @@
+"""
+On-disk snapshot of a parsed competition.
+
+The snapshot is a compact binary file that can be memory-mapped:
+
+    magic (8 bytes) | metadata length (uint64) | metadata (JSON) | padding to 8 bytes |
+    times (float64, one block per challenge column) | status (int8, one block per challenge column)
+
+The numbers are stored in the native byte order of the machine that saved the snapshot.
+
+The metadata holds the fingerprint (size, mtime and content hash) of every input file, the IDs of the
+result table and the challenge and student records. A snapshot is only used while the fingerprints of
+its input files are unchanged.
+"""
+
+import os
+import json
+import mmap
+import struct
+import hashlib
+from .matrix import ResultMatrix
+from .student import StudentManager
+from .challenge import ChallengeManager
+
+MAGIC = b'MYCOMPS1'
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct('<8sQ') # Magic and metadata length
+
+
+def data_offset(metadata_length: int) -> int:
+    """ Returns the offset of the time blocks, aligned to 8 bytes after the metadata."""
+    end = HEADER.size + metadata_length
+    return end + (-end % 8)
+
+
+def file_content_hash(file_name: str) -> str:
+    """ Returns the sha256 hash of the content of a file."""
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_name: str, content_hash: str = None) -> dict:
+    """
+    Returns the fingerprint of a file: {'size': bytes, 'mtime': nanoseconds, 'hash': sha256}
+
+    Input:
+    - file_name (str): The path to the file.
+    - content_hash (str): The hash of the file if it is already known. Computed if None.
+    """
+    stat = os.stat(file_name)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': content_hash or file_content_hash(file_name)}
+
+
+class SnapshotCache():
+    """
+    Directory of competition snapshots, one per combination of input files.
+
+    Attributes:
+        directory (str): The directory where the snapshots are saved.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.directory})'
+
+    def snapshot_path(self, files: list) -> str:
+        """ Returns the path of the snapshot for the given input files."""
+        key = hashlib.sha256('\n'.join(os.path.abspath(file) for file in files).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f'competition-{key}.snap')
+
+    @staticmethod
+    def __is_fresh(file_name: str, fingerprint: dict) -> bool:
+        """
+        Check that a file still matches its fingerprint. The size and mtime are checked first. The content
+        is only hashed when the mtime changed but the size did not, so touching a file does not invalidate the snapshot.
+        """
+        try:
+            stat = os.stat(file_name)
+        except FileNotFoundError:
+            return False
+        if stat.st_size != fingerprint['size']:
+            return False
+        if stat.st_mtime_ns == fingerprint['mtime']:
+            return True
+        return file_content_hash(file_name) == fingerprint['hash']
+
+    def load(self, competition, files: list) -> bool:
+        """
+        Load the snapshot of the input files into the competition.
+
+        Input:
+        - competition (Competition): The competition to fill.
+        - files (list): The result file, then optionally the challenge and student files.
+
+        Returns:
+        - bool: True if a fresh snapshot was loaded, False if the files must be parsed.
+        """
+        path = self.snapshot_path(files)
+        try:
+            with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+                magic, metadata_length = HEADER.unpack_from(snapshot, 0)
+                if magic != MAGIC:
+                    return False
+                metadata = json.loads(snapshot[HEADER.size:HEADER.size + metadata_length].decode("utf-8"))
+                if metadata['version'] != SNAPSHOT_VERSION or metadata['files'] != [os.path.abspath(file) for file in files]:
+                    return False
+                if not all(self.__is_fresh(file, fingerprint) for file, fingerprint in zip(files, metadata['fingerprints'])):
+                    return False
+                matrix = self.__read_matrix(snapshot, metadata, data_offset(metadata_length))
+        except (OSError, ValueError, KeyError, struct.error):
+            return False # A missing or damaged snapshot is rebuilt from the input files
+        competition.result.matrix = matrix
+        if metadata['challenges'] is not None:
+            competition.challenge_manager = ChallengeManager(competition.challenge_manager.compact)
+            for challenge_id, challenge_type, name, weight in metadata['challenges']:
+                competition.challenge_manager.add_challenge(challenge_id, challenge_type, name, weight)
+        if metadata['students'] is not None:
+            competition.student_manager = StudentManager(competition.student_manager.compact)
+            for student_id, name, student_type in metadata['students']:
+                competition.student_manager.add_student_record(student_id, name, student_type)
+        return True
+
+    @staticmethod
+    def __read_matrix(snapshot, metadata: dict, times_offset: int) -> ResultMatrix:
+        """ Copy the time and status blocks of the memory-mapped snapshot into a result matrix."""
+        matrix = ResultMatrix(metadata['challenge_ids'], metadata['label'])
+        no_students = len(metadata['student_ids'])
+        status_offset = times_offset + 8 * no_students * matrix.n_challenges
+        if status_offset + no_students * matrix.n_challenges > len(snapshot):
+            raise ValueError("Snapshot is truncated")
+        for column in range(matrix.n_challenges):
+            start = times_offset + 8 * no_students * column
+            matrix.times[column].frombytes(snapshot[start:start + 8 * no_students])
+            start = status_offset + no_students * column
+            matrix.status[column].frombytes(snapshot[start:start + no_students])
+        matrix.student_ids = metadata['student_ids']
+        matrix.student_index = {student_id: row for row, student_id in enumerate(matrix.student_ids)}
+        return matrix
+
+    def save(self, competition, files: list) -> None:
+        """
+        Save the parsed competition as the snapshot of the input files.
+
+        Input:
+        - competition (Competition): The competition read from the files.
+        - files (list): The result file, then optionally the challenge and student files.
+        """
+        matrix = competition.result.matrix
+        metadata = {
+            'version': SNAPSHOT_VERSION,
+            'files': [os.path.abspath(file) for file in files],
+            'fingerprints': [file_fingerprint(file) for file in files],
+            'label': matrix.label,
+            'challenge_ids': matrix.challenge_ids,
+            'student_ids': matrix.student_ids,
+            'challenges': [[ch.id, ch.type, ch.name, ch.weight] for ch in competition.challenge_manager.challenges] if len(files) > 1 else None,
+            'students': [[st.id, st.name, st.type] for st in competition.student_manager.students] if len(files) > 2 else None,
+        }
+        encoded = json.dumps(metadata).encode("utf-8")
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.snapshot_path(files)
+        temporary_path = path + '.tmp'
+        with open(temporary_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(encoded)))
+            file.write(encoded)
+            file.write(b'\0' * (data_offset(len(encoded)) - HEADER.size - len(encoded)))
+            for times in matrix.times:
+                file.write(times.tobytes())
+            for status in matrix.status:
+                file.write(status.tobytes())
+        os.replace(temporary_path, path) # Replace the old snapshot only once the new one is complete
@@ -0,0 +1,658 @@
+"""
+SQLite storage of a competition for large competitions.
+
+The three input files are loaded into a local SQLite database and the aggregates of the reports are
+computed by SQL queries instead of in Python:
+
+- The Nfinish, Nongoing and the time totals of the averages are window queries over covering indexes.
+- The ranks of each challenge are a ROW_NUMBER() window ordered by time, then by row like RankingEngine, or a RANK()
+  window ordered by time when equal times share their rank.
+- The scores and the weighted scores are sums of the placement points of the ranks, given by the scoring rule.
+
+Only the finished and ongoing results are stored, one row each. Every input file is fingerprinted with
+its size, modification time and content hash, so a file that did not change since the last run is not
+read again and only the changed files are reloaded. A result file that was only appended to, its content
+up to the previous end unchanged, only has its new rows inserted. Any other change of the result file, and
+any change of the challenge or student file, loads the whole file again.
+
+A result changed in place with set_result is kept in the database until the result file changes: a file that
+was only appended to keeps it, a file loaded again as a whole replaces it.
+
+    competition = SqliteCompetition('competition.db')
+    competition.read_files(['results.txt', 'challenges.txt', 'students.txt'])
+    competition.report_all()
+"""
+
+import os
+import sqlite3
+import hashlib
+import itertools
+from .competition import Competition
+from .student import StudentManager
+from .challenge import ChallengeManager
+from .result import Result
+from .matrix import ResultMatrix, FINISHED, ONGOING, NOT_ATTEMPTED, NO_TIME
+from .reader import ResultFileReader, parse_result_line, DEFAULT_BATCH_SIZE
+from .totals import RunningTotals
+from .cache import AggregateCache
+from .snapshot import file_fingerprint, file_content_hash
+from .ranking import ScoringRule, ROW_ORDER
+from .leaderboard import check_top_arguments
+from .eligibility import SPECIAL_THRESHOLDS, failure_reasons
+from .profiling import span, counted
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS input_files (kind TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime_ns INTEGER, hash TEXT);
+CREATE TABLE IF NOT EXISTS input_lines (kind TEXT PRIMARY KEY, lines INTEGER);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS result_challenges (position INTEGER PRIMARY KEY, challenge_id TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS result_students (position INTEGER PRIMARY KEY, student_id TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS results (
+    challenge_position INTEGER NOT NULL,
+    student_position INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    time REAL,
+    PRIMARY KEY (challenge_position, student_position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_student ON results (student_position, challenge_position, status, time);
+CREATE INDEX IF NOT EXISTS results_rank ON results (status, challenge_position, time, student_position);
+CREATE TABLE IF NOT EXISTS challenges (position INTEGER PRIMARY KEY, challenge_id TEXT NOT NULL UNIQUE, type TEXT, name TEXT, weight REAL);
+CREATE TABLE IF NOT EXISTS students (position INTEGER PRIMARY KEY, student_id TEXT NOT NULL UNIQUE, name TEXT, type TEXT);
+'''
+
+# The temporary tables of a connection: the challenge weights and types given to a query
+TEMP_SCHEMA = '''
+CREATE TEMP TABLE IF NOT EXISTS weights (position INTEGER PRIMARY KEY, weight);
+CREATE TEMP TABLE IF NOT EXISTS column_types (position INTEGER PRIMARY KEY, type TEXT);
+'''
+
+def points_query(rule: ScoringRule) -> str:
+    """
+    Returns the query of the placement points of every finished result, the same as the points of the ranking engine.
+    The finished results are read from the results_rank index already sorted by challenge, time and row. The last place
+    is the row without a next one, or every row with the time of the last row when the equal times share their rank.
+    """
+    ranking = 'ROW_NUMBER() OVER ranked' if rule.ties == ROW_ORDER else 'RANK() OVER (PARTITION BY challenge_position ORDER BY time)'
+    last = 'LEAD(1) OVER ranked IS NULL' if rule.ties == ROW_ORDER else 'time = MAX(time) OVER (PARTITION BY challenge_position)'
+    literal = (lambda value: repr(float(value))) if rule.typecode == 'd' else repr # Float points are summed as floats, like the engine
+    cases = [f'WHEN rank = {rank} THEN {literal(points)}' for rank, points in enumerate(rule.points, start=1)]
+    if rule.last_place is not None:
+        condition = 'last' if rule.last_place_in_table else f'last AND rank > {len(rule.points)}'
+        cases.insert(0, f'WHEN {condition} THEN {literal(rule.last_place)}')
+    return f'''
+CREATE TEMP TABLE points AS
+SELECT student_position, challenge_position, CASE {' '.join(cases)} ELSE {literal(rule.other_points)} END AS points
+FROM (SELECT student_position, challenge_position, {ranking} AS rank, {last} AS last
+      FROM results WHERE status = {FINISHED} WINDOW ranked AS (PARTITION BY challenge_position ORDER BY time, student_position))
+'''
+
+FILE_KINDS = ('results', 'challenges', 'students') # The kind of each input file, in the order of the command line
+
+
+def hash_prefix(file, size: int, digest) -> int:
+    """
+    Read the first size bytes of an open binary file into the hash digest.
+
+    Returns:
+    - int: The number of line breaks in the bytes read.
+    """
+    lines = 0
+    while size > 0:
+        block = file.read(min(size, 1 << 20))
+        if not block:
+            break
+        digest.update(block)
+        lines += block.count(b'\n')
+        size -= len(block)
+    return lines
+
+
+def _cell_text(status: int, time: float) -> str:
+    """ Returns the display text of a stored result, the same as ResultMatrix.cell_text."""
+    return str(time) if status == FINISHED else '--'
+
+
+class SqliteStore():
+    """
+    The SQLite database of a competition and the fingerprints of the input files loaded into it.
+
+    Attributes:
+        database (str): The path to the database file, ':memory:' for a database in memory.
+        connection (sqlite3.Connection): The connection to the database.
+    """
+    def __init__(self, database: str):
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.executescript(SCHEMA + TEMP_SCHEMA)
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.database})'
+
+    def close(self) -> None:
+        """ Close the connection to the database."""
+        self.connection.close()
+
+    def is_current(self, kind: str, file_name: str) -> bool:
+        """
+        Returns True if the file was loaded and did not change since. The content hash is only computed
+        when the size is the same but the modification time changed.
+        """
+        record = self.connection.execute('SELECT size, mtime_ns, hash FROM input_files WHERE kind = ?', (kind,)).fetchone()
+        if record is None:
+            return False
+        size, mtime_ns, content_hash = record
+        stat = os.stat(file_name)
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime_ns == mtime_ns:
+            return True
+        if file_content_hash(file_name) != content_hash:
+            return False
+        with self.connection: # The file was touched without changing, the new time avoids hashing it again
+            self.connection.execute('UPDATE input_files SET mtime_ns = ? WHERE kind = ?', (stat.st_mtime_ns, kind))
+        return True
+
+    def mark_changed(self, kind: str) -> None:
+        """ Forget the fingerprint of an input file, so it is loaded again on the next sync. Called when the data is changed in place."""
+        with self.connection:
+            self.connection.execute('DELETE FROM input_files WHERE kind = ?', (kind,))
+
+    def __record_file(self, kind: str, file_name: str, fingerprint: dict, lines: int = None) -> None:
+        """ Save the fingerprint of a loaded file, and its number of lines if rows appended to it can be loaded alone."""
+        self.connection.execute('INSERT OR REPLACE INTO input_files VALUES (?, ?, ?, ?, ?)',
+                                (kind, file_name, fingerprint['size'], fingerprint['mtime'], fingerprint['hash']))
+        self.connection.execute('INSERT OR REPLACE INTO input_lines VALUES (?, ?)', (kind, lines))
+
+    def load_results(self, file_name: str, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        Load the result file in one transaction, replacing the results in the database.
+        The rows are inserted batch by batch, so only one batch of the file is held in memory.
+        If the file was only appended to since it was loaded, only the new rows are inserted.
+
+        Raises:
+        - ValueError: If the file is invalid. The database is not changed.
+        """
+        if self.__append_results(file_name, batch_size):
+            return
+        stat = os.stat(file_name) # Taken before reading, a change while reading is seen on the next sync
+        digest = hashlib.sha256()
+        with open(file_name, "rb") as file:
+            lines = hash_prefix(file, stat.st_size, digest)
+            file.seek(stat.st_size - 1 if stat.st_size else 0)
+            complete = file.read(1) in (b'\n', b'') # The rows appended later start on a new line
+        fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+        reader = ResultFileReader(file_name, batch_size)
+        connection = self.connection
+        with connection:
+            for table in ('results', 'result_students', 'result_challenges'):
+                connection.execute(f'DELETE FROM {table}')
+            student_ids = set()
+            position = 0
+            batches = reader.batches()
+            first_batch = next(batches, [])
+            ResultMatrix(reader.challenge_ids, reader.label) # Check the header like the in memory result table
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('label', ?)", (reader.label,))
+            connection.executemany('INSERT INTO result_challenges VALUES (?, ?)', enumerate(reader.challenge_ids))
+            for batch in itertools.chain([first_batch], batches):
+                for student_id, _ in batch:
+                    if student_id in student_ids:
+                        raise ValueError(f"Duplicate student ID {student_id} in result record")
+                    student_ids.add(student_id)
+                position = self.__insert_rows(batch, position)
+            new_stat = os.stat(file_name)
+            # The new rows can only be appended later if the file did not change while it was read
+            self.__record_file('results', file_name, fingerprint, lines if complete and (new_stat.st_size, new_stat.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns) else None)
+
+    def __insert_rows(self, batch: list, position: int) -> int:
+        """ Insert a batch of parsed student rows from the given row position. Returns the position after the batch."""
+        self.connection.executemany('INSERT INTO result_students VALUES (?, ?)',
+                                    ((position + offset, student_id) for offset, (student_id, _) in enumerate(batch)))
+        self.connection.executemany('INSERT INTO results VALUES (?, ?, ?, ?)',
+                                    ((column, position + offset, status, time if status == FINISHED else None)
+                                     for offset, (_, cells) in enumerate(batch)
+                                     for column, (status, time) in enumerate(cells) if status != NOT_ATTEMPTED))
+        return position + len(batch)
+
+    def __append_results(self, file_name: str, batch_size: int) -> bool:
+        """
+        Insert the rows added at the end of the result file since it was loaded. The file is hashed up to its previous
+        end, and the new lines are hashed while they are read so the new fingerprint costs no second read.
+
+        Returns:
+        - bool: False if the file was not only appended to, nothing is loaded then.
+
+        Raises:
+        - ValueError: If a new line is invalid or repeats a student ID. The database is not changed.
+        """
+        connection = self.connection
+        record = connection.execute("SELECT f.path, f.size, f.hash, l.lines FROM input_files AS f JOIN input_lines AS l USING (kind) "
+                                    "WHERE kind = 'results' AND l.lines IS NOT NULL").fetchone()
+        if record is None or record[0] != file_name:
+            return False
+        _, size, content_hash, line_no = record
+        stat = os.stat(file_name)
+        if stat.st_size <= size:
+            return False
+        digest = hashlib.sha256()
+        with open(file_name, "rb") as file:
+            if hash_prefix(file, size, digest) != line_no or digest.hexdigest() != content_hash:
+                return False
+            width = connection.execute('SELECT COUNT(*) FROM result_challenges').fetchone()[0] + 1
+            position = connection.execute('SELECT COUNT(*) FROM result_students').fetchone()[0]
+            complete = True
+            with connection:
+                batch = []
+                for raw_line in file:
+                    digest.update(raw_line)
+                    size += len(raw_line)
+                    line_no += 1
+                    complete = raw_line.endswith(b'\n')
+                    line = raw_line.decode("utf-8")
+                    if line.strip(): # Skip blank lines like the reader
+                        batch.append(parse_result_line(line, line_no, width))
+                    if len(batch) >= batch_size:
+                        position = self.__insert_new_rows(batch, position)
+                        batch = []
+                position = self.__insert_new_rows(batch, position)
+                fingerprint = {'size': size, 'mtime': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+                self.__record_file('results', file_name, fingerprint, line_no if complete else None)
+        return True
+
+    def __insert_new_rows(self, batch: list, position: int) -> int:
+        """ Insert a batch of appended rows after checking their student IDs against the ones already loaded."""
+        seen = set()
+        for student_id, _ in batch:
+            if student_id in seen or self.connection.execute('SELECT 1 FROM result_students WHERE student_id = ?', (student_id,)).fetchone():
+                raise ValueError(f"Duplicate student ID {student_id} in result record")
+            seen.add(student_id)
+        return self.__insert_rows(batch, position)
+
+    def load_challenges(self, file_name: str, compact = False) -> ChallengeManager:
+        """
+        Read the challenge file and save the challenges in the database.
+
+        Returns:
+        - ChallengeManager: The challenges read from the file.
+        """
+        fingerprint = file_fingerprint(file_name)
+        manager = ChallengeManager(compact)
+        manager.read_challenge_file(file_name)
+        with self.connection:
+            self.connection.execute('DELETE FROM challenges')
+            self.connection.executemany('INSERT INTO challenges VALUES (?, ?, ?, ?, ?)',
+                                        ((position, challenge.id, challenge.type, challenge.name, challenge.weight)
+                                         for position, challenge in enumerate(manager.challenges)))
+            self.__record_file('challenges', file_name, fingerprint)
+        return manager
+
+    def load_students(self, file_name: str, compact = False) -> StudentManager:
+        """
+        Read the student file and save the students in the database.
+
+        Returns:
+        - StudentManager: The students read from the file.
+        """
+        fingerprint = file_fingerprint(file_name)
+        manager = StudentManager(compact)
+        manager.read_student_file(file_name)
+        with self.connection:
+            self.connection.execute('DELETE FROM students')
+            self.connection.executemany('INSERT INTO students VALUES (?, ?, ?, ?)',
+                                        ((position, student.id, student.name, student.type)
+                                         for position, student in enumerate(manager.students)))
+            self.__record_file('students', file_name, fingerprint)
+        return manager
+
+    def challenge_manager(self, compact = False) -> ChallengeManager:
+        """ Returns the challenges saved in the database."""
+        manager = ChallengeManager(compact)
+        for challenge_id, challenge_type, name, weight in self.connection.execute('SELECT challenge_id, type, name, weight FROM challenges ORDER BY position'):
+            manager.add_challenge(challenge_id, challenge_type, name, weight)
+        return manager
+
+    def student_manager(self, compact = False) -> StudentManager:
+        """ Returns the students saved in the database."""
+        manager = StudentManager(compact)
+        for student_id, name, student_type in self.connection.execute('SELECT student_id, name, type FROM students ORDER BY position'):
+            manager.add_student_record(student_id, name, student_type)
+        return manager
+
+
+class SqliteResult(Result):
+    """
+    The result table of a SqliteStore. It has the same methods as Result, the aggregates of the reports are
+    computed by SQL queries and cached until the results change.
+
+    The in memory result matrix is only built from the database for the methods that need it, such as the queries.
+    A change of a result is written to the database at once and kept until the result file changes.
+    """
+    def __init__(self, store: SqliteStore):
+        # Result.__init__ is not called, the results are kept in the database instead of a new matrix
+        self.cache = AggregateCache()
+        self.store = store
+
+    @property
+    def matrix(self) -> ResultMatrix:
+        """ Returns the result matrix, read from the database on the first use."""
+        return self.cache.get(('matrix',), self.__load_matrix)
+
+    @matrix.setter
+    def matrix(self, new_matrix: ResultMatrix):
+        raise ValueError("The results of the SQLite backend are changed with set_result or read from a result file")
+
+    def __load_matrix(self) -> ResultMatrix:
+        matrix = ResultMatrix(self.challenge_ids, self.header_row()[0])
+        matrix.extend_rows(self.__iter_cells())
+        return matrix
+
+    def __iter_cells(self):
+        """ Yield the (student_id, [(status, time), ...]) of every student in row order."""
+        no_challenges = len(self.challenge_ids)
+        cells = self.store.connection.execute('SELECT student_position, challenge_position, status, time '
+                                              'FROM results INDEXED BY results_by_student ORDER BY student_position, challenge_position')
+        pending = next(cells, None)
+        for position, student_id in enumerate(self.student_ids):
+            row = [(NOT_ATTEMPTED, NO_TIME)] * no_challenges
+            while pending is not None and pending[0] == position:
+                row[pending[1]] = (pending[2], pending[3] if pending[2] == FINISHED else NO_TIME)
+                pending = next(cells, None)
+            yield student_id, row
+
+    def read_results_file(self, file_name, batch_size = DEFAULT_BATCH_SIZE):
+        """ Load the result file into the database."""
+        self.store.load_results(file_name, batch_size)
+        self.invalidate_cache()
+
+    @property
+    def student_ids(self) -> list:
+        """ Returns the student ID of each row of the result table."""
+        return self.cache.get(('student_ids',), lambda: [student_id for (student_id,) in
+                                                          self.store.connection.execute('SELECT student_id FROM result_students ORDER BY position')])
+
+    @property
+    def challenge_ids(self) -> list:
+        """ Returns the challenge ID of each column of the result table."""
+        return self.cache.get(('challenge_ids',), lambda: [challenge_id for (challenge_id,) in
+                                                            self.store.connection.execute('SELECT challenge_id FROM result_challenges ORDER BY position')])
+
+    def _student_row(self, student_id: str):
+        """ Return the row index of the student or None if not found"""
+        return self.cache.get(('student_index',), lambda: {student_id: row for row, student_id in enumerate(self.student_ids)}).get(student_id)
+
+    def _challenge_column(self, challenge_id: str):
+        """ Return the column index of the challenge or None if not found"""
+        return self.cache.get(('challenge_index',), lambda: {challenge_id: column for column, challenge_id in enumerate(self.challenge_ids)}).get(challenge_id)
+
+    def return_no_students(self):
+        """ Return the number of students"""
+        return len(self.student_ids)
+
+    def return_no_challenges(self):
+        """ Return the number of challenges"""
+        return len(self.challenge_ids)
+
+    def header_row(self) -> list:
+        """ Return the header row of the result table: the label and the challenge IDs"""
+        label = self.store.connection.execute("SELECT value FROM meta WHERE key = 'label'").fetchone()
+        return [label[0] if label else 'Results'] + self.challenge_ids
+
+    def iter_student_rows(self):
+        """ Yield the display row of every student one by one, streamed from the database in row order"""
+        for student_id, cells in self.__iter_cells():
+            yield [student_id] + [_cell_text(status, time) if status != NOT_ATTEMPTED else '' for status, time in cells]
+
+    def _compute_challenge_totals(self) -> RunningTotals:
+        """ Sum the finished times and count the finished and ongoing results of every challenge in SQL, in row order."""
+        return self.__totals(len(self.challenge_ids), 'challenge_position', 'student_position')
+
+    def _compute_student_totals(self) -> RunningTotals:
+        """ Sum the finished times and count the finished and ongoing results of every student in SQL, in column order."""
+        return self.__totals(len(self.student_ids), 'student_position', 'challenge_position')
+
+    def __totals(self, size: int, group: str, order: str) -> RunningTotals:
+        """ The totals are running sums over a window ordered like the loops of Result, so the times are added in the
+        same order and the rounded averages are the same. The last row of each partition holds its totals."""
+        totals = RunningTotals(size)
+        query = (f'SELECT {group}, total, nfinish, nongoing FROM ('
+                 f'SELECT {group}, SUM(CASE WHEN status = {FINISHED} THEN time END) OVER running AS total, '
+                 f'COUNT(CASE WHEN status = {FINISHED} THEN 1 END) OVER running AS nfinish, '
+                 f'COUNT(CASE WHEN status = {ONGOING} THEN 1 END) OVER running AS nongoing, LEAD(1) OVER running IS NULL AS last '
+                 f'FROM results WINDOW running AS (PARTITION BY {group} ORDER BY {order} ROWS UNBOUNDED PRECEDING)) WHERE last')
+        for index, total, nfinish, nongoing in self.store.connection.execute(query):
+            totals.totals[index] = total if nfinish else 0.0
+            totals.nfinish[index] = nfinish
+            totals.nongoing[index] = nongoing
+        return totals
+
+    def __compute_points(self) -> bool:
+        """ Rank every challenge and save the placement points of the finished results in the temporary points table,
+        indexed by student after it is filled."""
+        with self.store.connection:
+            self.store.connection.execute('DROP TABLE IF EXISTS temp.points')
+            self.store.connection.execute(points_query(self.scoring_rule))
+            self.store.connection.execute('CREATE INDEX temp.points_by_student ON points (student_position, challenge_position, points)')
+        return True
+
+    @counted
+    def student_scores(self, challenge_weights: dict = None) -> list:
+        """
+        Return the score of every student, in the order of the result table. The points are summed in SQL.
+
+        Input:
+        - challenge_weights (dict): A dictionary of the challenge id and their weight {challenge_id: weight}
+        """
+        return self.cache.get(('scores', self._weights_key(challenge_weights)), lambda: self.__compute_scores(challenge_weights))
+
+    def __compute_scores(self, challenge_weights: dict = None) -> list:
+        self.cache.get(('points',), self.__compute_points)
+        connection = self.store.connection
+        if challenge_weights is None:
+            query = 'SELECT student_position, SUM(points) FROM temp.points INDEXED BY points_by_student GROUP BY student_position'
+        else:
+            weights = [challenge_weights[challenge_id] for challenge_id in self.challenge_ids] # KeyError for a challenge without weight, like Result
+            with connection:
+                connection.execute('DELETE FROM temp.weights')
+                connection.executemany('INSERT INTO temp.weights VALUES (?, ?)', enumerate(weights))
+            # The points of a student are read in column order, so the weighted points are added in the same order as Result
+            query = ('SELECT p.student_position, SUM(p.points * (SELECT w.weight FROM temp.weights AS w WHERE w.position = p.challenge_position)) '
+                     'FROM temp.points AS p INDEXED BY points_by_student GROUP BY p.student_position')
+        scores = [0] * len(self.student_ids)
+        for row, score in connection.execute(query):
+            scores[row] = score
+        return scores
+
+    @counted
+    def return_challenge_rank(self, challenge_id: str) -> list:
+        """ Return the IDs of the students that finished the challenge, sorted by their rank"""
+        return [student_id for student_id, _ in self.__challenge_order(challenge_id)]
+
+    def top_challenge_students(self, challenge_id: str, k: int) -> list:
+        """ Return the (student_id, time) of the k fastest students of a challenge. Equal times are in the order of the result table."""
+        check_top_arguments(k)
+        return self.__challenge_order(challenge_id, k)
+
+    def __challenge_order(self, challenge_id: str, k: int = -1) -> list:
+        """ Returns the (student_id, time) of the finished students of the challenge in rank order, read from the results_rank index."""
+        column = self._challenge_column(challenge_id)
+        if column is None:
+            raise ValueError(f"Challenge {challenge_id} is not in the result table")
+        student_ids = self.student_ids
+        order = self.store.connection.execute('SELECT student_position, time FROM results INDEXED BY results_rank '
+                                              f'WHERE challenge_position = ? AND status = {FINISHED} ORDER BY time, student_position LIMIT ?', (column, k))
+        return [(student_ids[row], time) for row, time in order]
+
+    @counted
+    def return_student_participation(self, student_id: str) -> dict:
+        """ Return the status of the student in every challenge {challenge_id: status}, None if the student is not in the result table."""
+        row = self._student_row(student_id)
+        if row is None:
+            return None
+        participation = dict.fromkeys(self.challenge_ids, NOT_ATTEMPTED)
+        challenge_ids = self.challenge_ids
+        for column, status in self.store.connection.execute('SELECT challenge_position, status FROM results WHERE student_position = ?', (row,)):
+            participation[challenge_ids[column]] = status
+        return participation
+
+    def __locate(self, student_id: str, challenge_id: str) -> tuple:
+        """ Return the (row, column) of a result or raise a ValueError if the student or the challenge is unknown"""
+        row = self._student_row(student_id)
+        if row is None:
+            raise ValueError(f"Student {student_id} is not in the result table")
+        column = self._challenge_column(challenge_id)
+        if column is None:
+            raise ValueError(f"Challenge {challenge_id} is not in the result table")
+        return row, column
+
+    def __changed(self) -> None:
+        """ The rows or columns differ from the result file now, it is loaded again on the next sync."""
+        self.store.mark_changed('results')
+        self.invalidate_cache()
+
+    @counted
+    def set_result(self, student_id: str, challenge_id: str, status: int, time: float = NO_TIME) -> None:
+        """
+        Change a single result in the database. The cached matrix, totals and ranking are updated like Result.set_result,
+        only the placement points and the scores are computed again. The change is kept until the result file changes.
+
+        Input:
+        - student_id (str): The ID of the student.
+        - challenge_id (str): The ID of the challenge.
+        - status (int): FINISHED, ONGOING or NOT_ATTEMPTED.
+        - time (float): The finish time, only used if the status is FINISHED.
+        """
+        row, column = self.__locate(student_id, challenge_id)
+        connection = self.store.connection
+        old = connection.execute('SELECT status, time FROM results WHERE challenge_position = ? AND student_position = ?', (column, row)).fetchone()
+        old_status, old_time = (old[0], old[1] if old[0] == FINISHED else NO_TIME) if old else (NOT_ATTEMPTED, NO_TIME)
+        new_time = float(time) if status == FINISHED else NO_TIME
+        with connection:
+            if status == NOT_ATTEMPTED:
+                connection.execute('DELETE FROM results WHERE challenge_position = ? AND student_position = ?', (column, row))
+            else:
+                connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (column, row, status, new_time if status == FINISHED else None))
+        matrix = self.cache.peek(('matrix',))
+        if matrix is not None:
+            matrix.set_cell(row, column, status, new_time)
+        for totals, index in ((self.cache.peek(('student_totals',)), row), (self.cache.peek(('challenge_totals',)), column)):
+            if totals is not None:
+                totals.add(index, old_status, old_time, -1)
+                totals.add(index, status, new_time)
+        ranking = self.cache.peek(('ranking',))
+        if ranking is not None:
+            ranking.update_cell(row, column, old_status, old_time)
+        for name in ('points', 'scores'): # The ranks of the column are computed again in SQL
+            self.cache.invalidate(name)
+        self._invalidate_leaders()
+
+    def add_student_row(self, student_id: str) -> None:
+        """ Add a student to the result table without any result."""
+        if self._student_row(student_id) is not None:
+            raise ValueError(f"Duplicate student ID {student_id} in result record")
+        with self.store.connection:
+            self.store.connection.execute('INSERT INTO result_students VALUES (?, ?)', (len(self.student_ids), student_id))
+        self.__changed()
+
+    def add_challenge_column(self, challenge_id: str) -> None:
+        """ Add a challenge to the result table without any result."""
+        if self._challenge_column(challenge_id) is not None:
+            raise ValueError(f"Duplicate challenge ID {challenge_id} in result record")
+        with self.store.connection:
+            self.store.connection.execute('INSERT INTO result_challenges VALUES (?, ?)', (len(self.challenge_ids), challenge_id))
+        self.__changed()
+
+
+class SqliteCompetition(Competition):
+    """
+    A competition stored in a SQLite database. The API and the reports are the same as Competition.
+
+    Attributes:
+        store (SqliteStore): The database of the competition.
+    """
+    def __init__(self, database: str, compact = False):
+        super().__init__(compact)
+        self.store = SqliteStore(database)
+        self.result = SqliteResult(self.store)
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.store.database})'
+
+    def read_files(self, files: list, snapshot_dir: str = None, sections: list = None) -> None:
+        """
+        Load the result file, then optionally the challenge and student files into the database.
+        Only the files that changed since they were last loaded are read again.
+
+        Input:
+        - files (list): The paths to the files in this order.
+        - snapshot_dir (str): Not used, the database already keeps the parsed files.
+        - sections (list): Only load the files these report sections need. Every file is loaded if None.
+
+        Raises:
+        - ValueError: If the number of files is invalid, a section needs a file that is not given or a file is invalid.
+        - FileNotFoundError: If a file does not exist.
+        """
+        files = self.select_files(files, sections)
+        compact = self.student_manager.compact
+        for kind, file in zip(FILE_KINDS, files):
+            current = self.store.is_current(kind, file)
+            with span('read.' + kind, file=file, sqlite=self.store.database, reloaded=not current):
+                if kind == 'results':
+                    if not current:
+                        self.result.read_results_file(file)
+                    self.result.invalidate_cache()
+                elif kind == 'challenges':
+                    self.challenge_manager = self.store.challenge_manager(compact) if current else self.store.load_challenges(file, compact)
+                else:
+                    self.student_manager = self.store.student_manager(compact) if current else self.store.load_students(file, compact)
+        self.invalidate_roster_cache()
+        self.input_files = files
+
+    def add_student(self, student_id: str, name: str, student_type: str) -> None:
+        """ Add a new student to the competition with an empty row of results. The student file is loaded again on the next sync."""
+        super().add_student(student_id, name, student_type)
+        self.store.mark_changed('students')
+
+    def add_challenge(self, challenge_id: str, challenge_type: str, name: str, weight = 1.0) -> None:
+        """ Add a new challenge to the competition with an empty column of results. The challenge file is loaded again on the next sync."""
+        super().add_challenge(challenge_id, challenge_type, name, weight)
+        self.store.mark_changed('challenges')
+
+    def student_eligibility(self, with_reasons = False, thresholds: dict = None) -> dict:
+        """
+        Evaluate the requirements of every student of the result table, counting the finished mandatory and special
+        challenges of every student in one SQL query. See Competition.student_eligibility.
+        """
+        thresholds = dict(SPECIAL_THRESHOLDS if thresholds is None else thresholds)
+        result = self.result
+        challenge_types = self.challenge_manager.all_challenges_type()
+        column_types = [challenge_types.get(challenge_id) for challenge_id in result.challenge_ids]
+        connection = self.store.connection
+        with connection:
+            connection.execute('DELETE FROM temp.column_types')
+            connection.executemany('INSERT INTO temp.column_types VALUES (?, ?)', enumerate(column_types))
+        counts = {row: (mandatory, special) for row, mandatory, special in connection.execute(
+            "SELECT r.student_position, COUNT(CASE WHEN t.type = 'M' THEN 1 END), COUNT(CASE WHEN t.type = 'S' THEN 1 END) FROM results AS r "
+            f"JOIN temp.column_types AS t ON t.position = r.challenge_position WHERE r.status = {FINISHED} GROUP BY r.student_position")}
+        no_mandatory = column_types.count('M')
+        finished_mandatory = {}
+        if with_reasons:
+            for row, column in connection.execute("SELECT r.student_position, r.challenge_position FROM results AS r "
+                                                  f"JOIN temp.column_types AS t ON t.position = r.challenge_position WHERE r.status = {FINISHED} AND t.type = 'M'"):
+                finished_mandatory.setdefault(row, set()).add(column)
+        student_types = self.student_manager.student_types()
+        eligibility = {}
+        for row, student_id in enumerate(result.student_ids):
+            student_type = student_types.get(student_id)
+            if student_type is None:
+                eligibility[student_id] = (None, []) if with_reasons else None
+                continue
+            if student_type not in thresholds:
+                raise ValueError(f"Invalid student type {student_type}")
+            mandatory, special = counts.get(row, (0, 0))
+            eligible = mandatory == no_mandatory and special >= thresholds[student_type]
+            if with_reasons:
+                missing = [challenge_id for column, challenge_id in enumerate(result.challenge_ids)
+                           if column_types[column] == 'M' and column not in finished_mandatory.get(row, ())]
+                eligibility[student_id] = (eligible, [] if eligible else failure_reasons(missing, special, thresholds[student_type]))
+            else:
+                eligibility[student_id] = eligible
+        return eligibility
@@ -2,7 +2,9 @@
 Student class and its subclasses.
 """
 
+from array import array
 from .challenge import Challenge
+from .eligibility import SPECIAL_THRESHOLDS
 
 class Student():
     """
@@ -13,10 +15,13 @@ class Student():
         name (str): The name of the student.
         type (str): The type of the student (default as 'None', 'U' for Undergraduate, 'P' for Postgraduate).
     """
+    __slots__ = ('__id', '__name', '__type', '__index') # No per-instance __dict__, a roster can hold millions of students
+
     def __init__(self, student_id, name):
         self.__id = student_id
         self.__name = name
         self.__type = None
+        self.__index = None # The ID index of the StudentManager holding the student, kept up to date by the id setter
 
     @property
     def id(self):
@@ -29,7 +34,17 @@ class Student():
     def id(self, new_id):
         if not new_id.startswith('S'):
             raise ValueError("Invalid student ID. Must start with 'S'")
-        self.__id = str(new_id)
+        new_id = str(new_id)
+        if self.__index is not None and new_id != self.__id: # The manager finds the student by its new ID
+            if new_id in self.__index:
+                raise ValueError(f"Duplicate student ID {new_id}")
+            del self.__index[self.__id]
+            self.__index[new_id] = self
+        self.__id = new_id
+
+    def _set_index(self, index: dict) -> None:
+        """ Attach the student to the ID index of a StudentManager, or detach it if None."""
+        self.__index = index
 
     @property
     def name(self):
@@ -67,12 +82,9 @@ class Student():
         Returns:
         - bool (True or False): True if the student meets the requirements, False if not
         """
-        if self.type == 'U':
-            min_special_challenge = 1
-        elif self.type == 'P':
-            min_special_challenge = 2
-        else:
+        if self.type not in SPECIAL_THRESHOLDS:
             raise ValueError("Invalid student type")
+        min_special_challenge = SPECIAL_THRESHOLDS[self.type]
         meet_min_special = False
         complete_all_mandatory = True  # Assume all mandatory challenges are completed until proven otherwise
         special_challenge_count = 0
@@ -96,6 +108,8 @@ class Undergraduate(Student):
     """
     A subclass of Student representing an undergraduate student.
     """
+    __slots__ = ()
+
     def __init__(self, student_id, name):
         super().__init__(student_id, name)
         # Modify the type attribute of the object
@@ -106,6 +120,8 @@ class Postgraduate(Student):
     """
     A subclass of Student representing a postgraduate student.
     """
+    __slots__ = ()
+
     def __init__(self, student_id, name):
         super().__init__(student_id, name)
         # Modify the type attribute of the object
@@ -129,32 +145,197 @@ class StudentFactory():
             Student: A new student object of the appropriate type. Can be either Undergraduate or Postgraduate.
 
         """
-        if not student_id.startswith('S'):
-            raise ValueError("Invalid student ID. Must start with 'S'")
+        StudentFactory.check_record(student_id, student_type)
         if student_type == 'U':
             return Undergraduate(student_id, name)
-        elif student_type == 'P':
-            return Postgraduate(student_id, name)
-        else:
+        return Postgraduate(student_id, name)
+
+    @staticmethod
+    def check_record(student_id, student_type) -> None:
+        """
+        Check the ID and the type of a student record.
+
+        Raises:
+            ValueError: If the ID does not start with 'S' or the type is not 'U' or 'P'.
+        """
+        if not student_id.startswith('S'):
+            raise ValueError("Invalid student ID. Must start with 'S'")
+        if student_type not in ('U', 'P'):
+            raise ValueError("Invalid student type")
+
+
+class StudentView(Student):
+    """
+    A student read from a compact StudentRoster. The view is created on demand and reads and writes
+    the roster, so it stays valid when other students are added or removed.
+    """
+    __slots__ = ('__roster', '__student_id')
+
+    def __init__(self, roster, student_id):
+        self.__roster = roster
+        self.__student_id = student_id
+
+    @property
+    def id(self):
+        """
+        Returns the ID of the student.
+        """
+        return self.__student_id
+
+    @id.setter
+    def id(self, new_id):
+        if not new_id.startswith('S'):
+            raise ValueError("Invalid student ID. Must start with 'S'")
+        self.__roster.rename(self.__student_id, str(new_id))
+        self.__student_id = str(new_id)
+
+    @property
+    def name(self):
+        """
+        Returns the name of the student.
+        """
+        return self.__roster.name(self.__roster.row(self.__student_id))
+
+    @name.setter
+    def name(self, new_name:str):
+        self.__roster.set_name(self.__roster.row(self.__student_id), str(new_name))
+
+    @property
+    def type(self):
+        """
+        Returns the type of the student.
+        """
+        return chr(self.__roster.types[self.__roster.row(self.__student_id)])
+
+    @type.setter
+    def type(self, new_type):
+        if new_type not in ['U', 'P']:
             raise ValueError("Invalid student type")
+        self.__roster.types[self.__roster.row(self.__student_id)] = ord(new_type)
+
+    def __eq__(self, other):
+        return isinstance(other, StudentView) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.__student_id)
+
+
+class StudentRoster():
+    """
+    Struct-of-arrays storage of students: the IDs in a list, the names UTF-8 encoded one after another in a
+    single buffer and the type of each student as a single byte code. Student objects are only created as
+    StudentView when a caller asks for one.
+
+    Attributes:
+        ids (list): The student IDs in roster order.
+        types (bytearray): The type code of each student (ord('U') or ord('P')).
+    """
+    __slots__ = ('ids', 'types', '__name_data', '__name_starts', '__name_lengths', '__index')
+
+    def __init__(self):
+        self.ids = []
+        self.types = bytearray()
+        self.__name_data = bytearray() # The encoded names. A renamed student gets new bytes at the end
+        self.__name_starts = array('Q') # The offset of the name of each student in the name data
+        self.__name_lengths = array('I') # The encoded length of the name of each student
+        self.__index = {} # The row of each student ID {student_id: row}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, student_id) -> bool:
+        return student_id in self.__index
+
+    def __iter__(self):
+        for student_id in list(self.ids): # A copy, so a student can be removed while iterating
+            yield StudentView(self, student_id)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [StudentView(self, student_id) for student_id in self.ids[position]]
+        return StudentView(self, self.ids[position])
+
+    def row(self, student_id) -> int:
+        """ Returns the row of the student. Raises KeyError if the student is not in the roster."""
+        return self.__index[student_id]
+
+    def name(self, row: int) -> str:
+        """ Returns the name of the student in the row."""
+        start = self.__name_starts[row]
+        return self.__name_data[start:start + self.__name_lengths[row]].decode("utf-8")
+
+    def set_name(self, row: int, name: str) -> None:
+        """ Change the name of the student in the row."""
+        encoded = name.encode("utf-8")
+        self.__name_starts[row] = len(self.__name_data)
+        self.__name_lengths[row] = len(encoded)
+        self.__name_data += encoded
+
+    def append(self, student_id, name, student_type) -> None:
+        """ Add a student at the end of the roster, rejecting duplicate IDs."""
+        if student_id in self.__index:
+            raise ValueError(f"Duplicate student ID {student_id}")
+        self.__index[student_id] = len(self.ids)
+        self.ids.append(student_id)
+        self.types.append(ord(student_type))
+        self.__name_starts.append(0)
+        self.__name_lengths.append(0)
+        self.set_name(len(self.ids) - 1, name)
+
+    def rename(self, student_id, new_id) -> None:
+        """ Change the ID of a student, keeping its row."""
+        if new_id in self.__index:
+            raise ValueError(f"Duplicate student ID {new_id}")
+        row = self.__index.pop(student_id)
+        self.ids[row] = new_id
+        self.__index[new_id] = row
+
+    def remove(self, student_id) -> bool:
+        """ Remove a student from the roster. Returns False if the student is not in the roster."""
+        row = self.__index.pop(student_id, None)
+        if row is None:
+            return False
+        del self.ids[row]
+        del self.types[row]
+        del self.__name_starts[row] # The bytes of the name are left unused in the name data
+        del self.__name_lengths[row]
+        for next_row in range(row, len(self.ids)): # The following students move up a row
+            self.__index[self.ids[next_row]] = next_row
+        return True
+
 
 class StudentManager():
     """
     A class for managing students.
+
+    Attributes:
+        compact (bool): Keep the students in a StudentRoster instead of a list of objects.
     """
-    def __init__(self):
-        self.__students = [] # A list of student objects
+    def __init__(self, compact = False):
+        self.__compact = compact
+        self.__students = StudentRoster() if compact else [] # A list of student objects, or the compact roster
+        self.__index = {} # The student objects by ID {student_id: student}. Not used by the compact roster
     
+    @property
+    def compact(self) -> bool:
+        """
+        Returns True if the students are kept in a compact roster.
+        """
+        return self.__compact
+
     @property
     def students(self) -> list:
         """
-        Returns the students attribute.
+        Returns the students attribute. The compact roster creates the student views while it is iterated.
         """
         return self.__students
     
     @students.setter
     def students(self, new_student):
-        self.__students = new_student
+        self.__students = StudentRoster() if self.__compact else []
+        self.__index = {}
+        for student in new_student:
+            self.add_student(student)
     
     def add_student(self, new_student):
         """
@@ -165,8 +346,31 @@ class StudentManager():
 
         Returns:
         None
+
+        Raises:
+        - ValueError: If a student with the same ID already exists.
         """
+        if self.__compact: # Only the fields are kept, the roster rejects duplicate IDs
+            self.__students.append(new_student.id, new_student.name, new_student.type)
+            return
+        if new_student.id in self.__index:
+            raise ValueError(f"Duplicate student ID {new_student.id}")
         self.__students.append(new_student)
+        self.__index[new_student.id] = new_student
+        new_student._set_index(self.__index)
+
+    def add_student_record(self, student_id, name, student_type) -> None:
+        """
+        Adds a student from its fields. The compact roster stores the fields without creating a student object.
+
+        Raises:
+        - ValueError: If the ID or the type is invalid or a student with the same ID already exists.
+        """
+        if not self.__compact:
+            self.add_student(StudentFactory.new_student(student_id, name, student_type))
+            return
+        StudentFactory.check_record(student_id, student_type)
+        self.__students.append(student_id, name, student_type)
     
     def remove_student(self, student_id):
         """
@@ -175,11 +379,14 @@ class StudentManager():
         Input:
             student_id (str): The ID of the student to remove.
         """
-        for student in self.__students:
-            if student.id == student_id:
-                self.__students.remove(student)
-                return True
-        return False
+        if self.__compact:
+            return self.__students.remove(student_id)
+        student = self.__index.pop(student_id, None)
+        if student is None:
+            return False
+        self.__students.remove(student)
+        student._set_index(None)
+        return True
     
     def get_student(self, student_id) -> Student:
         """
@@ -190,12 +397,20 @@ class StudentManager():
         
         Returns:
             Student: The student object with the given ID. None if not found.
+                A StudentView created on demand for the compact roster.
         """
-        for student in self.__students:
-            if student.id == student_id:
-                return student
-        return None
+        if self.__compact:
+            return StudentView(self.__students, student_id) if student_id in self.__students else None
+        return self.__index.get(student_id)
     
+    def student_types(self) -> dict:
+        """
+        Returns the type of every student {student_id: type}, without creating the student views of the compact roster.
+        """
+        if self.__compact:
+            return dict(zip(self.__students.ids, map(chr, self.__students.types)))
+        return {student.id: student.type for student in self.__students}
+
     def read_student_file(self, file_name):
         """
         Read the students from the given file and save it to the students attribute.
@@ -207,16 +422,32 @@ class StudentManager():
         if file_name is None:
             raise ValueError(f"Missing student file name {file_name}")
         with open(file_name, "r", encoding="utf-8") as file:
-            # read the rest of the file
-            for line in file:
-                if ',' not in line:
-                    raise ValueError("Student record must be separated by comma")
-                elements = [item.strip() for item in line.strip().split(",")]
-                if len(elements) == 3:
-                    student = StudentFactory.new_student(elements[0], elements[1], elements[2])
-                    self.add_student(student)
-                else:
-                    raise ValueError("Unexpected number of elements in student record or record is not separated by comma")
+            self.read_student_lines(file)
+
+    def read_student_lines(self, lines):
+        """
+        Add the students of the lines of a student file.
+
+        Input:
+        - lines (iterable): The lines of the file. Ex: an open file or the lines appended to it.
+        """
+        for line in lines:
+            self.add_student_record(*self.split_record(line))
+
+    @staticmethod
+    def split_record(line: str) -> list:
+        """
+        Split a line of the student file into its stripped fields: ID, name and type.
+
+        Raises:
+        - ValueError: If the line is not separated by comma or does not have 3 fields.
+        """
+        if ',' not in line:
+            raise ValueError("Student record must be separated by comma")
+        elements = [item.strip() for item in line.strip().split(",")]
+        if len(elements) != 3:
+            raise ValueError("Unexpected number of elements in student record or record is not separated by comma")
+        return elements
                 
 
 if __name__ == "__main__":
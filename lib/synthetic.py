@@ -0,0 +1,82 @@
+"""
+Synthetic competition data generator.
+
+Writes result, challenge and student files in the same format as the files in the test folder,
+for any number of students and challenges.
+"""
+
+import os
+import random
+
+
+def generate_competition(directory: str, no_students: int, no_challenges: int, ongoing_ratio: float = 0.05,
+                         absent_ratio: float = 0.2, special_ratio: float = 0.4, postgraduate_ratio: float = 0.3, seed: int = 0,
+                         min_finished: int = 1) -> tuple:
+    """
+    Generate the three input files of a competition.
+
+    Input:
+    - directory (str): The folder to write the files to. Created if missing.
+    - no_students (int): The number of students.
+    - no_challenges (int): The number of challenges.
+    - ongoing_ratio (float): The share of results that are still ongoing (444 or TBA).
+    - absent_ratio (float): The share of results that are not attempted (-1).
+    - special_ratio (float): The share of special (S) challenges, the others are mandatory (M).
+    - postgraduate_ratio (float): The share of postgraduate (P) students, the others are undergraduate (U).
+    - seed (int): The seed of the random generator so the same arguments always give the same files.
+    - min_finished (int): The least number of finished challenges of every student. 0 allows students without any time.
+
+    Returns:
+    - tuple: The paths to the (result file, challenge file, student file).
+    """
+    if no_students < 1 or no_challenges < 1:
+        raise ValueError("A competition needs at least one student and one challenge")
+    if ongoing_ratio < 0 or absent_ratio < 0 or ongoing_ratio + absent_ratio > 1:
+        raise ValueError("The ongoing and absent ratios must be positive and add up to at most 1")
+    if min_finished < 0 or min_finished > no_challenges:
+        raise ValueError("The minimum number of finished challenges must be between 0 and the number of challenges")
+    generator = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    student_width = max(3, len(str(no_students)))
+    challenge_width = max(2, len(str(no_challenges)))
+    student_ids = [f'S{number:0{student_width}d}' for number in range(1, no_students + 1)]
+    challenge_ids = [f'C{number:0{challenge_width}d}' for number in range(1, no_challenges + 1)]
+
+    challenge_file = os.path.join(directory, 'challenges.txt')
+    mean_times = {} # Each challenge has its own difficulty
+    with open(challenge_file, "w", encoding="utf-8") as file:
+        for challenge_id in challenge_ids:
+            mean_times[challenge_id] = generator.uniform(5.0, 25.0)
+            if generator.random() < special_ratio:
+                file.write(f'{challenge_id}, S, Special {challenge_id}, {generator.choice([1.1, 1.2, 1.5, 2.0, 2.5])}\n')
+            else:
+                file.write(f'{challenge_id}, M, Mandatory {challenge_id}, 1\n')
+
+    student_file = os.path.join(directory, 'students.txt')
+    with open(student_file, "w", encoding="utf-8") as file:
+        for student_id in student_ids:
+            student_type = 'P' if generator.random() < postgraduate_ratio else 'U'
+            file.write(f'{student_id}, Student {student_id[1:]}, {student_type}\n')
+
+    result_file = os.path.join(directory, 'results.txt')
+    with open(result_file, "w", encoding="utf-8") as file:
+        file.write(', ' + ', '.join(challenge_ids) + '\n')
+        for student_id in student_ids:
+            cells = []
+            for challenge_id in challenge_ids:
+                draw = generator.random()
+                if draw < ongoing_ratio:
+                    cells.append(generator.choice(['444', 'TBA']))
+                elif draw < ongoing_ratio + absent_ratio:
+                    cells.append('-1')
+                else:
+                    cells.append(None) # The time is drawn below
+            unfinished = [column for column, cell in enumerate(cells) if cell is not None]
+            missing = min_finished - (len(cells) - len(unfinished))
+            for column in generator.sample(unfinished, max(0, missing)):
+                cells[column] = None
+            for column, challenge_id in enumerate(challenge_ids):
+                if cells[column] is None:
+                    cells[column] = f'{max(0.5, generator.gauss(mean_times[challenge_id], 3.0)):.1f}'
+            file.write(student_id + ', ' + ', '.join(cells) + '\n')
+    return result_file, challenge_file, student_file
@@ -0,0 +1,52 @@
+"""
+Running totals of the result table used for the averages of the students and the challenges.
+"""
+
+from .matrix import FINISHED, ONGOING
+
+
+class RunningTotals():
+    """
+    Sum of the finished times and number of finished and ongoing results of each student row or challenge column.
+    The totals are updated in place when a result changes instead of scanning the whole table again.
+
+    Attributes:
+        totals (list): The sum of the finished times of each index.
+        nfinish (list): The number of finished results of each index.
+        nongoing (list): The number of ongoing results of each index.
+    """
+    def __init__(self, size: int = 0):
+        self.totals = [0.0] * size
+        self.nfinish = [0] * size
+        self.nongoing = [0] * size
+
+    def __len__(self):
+        return len(self.totals)
+
+    def add(self, index: int, status: int, time: float, sign: int = 1) -> None:
+        """
+        Add (sign = 1) or remove (sign = -1) a result to the totals of an index.
+
+        Input:
+        - index (int): The row or column of the result.
+        - status (int): The status code of the result.
+        - time (float): The time of the result, only used if it is finished.
+        """
+        if status == FINISHED:
+            self.nfinish[index] += sign
+            # Reset the sum when nothing is left so removed times do not leave a rounding error behind
+            self.totals[index] = self.totals[index] + sign * time if self.nfinish[index] else 0.0
+        elif status == ONGOING:
+            self.nongoing[index] += sign
+
+    def append(self) -> None:
+        """ Add an empty index at the end."""
+        self.totals.append(0.0)
+        self.nfinish.append(0)
+        self.nongoing.append(0)
+
+    def statistics(self, index: int) -> tuple:
+        """ Returns the (nfinish, nongoing, average_time) tuple of an index. The average time is None if nothing is finished."""
+        nfinish = self.nfinish[index]
+        average_time = round(self.totals[index] / nfinish, 2) if nfinish else None
+        return nfinish, self.nongoing[index], average_time
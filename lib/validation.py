@@ -0,0 +1,234 @@
+"""
+Validation of the input files of a competition in a single pass.
+
+The readers of the competition stop at the first invalid line. The validator reads every line of the three
+files once and collects all the errors instead, each one with its file, line and column, so a large file can be
+fixed in one go. The column is the number of the comma separated field, starting from 1.
+
+The student and challenge files are checked first, then the result file is streamed and each line is checked
+against them: the challenges of the header must be in the challenge file and the students of the rows in the
+student file. Only the first max_errors errors are kept, the following ones are only counted, so the memory
+used by the errors stays bounded whatever the size of the files.
+"""
+
+from .reader import split_result_line, process_header_cell
+from .matrix import parse_cell
+from .challenge import ChallengeManager, ChallengeFactory
+from .student import StudentManager, StudentFactory
+
+DEFAULT_MAX_ERRORS = 1000 # Number of errors kept by a validation, the following ones are only counted
+
+
+class InputError():
+    """
+    An error of an input file.
+
+    Attributes:
+        file (str): The path to the file.
+        line (int): The line number in the file, None for an error of the whole file.
+        column (int): The number of the field in the line, None for an error of the whole line.
+        message (str): The description of the error.
+    """
+    __slots__ = ('file', 'line', 'column', 'message')
+
+    def __init__(self, file: str, line: int, column: int, message: str):
+        self.file = file
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        location = ':'.join(str(part) for part in (self.file, self.line, self.column) if part is not None)
+        return f'{location}: {self.message}'
+
+
+class ValidationReport():
+    """
+    The errors found in the input files.
+
+    Attributes:
+        errors (list): The first max_errors InputError found.
+        n_errors (int): The number of errors found, including the ones that were not kept.
+        max_errors (int): The number of errors kept.
+        n_lines (dict): The number of lines read in each file {file: lines}
+    """
+    def __init__(self, max_errors: int = DEFAULT_MAX_ERRORS):
+        if max_errors < 0:
+            raise ValueError("The maximum number of errors cannot be negative")
+        self.errors = []
+        self.n_errors = 0
+        self.max_errors = max_errors
+        self.n_lines = {}
+
+    def __str__(self):
+        return '\n'.join(self.lines())
+
+    def __bool__(self):
+        """ True if no error was found."""
+        return self.n_errors == 0
+
+    def add(self, file: str, line: int, column: int, message: str) -> None:
+        """ Count an error and keep it if fewer than max_errors errors are kept."""
+        self.n_errors += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(InputError(file, line, column, message))
+
+    def lines(self) -> list:
+        """ Returns the lines of the report: one line per kept error, then the summary."""
+        lines = [str(error) for error in self.errors]
+        if self.n_errors > len(self.errors):
+            lines.append(f'... {self.n_errors - len(self.errors)} more errors not shown')
+        total_lines = sum(self.n_lines.values())
+        if self.n_errors:
+            lines.append(f'{self.n_errors} errors found in {total_lines} lines of {len(self.n_lines)} files.')
+        else:
+            lines.append(f'No error found in {total_lines} lines of {len(self.n_lines)} files.')
+        return lines
+
+
+class InputValidator():
+    """
+    Check the result file, then optionally the challenge and student files, reading each file once.
+
+    Attributes:
+        files (list): The result file, then optionally the challenge and student files.
+        report (ValidationReport): The errors found by validate.
+    """
+    def __init__(self, files: list, max_errors: int = DEFAULT_MAX_ERRORS):
+        if not files:
+            raise ValueError("The result file is required")
+        self.files = list(files)
+        self.report = ValidationReport(max_errors)
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({", ".join(self.files)})'
+
+    def validate(self) -> ValidationReport:
+        """ Check the files and return the report of the errors."""
+        challenge_ids = self.__check_file(self.files[1], self.__check_challenges) if len(self.files) > 1 else None
+        student_ids = self.__check_file(self.files[2], self.__check_students) if len(self.files) > 2 else None
+        self.__check_file(self.files[0], lambda lines: self.__check_results(lines, challenge_ids, student_ids))
+        return self.report
+
+    def __check_file(self, file_name: str, check):
+        """ Open a file and check its lines with the check function. Returns the result of check, None if the file could not be read."""
+        self.report.n_lines[file_name] = 0
+        try:
+            with open(file_name, "r", encoding="utf-8") as file:
+                return check(self.__count_lines(file_name, file))
+        except UnicodeDecodeError as e: # The lines after an invalid byte cannot be read
+            self.report.add(file_name, self.report.n_lines[file_name] + 1, None, f"The file is not valid UTF-8: {e.reason}")
+        except OSError as e:
+            self.report.add(file_name, None, None, f"The file cannot be read: {e.strerror or e}")
+        return None
+
+    def __count_lines(self, file_name: str, file):
+        """ Yield the (line_no, line) of a file and count them in the report."""
+        for line_no, line in enumerate(file, start=1):
+            self.report.n_lines[file_name] = line_no
+            yield line_no, line
+
+    def __check_challenges(self, lines) -> set:
+        """ Check the challenge records and return the IDs of the challenges."""
+        file_name = self.files[1]
+        first_lines = {} # The line of each challenge ID {challenge_id: line_no}
+        for line_no, line in lines:
+            try:
+                challenge_id, challenge_type, name, weight = ChallengeManager.split_record(line)
+            except ValueError as e:
+                self.report.add(file_name, line_no, None, str(e))
+                continue
+            if challenge_id in first_lines:
+                self.report.add(file_name, line_no, 1, f"Duplicate challenge ID {challenge_id} (first on line {first_lines[challenge_id]})")
+                continue
+            try:
+                ChallengeFactory.check_record(challenge_id, challenge_type, name, weight)
+            except ValueError as e:
+                self.report.add(file_name, line_no, 2 if challenge_type not in ('M', 'S') else 4, str(e))
+            first_lines[challenge_id] = line_no
+        return set(first_lines)
+
+    def __check_students(self, lines) -> set:
+        """ Check the student records and return the IDs of the students."""
+        file_name = self.files[2]
+        first_lines = {} # The line of each student ID {student_id: line_no}
+        for line_no, line in lines:
+            try:
+                student_id, _, student_type = StudentManager.split_record(line)
+            except ValueError as e:
+                self.report.add(file_name, line_no, None, str(e))
+                continue
+            if student_id in first_lines:
+                self.report.add(file_name, line_no, 1, f"Duplicate student ID {student_id} (first on line {first_lines[student_id]})")
+                continue
+            try:
+                StudentFactory.check_record(student_id, student_type)
+            except ValueError as e:
+                self.report.add(file_name, line_no, 1 if not student_id.startswith('S') else 3, str(e))
+            first_lines[student_id] = line_no
+        return set(first_lines)
+
+    def __check_results(self, lines, challenge_ids: set, student_ids: set) -> None:
+        """
+        Check the header and the student lines of the result file.
+
+        Input:
+        - challenge_ids (set): The challenges of the challenge file, not checked if None.
+        - student_ids (set): The students of the student file, not checked if None.
+        """
+        file_name = self.files[0]
+        width = None
+        first_lines = {} # The line of each student ID {student_id: line_no}
+        for line_no, line in lines:
+            if not line.strip(): # Blank lines are skipped by the reader
+                continue
+            if width is None: # The first line is the header
+                try:
+                    header = [process_header_cell(cell) for cell in split_result_line(line, line_no)]
+                except ValueError as e:
+                    self.report.add(file_name, line_no, None, str(e))
+                    header = ['Results'] # The lines are still checked, without the number of columns
+                self.__check_header(header, line_no, challenge_ids)
+                width = len(header) if len(header) > 1 else 0
+                continue
+            try:
+                cells = split_result_line(line, line_no, width or None)
+            except ValueError as e:
+                self.report.add(file_name, line_no, None, str(e))
+                continue
+            student_id = cells[0].strip()
+            if student_id in first_lines:
+                self.report.add(file_name, line_no, 1, f"Duplicate student ID {student_id} in result record (first on line {first_lines[student_id]})")
+            else:
+                first_lines[student_id] = line_no
+                if student_ids is not None and student_id not in student_ids:
+                    self.report.add(file_name, line_no, 1, f"Student {student_id} is not in the student file")
+            for column, cell in enumerate(cells[1:], start=2):
+                try:
+                    parse_cell(cell)
+                except ValueError as e:
+                    self.report.add(file_name, line_no, column, str(e))
+        if width is None:
+            self.report.add(file_name, None, None, "No result in the competition")
+
+    def __check_header(self, header: list, line_no: int, challenge_ids: set) -> None:
+        """ Check the challenges of the header of the result file."""
+        file_name = self.files[0]
+        seen = set()
+        for column, challenge_id in enumerate(header[1:], start=2):
+            if challenge_id in seen:
+                self.report.add(file_name, line_no, column, f"Duplicate challenge ID {challenge_id} in result record")
+            seen.add(challenge_id)
+            if challenge_ids is not None and challenge_id not in challenge_ids:
+                self.report.add(file_name, line_no, column, f"Challenge {challenge_id} is not in the challenge file")
+
+
+def validate_files(files: list, max_errors: int = DEFAULT_MAX_ERRORS) -> ValidationReport:
+    """
+    Check the input files of a competition and return the report of all their errors.
+
+    Input:
+    - files (list): The result file, then optionally the challenge and student files.
+    - max_errors (int): The number of errors kept in the report, the following ones are only counted.
+    """
+    return InputValidator(files, max_errors).validate()
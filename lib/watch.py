@@ -0,0 +1,382 @@
+"""
+Watch mode: keep a competition loaded and refresh its report when the input files change.
+
+Every line of the input files has a checksum, so a change only costs the lines that changed:
+- A file that grew with its previous end unchanged is only read from the previous end, the new lines are added.
+- A file that was rewritten is read again to find the lines whose checksum changed. Only these lines are parsed.
+  The results of a changed result line are updated one cell at a time with Result.set_result, so the totals
+  and the ranks are updated incrementally.
+- A result file that lost lines, changed its header or the student of a line is read again as a whole, and so is a
+  student or challenge file with a changed line.
+
+Each report section is only rendered again when one of its input files changed, e.g. a new student file only
+renders the student section again and the challenge averages are not computed again.
+"""
+
+import os
+import sys
+import time
+import zlib
+from array import array
+from .matrix import FINISHED, NOT_ATTEMPTED
+from .reader import parse_result_line
+from .student import StudentManager
+from .challenge import ChallengeManager
+from .misc import TextEditor
+from .profiling import span
+
+DEFAULT_INTERVAL = 2.0 # Seconds between two checks of the input files
+FILE_KINDS = ('results', 'challenges', 'students') # The kind of each input file, in the order of the command line
+# The input files each report section depends on
+SECTION_INPUTS = {
+    'results': {'results'},
+    'top': {'results'},
+    'challenges': {'results', 'challenges'},
+    'students': {'results', 'challenges', 'students'},
+}
+
+
+class FileChanges():
+    """
+    The lines of an input file that changed since the last scan.
+
+    Attributes:
+        changed (list): The (index, text) of the lines that changed. The index is the line number - 1.
+        appended (list): The (index, text) of the lines after the end of the previous scan.
+        removed (bool): True if the file has fewer lines than before.
+        appended_only (bool): True if only the part of the file after the previous end was read.
+    """
+    def __init__(self, appended_only: bool):
+        self.changed = []
+        self.appended = []
+        self.removed = False
+        self.appended_only = appended_only
+        self.checksums = {} # The new checksum of the changed lines {index: checksum}
+        self.new_checksums = array('I') # The checksums of the appended lines
+        self.stat = None # The (size, mtime) of the scanned file
+        self.end = 0 # The offset after the last complete line
+        self.complete = 0 # The number of complete lines
+        self.lines = 0 # The number of lines
+        self.tail = b''
+
+    def __bool__(self):
+        return bool(self.changed or self.appended or self.removed)
+
+
+class LineTracker():
+    """
+    The checksum of every line of an input file, to find the lines that changed since the last scan.
+
+    Attributes:
+        file_name (str): The path to the file.
+        checksums (array): The crc32 of each line, without the line break.
+    """
+    TAIL_SIZE = 4096 # The bytes before the previous end compared to detect a file that was only appended to
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.checksums = array('I')
+        self.__stat = None
+        self.__end = 0
+        self.__complete = 0
+        self.__tail = b''
+        self.__failed_stat = None # The (size, mtime) of a version of the file that could not be applied
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.file_name}, {len(self.checksums)} lines)'
+
+    def scan(self) -> FileChanges:
+        """
+        Find the lines that changed since the last commit. The tracker is not changed until the changes are committed.
+
+        Returns:
+        - FileChanges: The changes, None if the size and the modification time of the file did not change.
+        """
+        stat = os.stat(self.file_name)
+        if (stat.st_size, stat.st_mtime_ns) in (self.__stat, self.__failed_stat):
+            return None
+        with open(self.file_name, "rb") as file:
+            index, offset = 0, 0
+            if self.__end and stat.st_size >= self.__end:
+                file.seek(self.__end - len(self.__tail))
+                if file.read(len(self.__tail)) == self.__tail: # Only the part after the previous end is read
+                    index, offset = self.__complete, self.__end
+            changes = FileChanges(appended_only=offset > 0)
+            changes.end, changes.complete = offset, index
+            file.seek(offset)
+            for raw_line in file:
+                checksum = zlib.crc32(raw_line.rstrip(b'\r\n'))
+                if index < len(self.checksums):
+                    if checksum != self.checksums[index]:
+                        changes.changed.append((index, raw_line.decode("utf-8")))
+                        changes.checksums[index] = checksum
+                else:
+                    changes.appended.append((index, raw_line.decode("utf-8")))
+                    changes.new_checksums.append(checksum)
+                index += 1
+                if raw_line.endswith(b'\n'): # A last line without line break is read again on the next scan
+                    changes.end += len(raw_line)
+                    changes.complete = index
+            changes.lines = index
+            changes.removed = index < len(self.checksums)
+            file.seek(max(0, changes.end - self.TAIL_SIZE))
+            changes.tail = file.read(changes.end - file.tell())
+        changes.stat = (stat.st_size, stat.st_mtime_ns)
+        return changes
+
+    def commit(self, changes: FileChanges) -> None:
+        """ Save the state of the scanned file once its changes are applied."""
+        if changes.removed:
+            del self.checksums[changes.lines:]
+        for index, checksum in changes.checksums.items():
+            self.checksums[index] = checksum
+        self.checksums.extend(changes.new_checksums)
+        self.__stat, self.__end, self.__complete, self.__tail = changes.stat, changes.end, changes.complete, changes.tail
+
+    def skip(self, changes: FileChanges) -> None:
+        """ Do not scan this version of the file again, its changes could not be applied."""
+        if changes is not None:
+            self.__failed_stat = changes.stat
+
+    def reset(self) -> None:
+        """ Forget the file, the next scan reads it as a whole."""
+        self.__init__(self.file_name)
+
+
+class ReportWatcher():
+    """
+    Keep a competition loaded, apply the changes of its input files and report the sections whose inputs changed.
+
+    Attributes:
+        competition (Competition): The competition, read from the files when the watcher is created.
+        files (list): The result file, then optionally the challenge and student files.
+        sections (list): The report sections.
+        refreshes (int): The number of reports written.
+    """
+    def __init__(self, competition, files: list, sections: list = None, output_file = 'competition_report.txt',
+                 print_terminal = True, snapshot_dir: str = None):
+        self.competition = competition
+        self.output_file = output_file
+        self.print_terminal = print_terminal
+        self.files = competition.select_files(files, sections)
+        self.sections = competition.check_sections(sections if sections is not None else ['results', 'challenges', 'students'][:len(self.files)])
+        competition.files_needed(self.sections, len(self.files))
+        self.trackers = {kind: LineTracker(file) for kind, file in zip(FILE_KINDS, self.files)}
+        self.refreshes = 0
+        self.errors = [] # The files whose changes could not be applied by the last check, with the error
+        self.__lines = {} # The rendered lines of each section {section: list}
+        self.__rows = array('i') # The result row of each line of the result file, -1 for the header and the blank lines
+        self.__load(snapshot_dir)
+
+    def __load(self, snapshot_dir: str = None) -> None:
+        """ Read every input file and track its lines. Read again if a file changed while it was read."""
+        competition = self.competition
+        retry = False
+        while True:
+            if retry: # The rosters of the previous read are dropped, they would reject their own IDs as duplicates
+                competition.challenge_manager = ChallengeManager(competition.challenge_manager.compact)
+                competition.student_manager = StudentManager(competition.student_manager.compact)
+            retry = True
+            stats = [os.stat(file).st_mtime_ns for file in self.files]
+            competition.read_files(self.files, snapshot_dir)
+            for tracker in self.trackers.values():
+                tracker.reset()
+            scans = {kind: tracker.scan() for kind, tracker in self.trackers.items()}
+            if stats == [os.stat(file).st_mtime_ns for file in self.files]:
+                break
+        for kind, changes in scans.items():
+            self.trackers[kind].commit(changes)
+        self.__index_rows(scans['results'].appended)
+        self.__lines = {}
+
+    def __index_rows(self, lines: list) -> None:
+        """ Map every line of the result file to its row, like ResultFileReader skips the header and the blank lines."""
+        self.__rows = array('i')
+        row = -1 # The first line that is not blank is the header
+        for _, text in lines:
+            if row < 0 or not text.strip():
+                self.__rows.append(-1)
+                row = 0 if text.strip() else row
+            else:
+                self.__rows.append(row)
+                row += 1
+
+    def check(self) -> set:
+        """
+        Apply the changes of the input files to the competition.
+
+        A file with an invalid changed line is not applied and its error is kept in the errors attribute.
+        It is not read again until it changes.
+
+        Returns:
+        - set: The kinds of the input files that changed: 'results', 'challenges' and 'students'.
+        """
+        changed = set()
+        self.errors = []
+        appliers = {'results': self.__apply_results, 'challenges': self.__apply_challenges, 'students': self.__apply_students}
+        for kind, tracker in self.trackers.items():
+            changes = None
+            try:
+                changes = tracker.scan()
+                if changes is None:
+                    continue
+                if changes:
+                    with span('watch.' + kind, changed=len(changes.changed), appended=len(changes.appended)):
+                        applied = appliers[kind](changes)
+                    changed.add(kind)
+                    if not applied: # The whole file was read again and its tracker scanned it again
+                        continue
+                tracker.commit(changes)
+            except (ValueError, OSError) as e: # The other files are still applied
+                tracker.skip(changes)
+                self.errors.append(f'{tracker.file_name}: {e}')
+        return changed
+
+    def __apply_results(self, changes: FileChanges) -> bool:
+        """ Apply the changed and appended result lines. Returns False if the result file was read again as a whole."""
+        result = self.competition.result
+        matrix = result.matrix
+        width = matrix.n_challenges + 1
+        updates = [] # The (row, cells) of the changed lines
+        for index, text in changes.changed:
+            row = self.__rows[index]
+            if changes.removed or row < 0 or not text.strip():
+                return self.__reload_results()
+            student_id, cells = parse_result_line(text, index + 1, width)
+            if student_id != matrix.student_ids[row]:
+                return self.__reload_results()
+            updates.append((row, cells))
+        if changes.removed:
+            return self.__reload_results()
+        new_rows = [] # The (student_id, cells) of the appended lines
+        new_ids = set()
+        for index, text in changes.appended:
+            if not text.strip():
+                continue
+            student_id, cells = parse_result_line(text, index + 1, width)
+            if student_id in matrix.student_index or student_id in new_ids:
+                raise ValueError(f"Duplicate student ID {student_id} in result record (line {index + 1})")
+            new_ids.add(student_id)
+            new_rows.append((student_id, cells))
+        # Every line is valid, the results are changed one cell at a time
+        for row, cells in updates:
+            student_id = matrix.student_ids[row]
+            for column, (status, time) in enumerate(cells):
+                old_status = matrix.status[column][row]
+                if status != old_status or (status == FINISHED and time != matrix.times[column][row]):
+                    result.set_result(student_id, matrix.challenge_ids[column], status, time)
+        next_row = matrix.n_students
+        for _, text in changes.appended:
+            self.__rows.append(next_row if text.strip() else -1)
+            next_row += 1 if text.strip() else 0
+        for student_id, cells in new_rows:
+            result.add_student_row(student_id)
+            for column, (status, time) in enumerate(cells):
+                if status != NOT_ATTEMPTED:
+                    result.set_result(student_id, matrix.challenge_ids[column], status, time)
+        return True
+
+    def __reload_results(self) -> bool:
+        """ Read the whole result file again."""
+        self.competition.read_results(self.files[0])
+        tracker = self.trackers['results']
+        tracker.reset()
+        changes = tracker.scan()
+        tracker.commit(changes)
+        self.__index_rows(changes.appended)
+        return False
+
+    def __apply_challenges(self, changes: FileChanges) -> bool:
+        """ Add the appended challenges. Returns False if the challenge file was read again as a whole."""
+        manager = self.competition.challenge_manager
+        if changes.changed or changes.removed:
+            new_manager = ChallengeManager(manager.compact)
+            new_manager.read_challenge_file(self.files[1])
+            self.competition.challenge_manager = new_manager
+            self.competition.invalidate_roster_cache()
+            return self.__rescan('challenges')
+        appended = ChallengeManager(manager.compact) # The new lines are checked before any challenge is added
+        appended.read_challenge_lines(text for _, text in changes.appended)
+        for challenge in appended.challenges:
+            if manager.get_challenge(challenge.id) is not None:
+                raise ValueError(f"Duplicate challenge ID {challenge.id}")
+        for challenge in appended.challenges:
+            manager.add_challenge(challenge.id, challenge.type, challenge.name, challenge.weight)
+        self.competition.invalidate_roster_cache()
+        return True
+
+    def __apply_students(self, changes: FileChanges) -> bool:
+        """ Add the appended students. Returns False if the student file was read again as a whole."""
+        manager = self.competition.student_manager
+        if changes.changed or changes.removed:
+            new_manager = StudentManager(manager.compact)
+            new_manager.read_student_file(self.files[2])
+            self.competition.student_manager = new_manager
+            self.competition.invalidate_roster_cache()
+            return self.__rescan('students')
+        appended = StudentManager(manager.compact) # The new lines are checked before any student is added
+        appended.read_student_lines(text for _, text in changes.appended)
+        for student in appended.students:
+            if manager.get_student(student.id) is not None:
+                raise ValueError(f"Duplicate student ID {student.id}")
+        for student in appended.students:
+            manager.add_student_record(student.id, student.name, student.type)
+        self.competition.invalidate_roster_cache()
+        return True
+
+    def __rescan(self, kind: str) -> bool:
+        """ Track the lines of a file that was read again as a whole."""
+        tracker = self.trackers[kind]
+        tracker.reset()
+        tracker.commit(tracker.scan())
+        return False
+
+    def report(self, changed: set = None) -> None:
+        """
+        Write the report, rendering again only the sections that depend on the changed input files.
+
+        Input:
+        - changed (set): The kinds of the input files that changed. Every section is rendered if None.
+        """
+        competition = self.competition
+        generators = {'results': competition.iter_report_results, 'challenges': competition.iter_report_challenges,
+                      'students': competition.iter_report_student, 'top': competition.iter_report_top}
+        for section in self.sections:
+            if changed is None or section not in self.__lines or SECTION_INPUTS[section] & changed:
+                with span('render.' + section):
+                    self.__lines[section] = list(generators[section]())
+        footer_message = f'Report {self.output_file} generated!'
+        lines = [line for section in self.sections for line in self.__lines[section]]
+        if self.print_terminal:
+            print('\n'.join(lines))
+            print(footer_message)
+        TextEditor.add_to_file(self.output_file, [line + '\n' for line in lines] + [f'{footer_message}\n'])
+        self.refreshes += 1
+
+    def refresh(self) -> set:
+        """
+        Apply the changes of the input files and report again if any file changed.
+        An invalid file is reported on stderr and the previous report is kept until the file changes again.
+
+        Returns:
+        - set: The kinds of the input files that changed.
+        """
+        changed = self.check()
+        for error in self.errors:
+            print(f'Could not apply the changes of {error}. They are applied when the file changes again', file=sys.stderr)
+        if changed:
+            self.report(changed)
+        return changed
+
+    def run(self, interval: float = DEFAULT_INTERVAL, max_refreshes: int = None) -> None:
+        """
+        Report the competition, then check the input files every interval seconds until the program is interrupted.
+
+        Input:
+        - interval (float): The seconds between two checks.
+        - max_refreshes (int): Stop after this number of reports. Never stop if None.
+        """
+        self.report()
+        while max_refreshes is None or self.refreshes < max_refreshes:
+            time.sleep(interval)
+            self.refresh()
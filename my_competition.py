@@ -23,14 +23,110 @@ References:
 
 # Import required librarys
 
+import sys
+import time
 from lib.misc import Control
 from lib.competition import Competition
+from lib.sqlite_backend import SqliteCompetition
+from lib.batch import read_manifest, run_batch, format_summary
+from lib.profiling import run_instrumented
+from lib.server import serve
+from lib.watch import ReportWatcher
+from lib.history import RoundHistory, format_trend
+from lib.ranking import read_scoring_rule
+from lib.validation import validate_files
+
+def read_rule(arguments):
+    """ Returns the scoring rule of --scoring-rule, None for the default rule"""
+    if not arguments.scoring_rule:
+        return None
+    try:
+        return read_scoring_rule(arguments.scoring_rule)
+    except (ValueError, OSError) as e:
+        sys.exit(e)
+
+def run_batch_mode(arguments):
+    """ Report every competition of the batch manifest and print the summary"""
+    start = time.perf_counter()
+    try:
+        entries = read_manifest(arguments.batch, arguments.output_dir)
+        summaries = run_batch(entries, arguments.workers, arguments.snapshot_dir, arguments.compact, read_rule(arguments))
+    except (ValueError, OSError) as e:
+        sys.exit(e)
+    summary = format_summary(summaries, time.perf_counter() - start)
+    print(summary)
+    if arguments.summary_file:
+        with open(arguments.summary_file, "w", encoding="utf-8") as file:
+            file.write(summary + '\n')
+    if any(entry['status'] != 'ok' for entry in summaries):
+        sys.exit(1)
+
+def run_report(arguments):
+    """ Read the competition files and report the competition"""
+    # Create the competition object, stored in SQLite if --sqlite is given
+    competition = SqliteCompetition(arguments.sqlite, arguments.compact) if arguments.sqlite else Competition(arguments.compact, arguments.parse_workers, arguments.rank_workers)
+    if arguments.scoring_rule:
+        competition.set_scoring_rule(read_rule(arguments))
+    competition.read_all_files_on_command(arguments.files, arguments.snapshot_dir, arguments.sections) # Read the requirement files from the command line arguments
+    competition.report_all(sections=arguments.sections) # Display the report to the user and save it to the file name competition_report.txt
+    if arguments.history:
+        run_history(arguments, competition)
+
+def run_history(arguments, competition = None):
+    """ Save the results of the competition as a new round of the history, then print the trend if asked"""
+    if not arguments.history:
+        sys.exit('--trend needs the history directory given with --history')
+    if arguments.trend is not None and len(arguments.trend) > 2:
+        sys.exit('--trend takes a challenge ID, a student ID, or a student ID and a challenge ID')
+    try:
+        history = RoundHistory(arguments.history)
+        if competition is not None:
+            index = history.add_round(competition.result.matrix, arguments.round)
+            print(f'Round {history.labels()[index]} saved in {arguments.history}')
+        if arguments.trend:
+            print(format_trend(history, arguments.trend))
+    except (ValueError, OSError) as e:
+        sys.exit(e)
+
+def run_validate(arguments):
+    """ Check the input files and print all their errors, exit with status 1 if there is any"""
+    if not arguments.files:
+        sys.exit('--validate needs the result file')
+    try:
+        report = validate_files(arguments.files, arguments.max_errors)
+    except ValueError as e:
+        sys.exit(e)
+    print(report)
+    if not report:
+        sys.exit(1)
+
+def run_server(arguments):
+    """ Serve the reports of the competition on the local HTTP dashboard"""
+    try:
+        serve(arguments.files, arguments.host, arguments.port, arguments.snapshot_dir, arguments.compact, read_rule(arguments))
+    except (ValueError, OSError) as e:
+        sys.exit(e)
+
+def run_watch(arguments):
+    """ Report the competition, then report it again each time an input file changes"""
+    competition = Competition(arguments.compact, scoring_rule=read_rule(arguments))
+    try:
+        watcher = ReportWatcher(competition, arguments.files, arguments.sections, snapshot_dir=arguments.snapshot_dir)
+        print(f'Watching {", ".join(watcher.files)} every {arguments.interval} seconds (Ctrl+C to stop)')
+        watcher.run(arguments.interval)
+    except (ValueError, OSError) as e:
+        sys.exit(e)
+    except KeyboardInterrupt:
+        pass
 
 def main():
     """ This is the main function of the program"""
-    competition = Competition() # Create the competition object
-    competition.read_all_files_on_command() # Read the requirement files from the command line arguments
-    competition.report_all() # Display the report to the user and save it to the file name competition_report.txt
+    arguments = Control.parse_command_line() # Read the files and options from the command line
+    mode = run_batch_mode if arguments.batch else run_validate if arguments.validate else run_server if arguments.serve else run_watch if arguments.watch else run_report
+    if arguments.trend and not arguments.files: # Only print the trend of the rounds already saved
+        mode = run_history
+    # The run is only traced or profiled when --trace or --profile is given
+    run_instrumented(lambda: mode(arguments), arguments.trace, arguments.profile)
 
 if __name__ == "__main__":
     main()